@@ -1,8 +1,14 @@
 """Test D-bus adapters."""
 
+import asyncio
+import os
 import re
+import socket
 import struct
 import sys
+import threading
+import time
+from unittest.mock import Mock
 
 import pytest
 
@@ -12,9 +18,18 @@ if not sys.platform.lower().startswith("linux"):
 
 import jeepney
 import pytest
+from jeepney.io.blocking import Proxy, open_dbus_connection
 
-from wakepy.core import DbusAddress, DbusMethod, DbusMethodCall
-from wakepy.dbus_adapters.jeepney import JeepneyDbusAdapter
+from wakepy.core import CURRENT_PLATFORM, DbusAddress, DbusMethod, DbusMethodCall
+from wakepy.core.method import Method
+from wakepy.core.mode import Mode
+from wakepy.dbus_adapters import jeepney as jeepney_adapters
+from wakepy.dbus_adapters.jeepney import (
+    AsyncJeepneyDbusAdapter,
+    DbusNotFoundError,
+    JeepneyDbusAdapter,
+    get_bus_address,
+)
 
 
 @pytest.mark.usefixtures("dbus_calculator_service")
@@ -120,3 +135,450 @@ def test_jeepney_dbus_adapter_string_shorten(string_shorten_method):
     adapter = JeepneyDbusAdapter()
     call = DbusMethodCall(string_shorten_method, ("cat pinky", 3))
     assert adapter.process(call) == ("cat", 6)
+
+
+@pytest.mark.usefixtures("dbus_calculator_service")
+def test_jeepney_dbus_adapter_reuses_connection(numberadd_method):
+    JeepneyDbusAdapter.close_connections()
+    call = DbusMethodCall(numberadd_method, (2, 3))
+
+    # Two separate adapter instances (like two separate Modes) share the same
+    # connection.
+    assert JeepneyDbusAdapter().process(call) == (5,)
+    connection = JeepneyDbusAdapter._connections[numberadd_method.bus][0]
+    assert JeepneyDbusAdapter().process(call) == (5,)
+    assert JeepneyDbusAdapter._connections[numberadd_method.bus][0] is connection
+
+
+@pytest.mark.usefixtures("dbus_calculator_service")
+def test_jeepney_dbus_adapter_connects_without_lock(numberadd_method, monkeypatch):
+    """Opening a connection to a slow bus does not block the calls to the other
+    buses, and the threads connecting to the same bus at the same time end up
+    sharing one connection."""
+    JeepneyDbusAdapter.close_connections()
+    open_connection = JeepneyDbusAdapter._open_connection
+    waiting, release = [], threading.Event()
+    slow_connections = []
+
+    def open_slow_connection(bus):
+        if bus != "slow":
+            return open_connection(bus)
+        waiting.append(bus)
+        release.wait(5)
+        connection = open_connection(numberadd_method.bus)
+        slow_connections.append(connection)
+        return connection
+
+    monkeypatch.setattr(
+        JeepneyDbusAdapter, "_open_connection", staticmethod(open_slow_connection)
+    )
+    adapter = JeepneyDbusAdapter()
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(adapter._get_connection("slow")))
+        for _ in range(2)
+    ]
+    for thread in threads:
+        thread.start()
+    _wait_for(lambda: len(waiting) == 2)
+
+    assert adapter.process(DbusMethodCall(numberadd_method, (2, 3))) == (5,)
+
+    release.set()
+    for thread in threads:
+        thread.join()
+    connection = JeepneyDbusAdapter._connections["slow"][0]
+    assert [result[0] for result in results] == [connection, connection]
+    assert sorted(result[2] for result in results) == [False, True]
+    # The extra connection was closed
+    (extra,) = [c for c in slow_connections if c is not connection]
+    assert extra.sock.fileno() == -1
+    JeepneyDbusAdapter.close_connections()
+
+
+@pytest.mark.usefixtures("dbus_calculator_service")
+def test_jeepney_dbus_adapter_reconnects(numberadd_method):
+    adapter = JeepneyDbusAdapter()
+    call = DbusMethodCall(numberadd_method, (2, 3))
+    assert adapter.process(call) == (5,)
+
+    # Simulate a connection which was closed from the other end.
+    connection = JeepneyDbusAdapter._connections[numberadd_method.bus][0]
+    connection.sock.shutdown(socket.SHUT_RDWR)
+
+    assert adapter.process(call) == (5,)
+    assert JeepneyDbusAdapter._connections[numberadd_method.bus][0] is not connection
+
+
+@pytest.mark.usefixtures("dbus_calculator_service")
+def test_jeepney_dbus_adapter_does_not_resend(numberadd_method, monkeypatch):
+    """If the connection breaks after the message was sent, the call is not
+    retried, as the service may have got it already."""
+    adapter = JeepneyDbusAdapter()
+    call = DbusMethodCall(numberadd_method, (2, 3))
+    assert adapter.process(call) == (5,)
+
+    connection = JeepneyDbusAdapter._connections[numberadd_method.bus][0]
+    send = Mock(wraps=connection.send)
+    monkeypatch.setattr(connection, "send", send)
+    receive = connection.receive
+
+    def receive_and_break(**kwargs):
+        # The reply is read, so that the service does not get an error for
+        # replying to a closed connection.
+        receive(**kwargs)
+        raise ConnectionResetError("closed")
+
+    monkeypatch.setattr(connection, "receive", receive_and_break)
+    open_connection = Mock(wraps=open_dbus_connection)
+    monkeypatch.setattr(jeepney_adapters, "open_dbus_connection", open_connection)
+
+    with pytest.raises(ConnectionResetError, match="closed"):
+        adapter.process(call)
+    assert send.call_count == 1
+    assert open_connection.call_count == 0
+
+    # The broken connection is replaced on the next call.
+    assert numberadd_method.bus not in JeepneyDbusAdapter._connections
+    assert adapter.process(call) == (5,)
+    assert open_connection.call_count == 1
+
+
+@pytest.mark.benchmark
+def test_jeepney_dbus_adapter_calls_per_second(private_bus: str, monkeypatch):
+    """Benchmark: Many calls use the pooled connection, instead of opening a
+    new connection for each call (which is how the adapter used to work). Uses
+    a method of the message bus (dbus-daemon) itself, so there is no test
+    service to slow down the calls."""
+    n_calls = 200
+    get_id = DbusMethod(
+        name="GetId",
+        signature="",
+        output_signature="s",
+        output_params=("bus_id",),
+    ).of(
+        DbusAddress(
+            bus=private_bus,
+            service="org.freedesktop.DBus",
+            path="/org/freedesktop/DBus",
+            interface="org.freedesktop.DBus",
+        )
+    )
+    call = DbusMethodCall(get_id)
+    JeepneyDbusAdapter.close_connections()
+    open_connection = Mock(wraps=open_dbus_connection)
+    monkeypatch.setattr(jeepney_adapters, "open_dbus_connection", open_connection)
+
+    adapter = JeepneyDbusAdapter()
+    for _ in range(n_calls):
+        adapter.process(call)
+
+    assert open_connection.call_count == 1
+    JeepneyDbusAdapter.close_connections()
+
+
+@pytest.mark.usefixtures("dbus_calculator_service")
+def test_async_jeepney_dbus_adapter(numberadd_method):
+    call = DbusMethodCall(numberadd_method, (2, 3))
+
+    async def main():
+        adapter = AsyncJeepneyDbusAdapter()
+        assert await adapter.process_async(call) == (5,)
+        # The blocking .process() may be called from other threads
+        loop = asyncio.get_running_loop()
+        assert await loop.run_in_executor(None, adapter.process, call) == (5,)
+        # ..but not from the event loop thread.
+        with pytest.raises(RuntimeError, match="would block the event loop"):
+            adapter.process(call)
+
+        # The connection is reused, and may be closed.
+        assert len(adapter._routers) == 1
+        await adapter.aclose()
+        assert adapter._routers == dict()
+        assert await adapter.process_async(call) == (5,)
+        await adapter.aclose()
+
+    asyncio.run(main())
+
+
+def test_async_jeepney_dbus_adapter_without_event_loop():
+    with pytest.raises(RuntimeError, match="no running event loop"):
+        AsyncJeepneyDbusAdapter()
+
+
+@pytest.mark.usefixtures("dbus_calculator_service")
+def test_async_jeepney_dbus_adapter_with_mode(numberadd_method, monkeypatch):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    monkeypatch.setattr("wakepy.core.registry._method_registry", dict())
+    results = []
+
+    class CalculatorMethod(Method):
+        name = "CalculatorMethod"
+        mode = "_test"
+        supported_platforms = (CURRENT_PLATFORM,)
+
+        def enter_mode(self):
+            results.append(
+                self.process_dbus_call(DbusMethodCall(numberadd_method, (2, 3)))
+            )
+
+        def exit_mode(self):
+            results.append(
+                self.process_dbus_call(DbusMethodCall(numberadd_method, (4, 5)))
+            )
+
+    async def main():
+        mode = Mode([CalculatorMethod], dbus_adapter=AsyncJeepneyDbusAdapter)
+        async with mode as m:
+            assert m.active is True
+        # The connections are closed when exiting the mode.
+        assert m.controller.dbus_adapter._routers == dict()
+
+    asyncio.run(main())
+    assert results == [(5,), (9,)]
+
+
+@pytest.mark.usefixtures("dbus_calculator_service")
+def test_jeepney_dbus_adapter_after_fork(numberadd_method):
+    """The child process never uses the connection of the parent, even if the
+    parent is using it when forking."""
+    call = DbusMethodCall(numberadd_method, (2, 3))
+    adapter = JeepneyDbusAdapter()
+    assert adapter.process(call) == (5,)
+    bus = numberadd_method.bus
+    connection = JeepneyDbusAdapter._connections[bus][0]
+    parent_name = connection.unique_name
+    stop = threading.Event()
+    errors = []
+
+    def make_calls():
+        while not stop.is_set():
+            try:
+                assert adapter.process(call) == (5,)
+            except Exception as exc:
+                errors.append(exc)
+
+    threads = [threading.Thread(target=make_calls) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+
+    pids = []
+    try:
+        for _ in range(10):
+            pid = os.fork()
+            if pid == 0:
+                ok = False
+                try:
+                    result = adapter.process(call)
+                    child_connection = JeepneyDbusAdapter._connections[bus][0]
+                    ok = result == (5,) and child_connection.unique_name != parent_name
+                finally:
+                    os._exit(0 if ok else 1)
+            pids.append(pid)
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    assert [os.WEXITSTATUS(os.waitpid(pid, 0)[1]) for pid in pids] == [0] * 10
+    assert errors == []
+    # The parent still uses the same connection
+    assert adapter.process(call) == (5,)
+    assert JeepneyDbusAdapter._connections[numberadd_method.bus][0] is connection
+
+
+@pytest.fixture
+def no_session_bus(monkeypatch, tmp_path):
+    """No session bus: DBUS_SESSION_BUS_ADDRESS is not set, and there is no
+    bus at $XDG_RUNTIME_DIR/bus. The failed buses are remembered for 0.1
+    seconds."""
+    monkeypatch.delenv("DBUS_SESSION_BUS_ADDRESS", raising=False)
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+    monkeypatch.setattr(jeepney_adapters, "_bus_failures", dict())
+    monkeypatch.setattr(jeepney_adapters, "FAILED_BUS_TTL", 0.1)
+    monkeypatch.setattr(JeepneyDbusAdapter, "_connections", dict())
+    yield tmp_path
+    JeepneyDbusAdapter.close_connections()
+
+
+def test_get_bus_address(no_session_bus, monkeypatch, private_bus):
+    with pytest.raises(DbusNotFoundError, match="The session bus was not found"):
+        get_bus_address("SESSION")
+    assert get_bus_address(private_bus) == private_bus
+
+    # The default location of the session bus is used as a fallback
+    (no_session_bus / "bus").touch()
+    assert get_bus_address("SESSION") == f"unix:path={no_session_bus / 'bus'}"
+
+    monkeypatch.setenv("DBUS_SESSION_BUS_ADDRESS", private_bus)
+    assert get_bus_address("SESSION") == private_bus
+
+
+def test_jeepney_dbus_adapter_no_session_bus(
+    no_session_bus, monkeypatch, numberadd_method, private_bus
+):
+    adapter = JeepneyDbusAdapter()
+    session_method = numberadd_method.of(
+        DbusAddress(
+            bus="SESSION",
+            service=numberadd_method.service,
+            path=numberadd_method.path,
+            interface=numberadd_method.interface,
+        )
+    )
+    call = DbusMethodCall(session_method, (2, 3))
+
+    reason = adapter.check_bus("SESSION")
+    assert "The session bus was not found" in reason
+    # The failure is remembered; the bus is not looked for again.
+    monkeypatch.setenv("DBUS_SESSION_BUS_ADDRESS", private_bus)
+    assert adapter.check_bus("SESSION") == reason
+    with pytest.raises(DbusNotFoundError, match="The session bus was not found"):
+        adapter.process(call)
+
+    # ..until the FAILED_BUS_TTL has passed
+    time.sleep(0.1)
+    assert adapter.check_bus("SESSION") is None
+    assert "SESSION" in JeepneyDbusAdapter._connections
+
+
+def test_jeepney_dbus_adapter_bus_connection_fails(no_session_bus, monkeypatch):
+    # An address of a bus which does not exist.
+    monkeypatch.setenv(
+        "DBUS_SESSION_BUS_ADDRESS", f"unix:path={no_session_bus / 'nonexisting'}"
+    )
+    open_connection = Mock(wraps=open_dbus_connection)
+    monkeypatch.setattr(jeepney_adapters, "open_dbus_connection", open_connection)
+    adapter = JeepneyDbusAdapter()
+    reason = adapter.check_bus("SESSION")
+    assert reason.startswith("Could not connect to the SESSION bus")
+
+    async def check_bus_async():
+        return AsyncJeepneyDbusAdapter().check_bus("SESSION")
+
+    assert asyncio.run(check_bus_async()) == reason
+
+    # The failure is remembered; there are no new attempts to connect.
+    for _ in range(100):
+        assert adapter.check_bus("SESSION") == reason
+    assert open_connection.call_count == 1
+
+
+@pytest.mark.benchmark
+def test_jeepney_dbus_adapter_bus_connection_fails_benchmark(
+    no_session_bus, monkeypatch
+):
+    """Benchmark: Checking a bus which could not be connected to."""
+    monkeypatch.setenv(
+        "DBUS_SESSION_BUS_ADDRESS", f"unix:path={no_session_bus / 'nonexisting'}"
+    )
+    adapter = JeepneyDbusAdapter()
+    reason = adapter.check_bus("SESSION")
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        assert adapter.check_bus("SESSION") == reason
+    assert (time.perf_counter() - start) / 1000 < 20e-6
+
+
+def _wait_for(condition, timeout=5.0):
+    end = time.time() + timeout
+    while not condition():
+        if time.time() > end:
+            raise TimeoutError("Condition not met in time")
+        time.sleep(0.001)
+
+
+@pytest.mark.usefixtures("dbus_calculator_service")
+def test_jeepney_dbus_adapter_check_service(
+    calculator_service_addr, private_bus, monkeypatch
+):
+    JeepneyDbusAdapter.close_connections()
+    create_watcher = Mock(wraps=jeepney_adapters._BusNameWatcher)
+    monkeypatch.setattr(jeepney_adapters, "_BusNameWatcher", create_watcher)
+    adapter = JeepneyDbusAdapter()
+    service = "org.github.wakepy.TestCheckService"
+    assert adapter.check_service(private_bus, calculator_service_addr.service) is None
+    assert adapter.check_service(private_bus, service) == (
+        f'The D-Bus service "{service}" is not available on the {private_bus} bus'
+    )
+
+    # The names are kept up to date
+    with open_dbus_connection(bus=private_bus) as connection:
+        Proxy(jeepney.message_bus, connection).RequestName(service)
+        _wait_for(lambda: adapter.check_service(private_bus, service) is None)
+    _wait_for(lambda: adapter.check_service(private_bus, service) is not None)
+
+    # The names are listed once, by one watcher; the checks are set lookups.
+    watcher = jeepney_adapters._name_watchers[private_bus]
+    for _ in range(100):
+        adapter.check_service(private_bus, service)
+    assert create_watcher.call_count == 1
+    assert jeepney_adapters._name_watchers[private_bus] is watcher
+
+    # After closing the connections, the names are listed again
+    JeepneyDbusAdapter.close_connections()
+    assert watcher.running is False
+    assert adapter.check_service(private_bus, calculator_service_addr.service) is None
+    assert jeepney_adapters._name_watchers[private_bus] is not watcher
+    assert create_watcher.call_count == 2
+
+
+@pytest.mark.benchmark
+@pytest.mark.usefixtures("dbus_calculator_service")
+def test_jeepney_dbus_adapter_check_service_benchmark(
+    calculator_service_addr, private_bus
+):
+    """Benchmark: Checking if a service is on the bus, when the names on the
+    bus are already known."""
+    adapter = JeepneyDbusAdapter()
+    service = calculator_service_addr.service
+    assert adapter.check_service(private_bus, service) is None
+
+    n = 10_000
+    start = time.perf_counter()
+    for _ in range(n):
+        adapter.check_service(private_bus, service)
+    assert (time.perf_counter() - start) / n < 20e-6
+
+
+@pytest.mark.usefixtures("dbus_calculator_service")
+def test_jeepney_dbus_adapter_check_service_listing_fails(
+    calculator_service_addr, private_bus, monkeypatch
+):
+    monkeypatch.setattr(jeepney_adapters, "_name_listing_failures", dict())
+    monkeypatch.setattr(jeepney_adapters, "FAILED_BUS_TTL", 0.1)
+    JeepneyDbusAdapter.close_connections()
+    original_list_names = jeepney_adapters._BusNameWatcher._list_names
+    list_names = Mock(side_effect=TimeoutError("Timed out waiting for reply"))
+    monkeypatch.setattr(jeepney_adapters._BusNameWatcher, "_list_names", list_names)
+    adapter = JeepneyDbusAdapter()
+    service = calculator_service_addr.service
+
+    reason = adapter.check_service(private_bus, service)
+    assert reason == (
+        f"Could not list the names on the {private_bus} bus: "
+        "TimeoutError('Timed out waiting for reply')"
+    )
+    # The failure is remembered; the names are not listed again..
+    assert adapter.check_service(private_bus, service) == reason
+    assert list_names.call_count == 1
+
+    async def check_service_async():
+        return AsyncJeepneyDbusAdapter().check_service(private_bus, service)
+
+    assert asyncio.run(check_service_async()) == reason
+
+    # ..until the FAILED_BUS_TTL has passed
+    monkeypatch.setattr(
+        jeepney_adapters._BusNameWatcher, "_list_names", original_list_names
+    )
+    time.sleep(0.1)
+    assert adapter.check_service(private_bus, service) is None
+    JeepneyDbusAdapter.close_connections()
+
+
+def test_jeepney_dbus_adapter_check_service_no_bus(no_session_bus):
+    adapter = JeepneyDbusAdapter()
+    reason = adapter.check_service("SESSION", "org.freedesktop.ScreenSaver")
+    assert "The session bus was not found" in reason
@@ -6,6 +6,9 @@ Exception: ActivationResult is tested in it's own file
 import datetime as dt
 import os
 import re
+import threading
+import time
+import typing
 from contextlib import contextmanager
 from unittest.mock import Mock
 
@@ -20,8 +23,14 @@ from testmethods import (
     iterate_test_methods,
 )
 
-from wakepy.core import DbusAdapter, MethodActivationResult, get_methods
+from wakepy.core import (
+    CURRENT_PLATFORM,
+    DbusAdapter,
+    MethodActivationResult,
+    get_methods,
+)
 from wakepy.core.activation import (
+    ActivationStrategy,
     StageName,
     WakepyFakeSuccess,
     activate_method,
@@ -101,6 +110,542 @@ def test_activate_function_failure(monkeypatch):
     assert heartbeat is None
 
 
+def _get_slow_probe_methods(caniuse_delay: float, caniuse_calls: list):
+    """Methods where .caniuse() takes `caniuse_delay` seconds. The (method
+    name, thread name) of each .caniuse() call are recorded to `caniuse_calls`.
+    """
+
+    class SlowProbeMethod(Method):
+        mode = "_tests"
+        supported_platforms = (CURRENT_PLATFORM,)
+        result: bool | str = True
+
+        def caniuse(self):
+            caniuse_calls.append((self.name, threading.current_thread().name))
+            time.sleep(caniuse_delay)
+            return self.result
+
+        def enter_mode(self):
+            return
+
+    class SlowProbeA(SlowProbeMethod):
+        name = "SlowProbeA"
+        result = "A is not available"
+
+    class SlowProbeB(SlowProbeMethod):
+        name = "SlowProbeB"
+        result = "B is not available"
+
+    class SlowProbeC(SlowProbeMethod):
+        name = "SlowProbeC"
+
+    class SlowProbeD(SlowProbeMethod):
+        name = "SlowProbeD"
+
+    class OtherPlatform(SlowProbeMethod):
+        name = "OtherPlatform"
+        supported_platforms = (PlatformName.OTHER,)
+
+    return [SlowProbeA, SlowProbeB, SlowProbeC, SlowProbeD, OtherPlatform]
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_activate_mode_parallel_probe_same_result_as_sequential(monkeypatch):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    methods = _get_slow_probe_methods(caniuse_delay=0, caniuse_calls=[])
+    methods_priority = ["OtherPlatform", "SlowProbeA", "SlowProbeB", "SlowProbeC"]
+
+    results = dict()
+    for strategy in ActivationStrategy:
+        result, active_method, _ = activate_mode(
+            methods, methods_priority=methods_priority, strategy=strategy
+        )
+        assert result.success is True
+        assert isinstance(active_method, methods[2])
+        results[strategy] = result.query()
+
+    assert (
+        results[ActivationStrategy.SEQUENTIAL]
+        == results[ActivationStrategy.PARALLEL_PROBE]
+    )
+    assert [(r.method_name, r.success) for r in results["parallel-probe"]] == [
+        ("OtherPlatform", False),
+        ("SlowProbeA", False),
+        ("SlowProbeB", False),
+        ("SlowProbeC", True),
+    ]
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_activate_mode_parallel_probe_runs_checks_at_same_time(monkeypatch):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    caniuse_calls: list = []
+    delay = 0.2
+    methods = _get_slow_probe_methods(caniuse_delay=delay, caniuse_calls=caniuse_calls)
+
+    t0 = time.monotonic()
+    result, _, _ = activate_mode(
+        methods,
+        methods_priority=["SlowProbeA", "SlowProbeB", "SlowProbeC"],
+        strategy=ActivationStrategy.PARALLEL_PROBE,
+    )
+    elapsed = time.monotonic() - t0
+
+    # Sequentially, the first three methods would take 3 * delay.
+    assert elapsed < 2 * delay
+    assert result.active_method == "SlowProbeC"
+    # The checks are run in the thread pool, and the method for another
+    # platform is not checked at all.
+    assert {name for name, _ in caniuse_calls} <= {
+        "SlowProbeA",
+        "SlowProbeB",
+        "SlowProbeC",
+        "SlowProbeD",
+    }
+    assert all(thread.startswith("wakepy-probe") for _, thread in caniuse_calls)
+
+
+def test_activate_mode_timing(monkeypatch):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    methodcls_fail = get_test_method_class(caniuse="not available")
+    methodcls_success = get_test_method_class(enter_mode=None, heartbeat=None)
+
+    result, _, heartbeat = activate_mode(
+        [methodcls_fail, methodcls_success],
+        methods_priority=[methodcls_fail.name, methodcls_success.name],
+        timing=True,
+    )
+    heartbeat.stop()
+
+    assert result.total_time is not None and result.total_time > 0
+    res_fail, res_success = result.list_methods()
+    assert list(res_fail.stage_durations) == [
+        StageName.PLATFORM_SUPPORT,
+        StageName.REQUIREMENTS,
+    ]
+    assert res_fail.heartbeat_duration is None
+    assert list(res_success.stage_durations) == [
+        StageName.PLATFORM_SUPPORT,
+        StageName.REQUIREMENTS,
+        StageName.ACTIVATION,
+    ]
+    assert all(d >= 0 for d in res_success.stage_durations.values())
+    # The heartbeat is called as part of the ACTIVATION stage.
+    assert 0 <= res_success.heartbeat_duration
+    assert (
+        res_success.heartbeat_duration
+        <= res_success.stage_durations[StageName.ACTIVATION]
+    )
+    assert re.fullmatch(
+        r"\(SUCCESS, \w+ \[PLATFORM_SUPPORT: \d+\.\d{3}ms, REQUIREMENTS: "
+        r"\d+\.\d{3}ms, ACTIVATION: \d+\.\d{3}ms, heartbeat: \d+\.\d{3}ms\]\)",
+        repr(res_success),
+    )
+    assert "total_time=" in repr(result)
+
+
+def test_activate_mode_timing_disabled(monkeypatch):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    methodcls = get_test_method_class(enter_mode=None)
+
+    result, _, _ = activate_mode([methodcls])
+
+    assert result.total_time is None
+    assert result.list_methods()[0].stage_durations is None
+    assert result.list_methods()[0].heartbeat_duration is None
+    assert "total_time" not in repr(result)
+
+
+def test_activate_mode_unknown_strategy():
+    with pytest.raises(ValueError, match='Unknown activation strategy "foo"'):
+        activate_mode([], strategy="foo")
+
+
+def _get_blocking_methods(release: threading.Event, calls: list):
+    """Methods where .caniuse() (BlockingCaniuse) or .enter_mode()
+    (BlockingEnter) blocks until `release` is set. The calls of the
+    .enter_mode() and .exit_mode() are recorded to `calls`."""
+
+    class BlockingMethod(Method):
+        mode = "_tests"
+        supported_platforms = (CURRENT_PLATFORM,)
+
+        def enter_mode(self):
+            calls.append((self.name, "enter_mode"))
+
+        def exit_mode(self):
+            calls.append((self.name, "exit_mode"))
+
+    class BlockingCaniuse(BlockingMethod):
+        name = "BlockingCaniuse"
+
+        def caniuse(self):
+            release.wait()
+            return True
+
+    class BlockingEnter(BlockingMethod):
+        name = "BlockingEnter"
+
+        def enter_mode(self):
+            release.wait()
+            super().enter_mode()
+
+    class Fast(BlockingMethod):
+        name = "Fast"
+
+    return BlockingCaniuse, BlockingEnter, Fast
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+@pytest.mark.parametrize("strategy", list(ActivationStrategy))
+def test_activate_mode_method_timeout(monkeypatch, strategy):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    release, calls = threading.Event(), []
+    _, blocking_enter, fast = _get_blocking_methods(release, calls)
+
+    t0 = time.monotonic()
+    result, active_method, _ = activate_mode(
+        [blocking_enter, fast],
+        methods_priority=["BlockingEnter", "Fast"],
+        method_timeout=0.1,
+        strategy=strategy,
+    )
+    assert time.monotonic() - t0 < 1
+
+    # The slow method is abandoned, and the next one is used.
+    assert isinstance(active_method, fast)
+    res_timeout, res_success = result.list_methods()
+    assert res_timeout.success is False
+    assert res_timeout.timed_out is True
+    assert res_timeout.failure_stage == StageName.ACTIVATION
+    assert res_timeout.failure_reason == "Timed out after 0.1 seconds"
+    assert res_success.success is True
+    assert res_success.timed_out is False
+
+    # When the abandoned method succeeds later, the mode is exited with it.
+    release.set()
+    for _ in range(100):
+        if ("BlockingEnter", "exit_mode") in calls:
+            break
+        time.sleep(0.01)
+    assert calls == [
+        ("Fast", "enter_mode"),
+        ("BlockingEnter", "enter_mode"),
+        ("BlockingEnter", "exit_mode"),
+    ]
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_activate_mode_activation_timeout(monkeypatch):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    release, calls = threading.Event(), []
+    blocking_caniuse, blocking_enter, fast = _get_blocking_methods(release, calls)
+
+    try:
+        result, active_method, _ = activate_mode(
+            [blocking_caniuse, blocking_enter, fast],
+            methods_priority=["BlockingCaniuse", "BlockingEnter", "Fast"],
+            activation_timeout=0.1,
+        )
+    finally:
+        release.set()
+
+    assert result.success is False
+    assert active_method is None
+    # The time runs out when checking the requirements of the first method, and
+    # the rest of the methods are not used at all.
+    assert [
+        (r.method_name, r.success, r.failure_stage, r.timed_out)
+        for r in result.list_methods()
+    ] == [
+        ("BlockingCaniuse", False, StageName.REQUIREMENTS, True),
+        ("BlockingEnter", None, None, False),
+        ("Fast", None, None, False),
+    ]
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_activate_mode_method_timeout_thread_bound(monkeypatch):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    threads = []
+
+    class ThreadBound(Method):
+        name = "ThreadBound"
+        mode = "_test"
+        supported_platforms = (CURRENT_PLATFORM,)
+        thread_bound = True
+
+        def enter_mode(self):
+            threads.append(threading.current_thread())
+
+    # The thread bound method is entered in this thread, not in a short-lived
+    # activation thread.
+    result, active_method, _ = activate_mode([ThreadBound], method_timeout=1.0)
+    assert isinstance(active_method, ThreadBound)
+    assert result.success is True
+    assert threads == [threading.current_thread()]
+
+
+def test_activate_mode_timeouts_without_timeout(monkeypatch):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    methodcls_fail = get_test_method_class(caniuse="not available")
+    methodcls_success = get_test_method_class(enter_mode=None)
+
+    result, _, _ = activate_mode(
+        [methodcls_fail, methodcls_success],
+        methods_priority=[methodcls_fail.name, methodcls_success.name],
+        activation_timeout=5,
+        method_timeout=5,
+    )
+
+    assert [(r.success, r.failure_reason) for r in result.list_methods()] == [
+        (False, "not available"),
+        (True, ""),
+    ]
+
+
+def test_activate_mode_timeout_exceptions_are_raised(monkeypatch):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    methodcls = get_test_method_class(
+        enter_mode=None,
+        heartbeat=WakepyMethodTestError("foo"),
+        exit_mode=WakepyMethodTestError("bar"),
+    )
+
+    # An error from the activation thread is raised in the caller thread.
+    with pytest.raises(RuntimeError, match="could not exit"):
+        activate_mode([methodcls], method_timeout=5)
+
+
+@pytest.mark.parametrize("kwarg", ["activation_timeout", "method_timeout"])
+@pytest.mark.parametrize("value", [0, -1])
+def test_activate_mode_bad_timeout(kwarg, value):
+    with pytest.raises(ValueError, match=f"{kwarg} must be a positive number"):
+        activate_mode([], **{kwarg: value})
+
+
+def _get_race_methods(
+    enter_delay: float, calls: list, delays: typing.Optional[dict] = None
+):
+    """Methods where .enter_mode() takes `enter_delay` seconds (or the time in
+    `delays`, by method name). The calls of .enter_mode() and .exit_mode() are
+    recorded to `calls`. RaceA fails and the others succeed."""
+
+    class RaceMethod(Method):
+        mode = "_tests"
+        supported_platforms = (CURRENT_PLATFORM,)
+
+        def enter_mode(self):
+            time.sleep((delays or {}).get(str(self.name), enter_delay))
+            calls.append((self.name, "enter_mode"))
+
+        def exit_mode(self):
+            calls.append((self.name, "exit_mode"))
+
+    class RaceA(RaceMethod):
+        name = "RaceA"
+
+        def enter_mode(self):
+            raise RuntimeError("A fails")
+
+    class RaceB(RaceMethod):
+        name = "RaceB"
+
+    class RaceC(RaceMethod):
+        name = "RaceC"
+
+    class RaceOtherPlatform(RaceMethod):
+        name = "RaceOtherPlatform"
+        supported_platforms = (PlatformName.OTHER,)
+
+    class RaceD(RaceMethod):
+        name = "RaceD"
+
+    return [RaceA, RaceB, RaceC, RaceOtherPlatform, RaceD]
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_activate_mode_race(monkeypatch):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    monkeypatch.setattr("wakepy.core.activation.MAX_RACE_METHODS", 3)
+    calls: list = []
+    delay = 0.1
+    # RaceC finishes before the winner, and is rolled back right away.
+    methods = _get_race_methods(enter_delay=delay, calls=calls, delays={"RaceC": 0})
+
+    t0 = time.monotonic()
+    result, active_method, _ = activate_mode(
+        methods,
+        methods_priority=["RaceA", "RaceB", "RaceC", "RaceOtherPlatform", "RaceD"],
+        strategy=ActivationStrategy.RACE,
+    )
+    # The methods were started at the same time.
+    assert time.monotonic() - t0 < 2 * delay
+
+    assert isinstance(active_method, methods[1])
+    assert result.active_method == "RaceB"
+    assert result.started_methods == ["RaceA", "RaceB", "RaceC"]
+    assert result.rolled_back_methods == ["RaceC"]
+    assert [
+        (r.method_name, r.success, r.failure_stage)
+        for r in result.list_methods(ignore_platform_fails=False)
+    ] == [
+        ("RaceA", False, StageName.ACTIVATION),
+        ("RaceB", True, None),
+        ("RaceC", False, StageName.ACTIVATION),
+    ]
+    assert result.list_methods()[2].failure_reason.startswith("Rolled back")
+    # The loser is exited, and the method outside of the race is not used.
+    assert sorted(calls) == [
+        ("RaceB", "enter_mode"),
+        ("RaceC", "enter_mode"),
+        ("RaceC", "exit_mode"),
+    ]
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_activate_mode_race_does_not_wait_for_losers(monkeypatch):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    calls: list = []
+    fast, slow = 0.05, 1.0
+    methods = _get_race_methods(enter_delay=fast, calls=calls, delays={"RaceC": slow})
+
+    t0 = time.monotonic()
+    result, active_method, _ = activate_mode(
+        methods[:3],
+        methods_priority=["RaceA", "RaceB", "RaceC"],
+        strategy=ActivationStrategy.RACE,
+    )
+    # The winner is used as soon as it is ready; the slow loser is not waited
+    # for.
+    assert time.monotonic() - t0 < slow / 2
+    assert isinstance(active_method, methods[1])
+    assert result.started_methods == ["RaceA", "RaceB", "RaceC"]
+    assert result.rolled_back_methods == []
+    loser = result.list_methods()[2]
+    assert (loser.method_name, loser.success) == ("RaceC", False)
+    assert loser.failure_reason.startswith("Not waited for")
+
+    # The slow loser is rolled back in the background, when it finishes.
+    _wait_for_call(calls, ("RaceC", "exit_mode"))
+    assert calls == [
+        ("RaceB", "enter_mode"),
+        ("RaceC", "enter_mode"),
+        ("RaceC", "exit_mode"),
+    ]
+
+
+def _wait_for_call(calls: list, call: tuple, timeout: float = 5.0):
+    end = time.monotonic() + timeout
+    while call not in calls:
+        assert time.monotonic() < end, f"{call} was not called"
+        time.sleep(0.01)
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_activate_mode_race_fallback(monkeypatch):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    monkeypatch.setattr("wakepy.core.activation.MAX_RACE_METHODS", 1)
+    calls: list = []
+    methods = _get_race_methods(enter_delay=0, calls=calls)
+
+    # The only method in the race fails -> the rest are tried one by one.
+    result, active_method, _ = activate_mode(
+        methods,
+        methods_priority=["RaceA", "RaceB", "RaceC"],
+        strategy=ActivationStrategy.RACE,
+    )
+
+    assert isinstance(active_method, methods[1])
+    assert result.started_methods == ["RaceA"]
+    assert result.rolled_back_methods == []
+    assert [(r.method_name, r.success) for r in result.list_methods()] == [
+        ("RaceA", False),
+        ("RaceB", True),
+    ]
+    assert calls == [("RaceB", "enter_mode")]
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_activate_mode_race_fake_success(monkeypatch):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "1")
+    calls: list = []
+    methods = _get_race_methods(enter_delay=0, calls=calls)
+
+    result, active_method, _ = activate_mode(methods, strategy=ActivationStrategy.RACE)
+
+    # The fake method is used first, and nothing is raced.
+    assert result.active_method == WakepyFakeSuccess.name
+    assert isinstance(active_method, WakepyFakeSuccess)
+    assert result.started_methods == []
+    assert calls == []
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_activate_mode_race_rollback_fails(monkeypatch):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    calls: list = []
+    # The winner finishes last, so that the losers are rolled back right away.
+    methods = _get_race_methods(enter_delay=0, calls=calls, delays={"RaceB": 0.1})
+
+    class RaceBadExit(methods[1]):
+        name = "RaceBadExit"
+
+        def exit_mode(self):
+            calls.append((self.name, "exit_mode"))
+            raise RuntimeError("cannot exit")
+
+    # RaceB wins. RaceBadExit can not be rolled back, but RaceC still is, and
+    # the winner is deactivated.
+    with pytest.raises(RuntimeError, match="Could not roll back 1 method.*RaceBadExit"):
+        activate_mode(
+            [methods[1], RaceBadExit, methods[2]],
+            methods_priority=["RaceB", "RaceBadExit", "RaceC"],
+            strategy=ActivationStrategy.RACE,
+        )
+    assert sorted(call for call in calls if call[1] == "exit_mode") == [
+        ("RaceB", "exit_mode"),
+        ("RaceBadExit", "exit_mode"),
+        ("RaceC", "exit_mode"),
+    ]
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_activate_mode_race_thread_bound(monkeypatch):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    calls: list = []
+    methods = _get_race_methods(enter_delay=0, calls=calls)
+
+    class ThreadBound(methods[1]):
+        name = "ThreadBound"
+        thread_bound = True
+
+        def enter_mode(self):
+            calls.append((self.name, threading.current_thread().name))
+
+    # The thread bound method is not raced, but entered in this thread.
+    result, active_method, _ = activate_mode(
+        [methods[0], ThreadBound, methods[2]],
+        methods_priority=["RaceA", "ThreadBound", "RaceC"],
+        strategy=ActivationStrategy.RACE,
+    )
+    assert isinstance(active_method, ThreadBound)
+    assert result.started_methods == ["RaceA", "RaceC"]
+    assert ("ThreadBound", threading.current_thread().name) in calls
+    # RaceC lost, and is rolled back (right away, or in the background)
+    _wait_for_call(calls, ("RaceC", "exit_mode"))
+
+    # A thread bound method is not used, if a method with higher priority won.
+    calls.clear()
+    result, active_method, _ = activate_mode(
+        [ThreadBound, methods[2]],
+        methods_priority=["RaceC", "ThreadBound"],
+        strategy=ActivationStrategy.RACE,
+    )
+    assert result.active_method == "RaceC"
+    assert calls == [("RaceC", "enter_mode")]
+
+
 def _arrange_for_test_activate(monkeypatch):
     """This is the test arrangement step for tests for the
     `activate_mode` function"""
@@ -109,7 +654,7 @@ def _arrange_for_test_activate(monkeypatch):
     mocks.heartbeat = Mock(spec_set=Heartbeat)
     mocks.dbus_adapter = Mock(spec_set=DbusAdapter)
 
-    def fake_activate_method(method):
+    def fake_activate_method(method, **_):
         try:
             assert method.enter_mode() is None
             success = True
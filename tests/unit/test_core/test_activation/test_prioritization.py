@@ -1,14 +1,19 @@
 import re
+import time
+from unittest.mock import Mock
 
 import pytest
 
 from wakepy.core.activation import (
+    _get_checked_prioritized_methods,
+    _get_checked_prioritized_methods_cached,
     check_methods_priority,
+    get_checked_prioritized_methods,
     get_prioritized_methods,
     get_prioritized_methods_groups,
     sort_methods_by_priority,
 )
-from wakepy.core.method import PlatformName
+from wakepy.core.method import Method, PlatformName
 from wakepy.core.registry import get_methods
 
 
@@ -240,3 +245,101 @@ def test_get_prioritized_methods(monkeypatch):
     assert get_prioritized_methods(
         [LinuxA, LinuxB, WindowsA, WindowsB, LinuxC, MultiPlatformA],
     ) == [MultiPlatformA, WindowsA, WindowsB, LinuxA, LinuxB, LinuxC]
+
+
+@pytest.mark.usefixtures("provide_methods_different_platforms")
+def test_get_checked_prioritized_methods(monkeypatch):
+    WindowsA, LinuxA, LinuxB, MultiPlatformA = get_methods(
+        ["WinA", "LinuxA", "LinuxB", "multiA"]
+    )
+    methods = [WindowsA, LinuxA, LinuxB, MultiPlatformA]
+    monkeypatch.setattr("wakepy.core.activation.CURRENT_PLATFORM", PlatformName.LINUX)
+
+    prioritized = get_checked_prioritized_methods(
+        methods, methods_priority=[{"WinA", "LinuxB"}, "*"]
+    )
+    assert prioritized == (LinuxB, WindowsA, LinuxA, MultiPlatformA)
+    # Same arguments -> the cached tuple is returned
+    assert (
+        get_checked_prioritized_methods(
+            methods, methods_priority=[{"LinuxB", "WinA"}, "*"]
+        )
+        is prioritized
+    )
+
+    # Changing the platform changes the order
+    monkeypatch.setattr("wakepy.core.activation.CURRENT_PLATFORM", PlatformName.WINDOWS)
+    assert get_checked_prioritized_methods(
+        methods, methods_priority=[{"WinA", "LinuxB"}, "*"]
+    ) == (WindowsA, LinuxB, MultiPlatformA, LinuxA)
+
+    # Invalid methods_priority raises every time (also if not hashable)
+    for _ in range(2):
+        with pytest.raises(ValueError, match="Duplicate method name"):
+            get_checked_prioritized_methods(methods, methods_priority=["WinA", "WinA"])
+        with pytest.raises(TypeError, match="must be a list"):
+            get_checked_prioritized_methods(methods, methods_priority=[["WinA"]])
+
+
+@pytest.mark.usefixtures("provide_methods_different_platforms")
+def test_get_checked_prioritized_methods_registry_change():
+    methods = get_methods(["LinuxA", "LinuxB"])
+    get_checked_prioritized_methods(methods)
+    misses = _get_checked_prioritized_methods_cached.cache_info().misses
+
+    get_checked_prioritized_methods(methods)
+    assert _get_checked_prioritized_methods_cached.cache_info().misses == misses
+
+    class NewMethod(Method):
+        name = "NewMethod"
+        mode = "_test"
+
+    # A new Method was registered -> the cache is not used.
+    get_checked_prioritized_methods(methods)
+    assert _get_checked_prioritized_methods_cached.cache_info().misses == misses + 1
+
+
+@pytest.mark.usefixtures("provide_methods_different_platforms")
+def test_get_checked_prioritized_methods_cache_hits(monkeypatch):
+    """On the enter path, the methods are prioritized once for the same
+    arguments; the rest of the calls are cache hits."""
+    methods = tuple(
+        get_methods(["WinA", "WinB", "WinC", "LinuxA", "LinuxB", "LinuxC", "multiA"])
+    )
+    methods_priority = [{"WinA", "LinuxB"}, "LinuxA", "*", "WinC"]
+    prioritize = Mock(wraps=_get_checked_prioritized_methods)
+    monkeypatch.setattr(
+        "wakepy.core.activation._get_checked_prioritized_methods", prioritize
+    )
+    _get_checked_prioritized_methods_cached.cache_clear()
+
+    for _ in range(100):
+        get_checked_prioritized_methods(methods, methods_priority)
+
+    assert prioritize.call_count == 1
+    cache_info = _get_checked_prioritized_methods_cached.cache_info()
+    assert (cache_info.hits, cache_info.misses) == (99, 1)
+
+
+@pytest.mark.benchmark
+@pytest.mark.usefixtures("provide_methods_different_platforms")
+def test_get_checked_prioritized_methods_benchmark():
+    """Benchmark: The prioritization step on the enter path with and without
+    the cache."""
+    methods = tuple(
+        get_methods(["WinA", "WinB", "WinC", "LinuxA", "LinuxB", "LinuxC", "multiA"])
+    )
+    methods_priority = [{"WinA", "LinuxB"}, "LinuxA", "*", "WinC"]
+    n_calls = 2000
+
+    t0 = time.perf_counter()
+    for _ in range(n_calls):
+        _get_checked_prioritized_methods(methods, methods_priority)
+    time_without_cache = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for _ in range(n_calls):
+        get_checked_prioritized_methods(methods, methods_priority)
+    time_with_cache = time.perf_counter() - t0
+
+    assert time_with_cache * 5 < time_without_cache
@@ -0,0 +1,172 @@
+import json
+
+import pytest
+from testmethods import get_test_method_class
+
+from wakepy.core import cache
+from wakepy.core.activation import activate_mode
+from wakepy.core.cache import (
+    CachedPlan,
+    get_cache_path,
+    get_cached_plan,
+    get_environment_fingerprint,
+    remove_plan,
+    store_plan,
+)
+
+
+@pytest.fixture(autouse=True)
+def cache_home(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    monkeypatch.setenv("XDG_CURRENT_DESKTOP", "TestDesktop")
+    return tmp_path
+
+
+def test_cache_path(cache_home):
+    assert get_cache_path() == cache_home / "wakepy" / "activation-plans.json"
+
+
+def test_environment_fingerprint(monkeypatch):
+    fingerprint = get_environment_fingerprint()
+    assert get_environment_fingerprint() == fingerprint
+
+    monkeypatch.setenv("XDG_CURRENT_DESKTOP", "OtherDesktop")
+    assert get_environment_fingerprint() != fingerprint
+
+    monkeypatch.setenv("XDG_CURRENT_DESKTOP", "TestDesktop")
+    monkeypatch.setenv("DBUS_SESSION_BUS_ADDRESS", "unix:path=/foo/bar")
+    assert get_environment_fingerprint() != fingerprint
+
+
+def test_store_get_and_remove_plan():
+    assert get_cached_plan("mymode") is None
+
+    store_plan("mymode", winner="B", failed=("A",))
+    store_plan("othermode", winner="C", failed=())
+    assert get_cached_plan("mymode") == CachedPlan(winner="B", failed=("A",))
+    assert get_cached_plan("othermode") == CachedPlan(winner="C", failed=())
+
+    remove_plan("mymode")
+    assert get_cached_plan("mymode") is None
+    assert get_cached_plan("othermode") == CachedPlan(winner="C", failed=())
+    # Removing a non-existing plan does nothing
+    remove_plan("mymode")
+
+
+def test_plans_are_per_environment(monkeypatch):
+    store_plan("mymode", winner="B", failed=("A",))
+
+    monkeypatch.setenv("XDG_CURRENT_DESKTOP", "OtherDesktop")
+    assert get_cached_plan("mymode") is None
+    store_plan("mymode", winner="A", failed=())
+    assert get_cached_plan("mymode") == CachedPlan(winner="A", failed=())
+
+    monkeypatch.setenv("XDG_CURRENT_DESKTOP", "TestDesktop")
+    assert get_cached_plan("mymode") == CachedPlan(winner="B", failed=("A",))
+
+
+def test_max_environments(monkeypatch):
+    monkeypatch.setattr("wakepy.core.cache.MAX_ENVIRONMENTS", 2)
+    for desktop in ("first", "second", "third"):
+        monkeypatch.setenv("XDG_CURRENT_DESKTOP", desktop)
+        store_plan("mymode", winner=desktop, failed=())
+
+    with open(get_cache_path()) as f:
+        assert len(json.load(f)["environments"]) == 2
+
+    # The oldest one is removed.
+    monkeypatch.setenv("XDG_CURRENT_DESKTOP", "first")
+    assert get_cached_plan("mymode") is None
+    monkeypatch.setenv("XDG_CURRENT_DESKTOP", "third")
+    assert get_cached_plan("mymode") == CachedPlan(winner="third", failed=())
+
+
+@pytest.mark.parametrize("content", ["{not json", "[]", '{"environments": 1}'])
+def test_broken_cache_file(content):
+    get_cache_path().parent.mkdir(parents=True)
+    get_cache_path().write_text(content)
+    assert get_cached_plan("mymode") is None
+    # Overwrites the broken file.
+    store_plan("mymode", winner="B", failed=("A",))
+    assert get_cached_plan("mymode") == CachedPlan(winner="B", failed=("A",))
+
+
+def test_activate_mode_with_cache(monkeypatch):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    method_fail = get_test_method_class(enter_mode=RuntimeError("failed"))
+    method_success = get_test_method_class(enter_mode=None)
+    methods = [method_fail, method_success]
+    methods_priority = [method_fail.name, method_success.name]
+
+    def _activate():
+        return activate_mode(
+            methods,
+            methods_priority=methods_priority,
+            modename="cachedmode",
+            use_cache=True,
+        )[0]
+
+    # No cache -> the full priority order is used.
+    result = _activate()
+    assert [r.method_name for r in result.query()] == [
+        method_fail.name,
+        method_success.name,
+    ]
+    assert get_cached_plan("cachedmode") == CachedPlan(
+        winner=method_success.name, failed=(method_fail.name,)
+    )
+
+    # With cache -> the cached winner is tried first.
+    result = _activate()
+    assert [r.method_name for r in result.query()] == [method_success.name]
+    assert result.active_method == method_success.name
+
+    # A changed priority order does not match the cached plan.
+    methods_priority.reverse()
+    result = _activate()
+    assert [r.method_name for r in result.query()] == [method_success.name]
+    assert get_cached_plan("cachedmode") == CachedPlan(
+        winner=method_success.name, failed=()
+    )
+
+
+def test_activate_mode_with_cache_winner_fails(monkeypatch):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    method_a = get_test_method_class(enter_mode=None, exit_mode=None)
+    method_b = get_test_method_class(enter_mode=RuntimeError("B fails"))
+    methods = [method_a, method_b]
+    store_plan("cachedmode", winner=method_b.name, failed=(method_a.name,))
+
+    result, _, _ = activate_mode(
+        methods,
+        methods_priority=[method_a.name, method_b.name],
+        modename="cachedmode",
+        use_cache=True,
+    )
+
+    # The cached winner failed -> falls back to the rest of the methods.
+    assert [(r.method_name, r.success) for r in result.query()] == [
+        (method_b.name, False),
+        (method_a.name, True),
+    ]
+    assert get_cached_plan("cachedmode") == CachedPlan(winner=method_a.name, failed=())
+
+
+def test_activate_mode_with_cache_failure_removes_plan(monkeypatch):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    method_fail = get_test_method_class(enter_mode=RuntimeError("failed"))
+    store_plan("cachedmode", winner=method_fail.name, failed=())
+
+    result, _, _ = activate_mode([method_fail], modename="cachedmode", use_cache=True)
+    assert result.success is False
+    assert get_cached_plan("cachedmode") is None
+
+
+def test_activate_mode_fake_success_not_cached(monkeypatch):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "1")
+    method = get_test_method_class(enter_mode=None)
+
+    result, _, _ = activate_mode([method], modename="cachedmode", use_cache=True)
+    assert result.success is True
+    assert get_cached_plan("cachedmode") is None
+    assert not cache.get_cache_path().exists()
@@ -1,6 +1,16 @@
+import sys
+
 import pytest
 
-from wakepy.core.dbus import BusType, DbusAddress, DbusMethod, DbusMethodCall
+from wakepy.core.dbus import (
+    BusType,
+    DbusAdapter,
+    DbusAddress,
+    DbusMethod,
+    DbusMethodCall,
+    LazyDbusAdapter,
+    get_dbus_adapter,
+)
 
 session_manager = DbusAddress(
     bus=BusType.SESSION,
@@ -42,3 +52,98 @@ def test_dbus_method_to_call_not_fully_defined_method(method_inhibit, args_for_i
         ValueError, match="DbusMethodCall requires completely defined DBusMethod"
     ):
         method_inhibit.to_call(args_for_inhibit)
+
+
+@pytest.fixture
+def dbus_adapter_caches(monkeypatch):
+    for name in ("_process_wide_adapters", "_unavailable_adapters", "_lazy_adapters"):
+        monkeypatch.setattr(f"wakepy.core.dbus.{name}", dict())
+
+
+def _get_counting_adapter_class(fail: bool = False, process_wide: bool = True):
+    class CountingAdapter(DbusAdapter):
+        instances: list = []
+
+        def __init__(self):
+            if fail:
+                raise RuntimeError("Cannot use CountingAdapter")
+            self.instances.append(self)
+
+        def process(self, call):
+            return self
+
+    CountingAdapter.process_wide = process_wide
+    return CountingAdapter
+
+
+@pytest.mark.usefixtures("dbus_adapter_caches")
+def test_dbus_adapter_is_created_on_first_call(method_inhibit):
+    adapter_cls = _get_counting_adapter_class()
+    call = method_inhibit.of(session_manager).to_call(("a", 1, "b", 2))
+
+    adapter = get_dbus_adapter(adapter_cls)
+    assert isinstance(adapter, LazyDbusAdapter)
+    assert get_dbus_adapter(adapter_cls) is adapter
+    assert adapter_cls.instances == []
+
+    # One instance per process, shared by all the lazy adapters.
+    instance = adapter.process(call)
+    assert adapter_cls.instances == [instance]
+    assert get_dbus_adapter([adapter_cls]).process(call) is instance
+    assert adapter_cls.instances == [instance]
+
+
+@pytest.mark.usefixtures("dbus_adapter_caches")
+def test_unavailable_dbus_adapter_is_remembered(method_inhibit):
+    bad_cls = _get_counting_adapter_class(fail=True)
+    call = method_inhibit.of(session_manager).to_call(("a", 1, "b", 2))
+
+    adapter = get_dbus_adapter([bad_cls])
+    with pytest.raises(RuntimeError, match="Cannot use CountingAdapter"):
+        adapter.process(call)
+    with pytest.raises(RuntimeError, match="Cannot use CountingAdapter"):
+        adapter.process(call)
+    assert get_dbus_adapter([bad_cls]) is None
+
+    # The first usable adapter class is used
+    good_cls = _get_counting_adapter_class()
+    adapter = get_dbus_adapter([bad_cls, good_cls])
+    assert adapter.process(call) is good_cls.instances[0]
+
+
+@pytest.mark.usefixtures("dbus_adapter_caches")
+def test_default_dbus_adapter_not_installed(monkeypatch, method_inhibit):
+    # Importing the jeepney adapter raises ImportError
+    monkeypatch.setitem(sys.modules, "wakepy.dbus_adapters.jeepney", None)
+    call = method_inhibit.of(session_manager).to_call(("a", 1, "b", 2))
+
+    adapter = get_dbus_adapter()
+    assert isinstance(adapter, LazyDbusAdapter)
+    with pytest.raises(RuntimeError, match="jeepney.*not installed"):
+        adapter.process(call)
+    assert get_dbus_adapter() is None
+
+
+@pytest.mark.usefixtures("dbus_adapter_caches")
+def test_dbus_adapter_not_process_wide():
+    adapter_cls = _get_counting_adapter_class(process_wide=False)
+    adapters = [get_dbus_adapter(adapter_cls) for _ in range(2)]
+    assert adapters == adapter_cls.instances
+    assert adapters[0] is not adapters[1]
+
+    bad_cls = _get_counting_adapter_class(fail=True, process_wide=False)
+    with pytest.raises(RuntimeError, match="Cannot use CountingAdapter"):
+        get_dbus_adapter(bad_cls)
+    assert get_dbus_adapter([bad_cls]) is None
+
+
+@pytest.mark.usefixtures("dbus_adapter_caches")
+def test_lazy_dbus_adapter_check_bus_and_service():
+    adapter = get_dbus_adapter(_get_counting_adapter_class())
+    assert adapter.check_bus(BusType.SESSION) is None
+    assert adapter.check_service(BusType.SESSION, "org.example.Service") is None
+
+    adapter = get_dbus_adapter(_get_counting_adapter_class(fail=True))
+    assert "Cannot use CountingAdapter" in adapter.check_bus(BusType.SESSION)
+    reason = adapter.check_service(BusType.SESSION, "org.example.Service")
+    assert "Cannot use CountingAdapter" in reason
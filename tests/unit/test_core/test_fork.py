@@ -0,0 +1,192 @@
+"""Tests for the fork safety (wakepy/core/fork.py) of the Modes and the
+Heartbeats."""
+
+import os
+import signal
+import sys
+import threading
+import time
+import traceback
+
+import pytest
+
+from wakepy.core import CURRENT_PLATFORM, Method, Mode
+from wakepy.core import heartbeat as heartbeat_module
+from wakepy.core.fork import get_fork_generation
+from wakepy.core.mode import release_lingering_modes
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(os, "register_at_fork"), reason="Needs os.fork"
+)
+
+
+def run_in_child(func, timeout=10.0) -> int:
+    """Runs `func` in a forked child process, and returns the exit code of the
+    child: 0 if `func` returned a truthy value, 1 if falsy and 2 if it raised.
+    Kills the child if it does not exit in `timeout` seconds (for example,
+    because of a deadlock) and returns -1."""
+    pid = os.fork()
+    if pid == 0:
+        code = 2
+        try:
+            code = 0 if func() else 1
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            os._exit(code)
+
+    end = time.time() + timeout
+    while time.time() < end:
+        finished_pid, status = os.waitpid(pid, os.WNOHANG)
+        if finished_pid:
+            return os.WEXITSTATUS(status)
+        time.sleep(0.01)
+    os.kill(pid, signal.SIGKILL)
+    os.waitpid(pid, 0)
+    return -1
+
+
+def _get_logging_method(logfile, heartbeat_period=60.0):
+    """A Method which writes the enter_mode(), exit_mode() and heartbeat()
+    calls with the process ids into the `logfile`."""
+
+    def log(event: str):
+        with open(logfile, "a") as f:
+            f.write(f"{event} {os.getpid()}\n")
+
+    class LoggingMethod(Method):
+        name = "LoggingMethod"
+        mode = "_test"
+        supported_platforms = (CURRENT_PLATFORM,)
+
+        def enter_mode(self):
+            log("enter")
+
+        def exit_mode(self):
+            log("exit")
+
+        def heartbeat(self):
+            log("heartbeat")
+
+    LoggingMethod.heartbeat_period = heartbeat_period
+    return LoggingMethod
+
+
+def _read_log(logfile):
+    if not logfile.exists():
+        return []
+    return [tuple(line.split()) for line in logfile.read_text().splitlines()]
+
+
+def test_fork_generation():
+    generation = get_fork_generation()
+    assert run_in_child(lambda: get_fork_generation() == generation + 1) == 0
+    assert get_fork_generation() == generation
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+@pytest.mark.parametrize("kwargs", [{}, {"shared": True}, {"linger": 60}])
+def test_inherited_mode_is_not_exited_in_child(monkeypatch, tmp_path, kwargs):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    monkeypatch.setattr("wakepy.core.mode._shared_activations", dict())
+    logfile = tmp_path / "log"
+    method_cls = _get_logging_method(logfile, heartbeat_period=0.01)
+    mode = Mode([method_cls], name="fork", **kwargs)
+    parent = str(os.getpid())
+
+    def child():
+        heartbeat = mode.controller.heartbeat
+        assert heartbeat is None or heartbeat.running is False
+        # Exiting the mode of the parent does nothing in the child.
+        mode.__exit__(None, None, None)
+        assert mode.controller.active_method is None
+        # The child can use its own modes, with a new heartbeat scheduler.
+        with Mode([method_cls], name="fork", **kwargs) as m:
+            assert m.active
+            heartbeat = m.controller.heartbeat
+            assert heartbeat is not None and heartbeat.running
+            time.sleep(0.05)
+        release_lingering_modes()
+        return True
+
+    with mode:
+        time.sleep(0.05)
+        assert run_in_child(child) == 0
+        child_events = [e for e in _read_log(logfile) if e[1] != parent]
+        assert mode.controller.heartbeat.running
+
+    events = _read_log(logfile)
+    assert events[0] == ("enter", parent)
+    # The child entered and exited its own mode once, and never exited the
+    # mode of the parent.
+    child_pid = child_events[0][1]
+    assert [e[0] for e in child_events if e[0] != "heartbeat"] == ["enter", "exit"]
+    assert ("heartbeat", child_pid) in child_events
+
+    release_lingering_modes()
+    assert _read_log(logfile)[-1] == ("exit", parent)
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_fork_under_load(monkeypatch, tmp_path):
+    """Forks repeatedly while other threads enter and exit shared modes and
+    run heartbeats. The children must never deadlock on the locks held by the
+    threads of the parent (which do not exist in the child), and must never
+    exit the modes of the parent."""
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    monkeypatch.setattr(heartbeat_module, "_scheduler", None)
+    monkeypatch.setattr("wakepy.core.mode._shared_activations", dict())
+    logfile = tmp_path / "log"
+    method_cls = _get_logging_method(logfile, heartbeat_period=0.001)
+    stop = threading.Event()
+
+    def hammer():
+        while not stop.is_set():
+            with Mode([method_cls], name="load", shared=True):
+                pass
+            with Mode([method_cls], name="load-other"):
+                pass
+
+    def child():
+        with Mode([method_cls], name="load", shared=True) as m:
+            assert m.active
+        return True
+
+    threads = [threading.Thread(target=hammer) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    try:
+        with Mode([method_cls], name="load", shared=True):
+            exit_codes = [run_in_child(child) for _ in range(30)]
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    assert exit_codes == [0] * 30
+    n_enter = sum(1 for event, _ in _read_log(logfile) if event == "enter")
+    n_exit = sum(1 for event, _ in _read_log(logfile) if event == "exit")
+    assert n_enter == n_exit
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="No file locks on Windows")
+@pytest.mark.usefixtures("empty_method_registry")
+def test_inherited_interprocess_mode(monkeypatch, tmp_path):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+    logfile = tmp_path / "log"
+    method_cls = _get_logging_method(logfile)
+
+    def child():
+        # The lock of the parent is not inherited, so the mode of the parent
+        # can not be exited from the child, and the parent stays the leader.
+        mode.__exit__(None, None, None)
+        with Mode([method_cls], name="fork", interprocess=True) as m:
+            return m.active and m.controller.is_leader is False
+
+    with Mode([method_cls], name="fork", interprocess=True) as mode:
+        assert mode.controller.is_leader
+        assert run_in_child(child) == 0
+
+    events = [event for event, _ in _read_log(logfile) if event != "heartbeat"]
+    assert events == ["enter", "exit"]
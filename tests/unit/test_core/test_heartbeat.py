@@ -0,0 +1,406 @@
+import ctypes
+import datetime as dt
+import threading
+import time
+from unittest.mock import Mock
+
+import pytest
+
+from wakepy.core import CURRENT_PLATFORM, Method, PlatformName
+from wakepy.core.activation import activate_method, deactivate_method
+from wakepy.core.heartbeat import (
+    Heartbeat,
+    HeartbeatScheduler,
+    get_heartbeat_scheduler,
+    set_timer_slack,
+)
+
+PERIOD = 0.05
+
+
+def _get_heartbeat_method(
+    calls: list,
+    heartbeat=None,
+    period=PERIOD,
+    method_name="HeartbeatMethod",
+    tolerance=0,
+):
+    """A Method which records the time.monotonic() of the heartbeat() calls to
+    `calls`. If `heartbeat` is given, it is called in the heartbeat()."""
+
+    class HeartbeatMethod(Method):
+        name = method_name
+        mode = "_test"
+        supported_platforms = (CURRENT_PLATFORM,)
+        heartbeat_period = period
+        heartbeat_tolerance = tolerance
+
+        def heartbeat(self):
+            calls.append(time.monotonic())
+            if heartbeat is not None:
+                return heartbeat()
+
+    return HeartbeatMethod()
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    """A fresh process-wide HeartbeatScheduler for the test."""
+    scheduler = HeartbeatScheduler()
+    monkeypatch.setattr("wakepy.core.heartbeat._scheduler", scheduler)
+    return scheduler
+
+
+def _wait_for(condition, timeout=2.0):
+    t_end = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < t_end, "timed out"
+        time.sleep(0.005)
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_heartbeat_calls_heartbeat_periodically():
+    calls: list = []
+    method = _get_heartbeat_method(calls)
+    heartbeat = Heartbeat(method, dt.datetime.now(dt.timezone.utc))
+
+    t0 = time.monotonic()
+    assert heartbeat.start() is True
+    assert heartbeat.running is True
+    # Cannot be started twice
+    assert heartbeat.start() is False
+    _wait_for(lambda: len(calls) >= 4)
+    assert heartbeat.stop() is True
+    assert heartbeat.running is False
+
+    # The calls are scheduled from the start (the activation), on a fixed
+    # schedule (no drift).
+    n_calls = len(calls)
+    for i, call in enumerate(calls, start=1):
+        assert call - t0 == pytest.approx(i * PERIOD, abs=PERIOD / 2)
+    assert heartbeat.n_calls == n_calls
+    assert heartbeat.errors == []
+    assert heartbeat.missed_deadlines == 0
+    assert isinstance(heartbeat.prev_call, dt.datetime)
+
+    # No calls after stop()
+    time.sleep(2 * PERIOD)
+    assert len(calls) == n_calls
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_heartbeat_schedule_from_heartbeat_call_time():
+    calls: list = []
+    method = _get_heartbeat_method(calls, period=0.5)
+    # The previous call was made 0.45 seconds ago -> next call in ~0.05 s
+    prev_call = dt.datetime.now(dt.timezone.utc) - dt.timedelta(seconds=0.45)
+    heartbeat = Heartbeat(method, prev_call)
+
+    t0 = time.monotonic()
+    heartbeat.start()
+    _wait_for(lambda: len(calls) >= 1)
+    heartbeat.stop()
+    assert calls[0] - t0 < 0.3
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_heartbeat_stops_promptly():
+    calls: list = []
+    method = _get_heartbeat_method(calls, period=60)
+    heartbeat = Heartbeat(method)
+    heartbeat.start()
+
+    t0 = time.monotonic()
+    assert heartbeat.stop() is True
+    assert time.monotonic() - t0 < 0.5
+    assert calls == []
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_heartbeat_stop_timeout():
+    release = threading.Event()
+    calls: list = []
+    method = _get_heartbeat_method(calls, heartbeat=release.wait)
+    heartbeat = Heartbeat(method)
+    heartbeat.stop_timeout = 0.05
+    heartbeat.start()
+    _wait_for(lambda: len(calls) == 1)
+
+    # The ongoing heartbeat() call does not finish in time
+    assert heartbeat.stop() is False
+    release.set()
+    assert heartbeat.stop() is True
+
+
+def test_heartbeat_stop_without_start():
+    assert Heartbeat(Method()).stop() is True
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_heartbeat_missed_deadlines():
+    calls: list = []
+    # Every call takes 2.5 periods -> after every call, one deadline is missed
+    # (late by more than a period), and the next one is late by half a period.
+    method = _get_heartbeat_method(calls, heartbeat=lambda: time.sleep(2.5 * PERIOD))
+    heartbeat = Heartbeat(method)
+    heartbeat.start()
+    _wait_for(lambda: len(calls) >= 3)
+    assert heartbeat.stop() is True
+
+    assert heartbeat.missed_deadlines >= 2
+    # The missed calls are not made afterwards in a burst.
+    for prev, call in zip(calls, calls[1:]):
+        assert call - prev == pytest.approx(2.5 * PERIOD, abs=PERIOD / 2)
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_heartbeat_errors():
+    def failing_heartbeat():
+        if len(calls) == 1:
+            raise RuntimeError("oh no")
+        if len(calls) == 2:
+            return "not None"
+
+    calls: list = []
+    method = _get_heartbeat_method(calls, heartbeat=failing_heartbeat)
+    heartbeat = Heartbeat(method)
+    heartbeat.start()
+    _wait_for(lambda: len(calls) >= 3)
+    heartbeat.stop()
+
+    # The errors are recorded, and the heartbeat() calls continue.
+    assert [err.message for err in heartbeat.errors] == [
+        "RuntimeError('oh no')",
+        "ValueError('The heartbeat of HeartbeatMethod (HeartbeatMethod) returned an "
+        "unsupported value not None. The only accepted return value is None')",
+    ]
+    assert all(isinstance(err.call_time, dt.datetime) for err in heartbeat.errors)
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_heartbeat_bad_period():
+    method = _get_heartbeat_method([], period=0)
+    with pytest.raises(ValueError, match="heartbeat_period of HeartbeatMethod must"):
+        Heartbeat(method).start()
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_activate_and_deactivate_method_with_heartbeat():
+    calls: list = []
+    method = _get_heartbeat_method(calls)
+
+    result, heartbeat = activate_method(method)
+    assert result.success is True
+    # The first call is made in the activation
+    assert len(calls) == 1
+    assert heartbeat is not None and heartbeat.running
+    _wait_for(lambda: len(calls) >= 3)
+
+    deactivate_method(method, heartbeat)
+    assert heartbeat.running is False
+    n_calls = len(calls)
+    time.sleep(2 * PERIOD)
+    assert len(calls) == n_calls
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_heartbeats_share_the_scheduler(scheduler):
+    calls = [[] for _ in range(20)]
+    heartbeats = [
+        Heartbeat(_get_heartbeat_method(c, method_name=f"HeartbeatMethod{i}"))
+        for i, c in enumerate(calls)
+    ]
+    for heartbeat in heartbeats:
+        heartbeat.start()
+    assert get_heartbeat_scheduler() is scheduler
+    assert len(scheduler) == 20
+
+    _wait_for(lambda: all(len(c) >= 2 for c in calls))
+    # One scheduler thread and at most max_workers worker threads
+    assert scheduler.n_threads <= 1 + scheduler.max_workers
+
+    # Stopping one Heartbeat does not affect the others.
+    heartbeats[0].stop()
+    n_calls = len(calls[0])
+    _wait_for(lambda: all(len(c) >= n_calls + 2 for c in calls[1:]))
+    assert len(calls[0]) == n_calls
+
+    for heartbeat in heartbeats[1:]:
+        heartbeat.stop()
+    assert len(scheduler) == 0
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_slow_heartbeat_does_not_block_others(scheduler):
+    release = threading.Event()
+    slow_calls: list = []
+    slow = Heartbeat(
+        _get_heartbeat_method(slow_calls, heartbeat=release.wait, method_name="Slow")
+    )
+    calls: list = []
+    fast = Heartbeat(_get_heartbeat_method(calls))
+
+    slow.start()
+    fast.start()
+    _wait_for(lambda: len(slow_calls) == 1 and len(calls) >= 3)
+    assert len(slow_calls) == 1
+
+    release.set()
+    assert slow.stop() is True
+    assert fast.stop() is True
+    assert fast.missed_deadlines == 0
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_heartbeat_bad_tolerance():
+    method = _get_heartbeat_method([], tolerance=-1)
+    with pytest.raises(ValueError, match="heartbeat_tolerance of HeartbeatMethod"):
+        Heartbeat(method).start()
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_heartbeat_tolerance_is_capped_to_period():
+    assert Heartbeat(_get_heartbeat_method([], tolerance=1)).tolerance == PERIOD
+
+
+class _StopScheduler(Exception):
+    pass
+
+
+class _FakeClockCondition:
+    """Replaces the Condition of a HeartbeatScheduler, for running the
+    scheduler thread loop on a fake clock: wait(timeout) returns right away
+    and moves the clock forward by `timeout`. Stops the loop when the clock
+    would reach `end`."""
+
+    def __init__(self, end: float):
+        self.now = 0.0
+        self.end = end
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return None
+
+    def notify(self):
+        pass
+
+    def wait(self, timeout=None):
+        if timeout is None or self.now + timeout >= self.end:
+            raise _StopScheduler
+        self.now += timeout
+
+
+def _count_wakeups(tolerance: float, monkeypatch) -> int:
+    """Runs the scheduler thread loop (in this thread) on a fake clock: Ten
+    heartbeats, with deadlines 1/64 seconds apart and a period of 0.25
+    seconds, for four periods. The workers are replaced by calling the
+    heartbeats right away. Returns the number of wakeups."""
+    monkeypatch.setattr("wakepy.core.heartbeat.set_timer_slack", Mock())
+    scheduler = HeartbeatScheduler()
+    cond = _FakeClockCondition(end=1.125)
+    scheduler._cond = cond  # type: ignore[assignment]
+    scheduler._clock = lambda: cond.now
+    period = 0.25
+    heartbeats = [Mock(spec=Heartbeat) for _ in range(10)]
+    calls: dict = {heartbeat: [] for heartbeat in heartbeats}
+
+    def _submit(heartbeat, deadline):
+        # Called within the tolerance window; never after the deadline.
+        assert deadline - tolerance <= cond.now <= deadline
+        calls[heartbeat].append(cond.now)
+        scheduler._push(heartbeat, deadline + period, tolerance)
+
+    monkeypatch.setattr(scheduler, "_submit", _submit)
+    for i, heartbeat in enumerate(heartbeats):
+        scheduler._push(heartbeat, period / 2 + i / 64, tolerance)
+
+    with pytest.raises(_StopScheduler):
+        scheduler._run()
+
+    # No heartbeats were skipped, and no threads were started.
+    assert all(len(c) == 4 for c in calls.values())
+    assert scheduler.n_threads == 0
+    return scheduler.n_wakeups
+
+
+def test_heartbeats_within_tolerance_are_batched(monkeypatch):
+    # Without tolerance, each of the ten heartbeats needs its own wakeup. With
+    # a tolerance larger than the spread of the deadlines, the heartbeats are
+    # called in one batch.
+    assert _count_wakeups(0, monkeypatch) == 40
+    assert _count_wakeups(10 / 64, monkeypatch) == 4
+    # A tolerance smaller than the spread of the deadlines gives a few
+    # batches per period.
+    assert _count_wakeups(2 / 64, monkeypatch) == 16
+
+
+@pytest.mark.skipif(
+    CURRENT_PLATFORM != PlatformName.LINUX, reason="Timer slack is Linux only"
+)
+def test_set_timer_slack():
+    pr_get_timerslack = 30
+    prctl = ctypes.CDLL(None).prctl
+    slacks = []
+
+    def _set_and_get_slack():
+        for slack in (0.1, 0):
+            set_timer_slack(slack)
+            slacks.append(prctl(pr_get_timerslack, 0, 0, 0, 0))
+
+    # In a separate thread, as the timer slack is per thread.
+    thread = threading.Thread(target=_set_and_get_slack)
+    thread.start()
+    thread.join()
+    assert slacks[0] == 100_000_000
+    # Zero resets to the default slack
+    assert 0 < slacks[1] < 100_000_000
+
+
+def test_scheduler_cancel():
+    scheduler = HeartbeatScheduler()
+    heartbeats = [Heartbeat(Method()) for _ in range(10)]
+    for heartbeat in heartbeats:
+        scheduler.add(heartbeat, time.monotonic() + 60)
+    assert len(scheduler) == 10
+
+    # Re-adding replaces the earlier scheduled call.
+    scheduler.add(heartbeats[0], time.monotonic() + 30)
+    assert len(scheduler) == 10
+
+    for heartbeat in heartbeats[:8]:
+        scheduler.cancel(heartbeat)
+    # Cancelling twice does nothing
+    scheduler.cancel(heartbeats[0])
+    assert len(scheduler) == 2
+    # The cancelled entries are removed from the heap once they are the
+    # majority.
+    assert len(scheduler._heap) < 10
+
+
+@pytest.mark.benchmark
+@pytest.mark.usefixtures("empty_method_registry")
+def test_scheduler_benchmark(scheduler):
+    """Benchmark: The threads of the scheduler with 1, 100 and 10000 running
+    Heartbeats. With one thread per Heartbeat, the number of threads would
+    grow with the number of Heartbeats."""
+    period = 0.2
+    duration = 0.5
+    for n_heartbeats in (1, 100, 10000):
+        counter: list = []
+        method_class = type(
+            _get_heartbeat_method(
+                counter, period=period, method_name=f"HeartbeatMethod{n_heartbeats}"
+            )
+        )
+        methods = [method_class() for _ in range(n_heartbeats)]
+        heartbeats = [Heartbeat(method) for method in methods]
+        for heartbeat in heartbeats:
+            heartbeat.start()
+        time.sleep(duration)
+        for heartbeat in heartbeats:
+            heartbeat.stop()
+
+        assert scheduler.n_threads <= 1 + scheduler.max_workers
+        assert len(counter) >= n_heartbeats
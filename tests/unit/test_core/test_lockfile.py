@@ -0,0 +1,224 @@
+"""Tests for the lock files used for coordinating the modes between processes
+(wakepy/core/lockfile.py), and for the Modes using them."""
+
+import multiprocessing
+import os
+import signal
+import sys
+import time
+
+import pytest
+
+from wakepy.core import CURRENT_PLATFORM, Method, Mode
+from wakepy.core.lockfile import LeaderLock, LeaderState, get_lock_path
+from wakepy.core.mode import InterprocessModeController
+
+pytestmark = pytest.mark.skipif(
+    sys.platform == "win32", reason="No file locks on Windows"
+)
+
+
+@pytest.fixture
+def runtime_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_get_lock_path(runtime_dir, monkeypatch):
+    assert get_lock_path("keep.running") == runtime_dir / "wakepy" / "keep.running"
+    assert get_lock_path("a/b c") == runtime_dir / "wakepy" / "a_b_c"
+
+    monkeypatch.delenv("XDG_RUNTIME_DIR")
+    assert get_lock_path("keep.running") is None
+
+
+def test_leader_lock(runtime_dir):
+    path = runtime_dir / "wakepy" / "test"
+    leader = LeaderLock(path)
+    follower = LeaderLock(path)
+    assert oct(path.parent.stat().st_mode & 0o777) == oct(0o700)
+
+    assert leader.try_acquire() is True
+    assert leader.try_acquire() is True
+    assert follower.try_acquire() is False
+    # The leader has not activated the mode yet
+    assert follower.read_state() is None
+
+    leader.write_state("SomeMethod")
+    assert follower.read_state() == LeaderState(os.getpid(), "SomeMethod")
+
+    leader.close()
+    assert follower.read_state() is None
+    assert follower.try_acquire() is True
+    assert follower.is_leader is True
+    follower.close()
+    # Closing twice is fine
+    follower.close()
+
+
+def test_leader_lock_stale_state(runtime_dir):
+    path = runtime_dir / "wakepy" / "test"
+    path.parent.mkdir()
+    # Left behind by a leader which crashed
+    path.write_text("12345 SomeMethod\n")
+
+    lock = LeaderLock(path)
+    assert lock.try_acquire() is True
+    assert lock.read_state() is None
+    lock.close()
+
+
+def _get_logging_method(logfile):
+    """A Method which writes the enter_mode() and exit_mode() calls with the
+    process ids into the `logfile`."""
+
+    def log(event: str):
+        with open(logfile, "a") as f:
+            f.write(f"{event} {os.getpid()}\n")
+
+    class LoggingMethod(Method):
+        name = "LoggingMethod"
+        mode = "_test"
+        supported_platforms = (CURRENT_PLATFORM,)
+
+        def enter_mode(self):
+            log("enter")
+
+        def exit_mode(self):
+            log("exit")
+
+    return LoggingMethod
+
+
+def _read_log(logfile):
+    if not logfile.exists():
+        return []
+    return [tuple(line.split()) for line in logfile.read_text().splitlines()]
+
+
+def _wait_for(condition, timeout=5.0):
+    end = time.time() + timeout
+    while not condition():
+        if time.time() > end:
+            raise TimeoutError("Condition not met in time")
+        time.sleep(0.01)
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_interprocess_mode(runtime_dir, monkeypatch):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    monkeypatch.setattr(InterprocessModeController, "poll_interval", 0.01)
+    logfile = runtime_dir / "log"
+    method_cls = _get_logging_method(logfile)
+    mode1 = Mode([method_cls], name="interprocess", interprocess=True)
+    mode2 = Mode([method_cls], name="interprocess", interprocess=True)
+    pid = str(os.getpid())
+
+    with mode1:
+        assert mode1.controller.is_leader is True
+        with mode2:
+            # The follower does not activate anything, but sees the Method
+            # used by the leader.
+            assert mode2.active is True
+            assert mode2.activation_result.active_method == "LoggingMethod"
+            assert mode2.controller.is_leader is False
+            assert _read_log(logfile) == [("enter", pid)]
+
+            mode1.__exit__(None, None, None)
+            # The follower takes over
+            _wait_for(lambda: len(_read_log(logfile)) == 3)
+            _wait_for(lambda: mode2.controller.is_leader)
+            assert mode2.active is True
+        assert _read_log(logfile)[2:] == [("enter", pid), ("exit", pid)]
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_interprocess_mode_takeover_fails(runtime_dir, monkeypatch):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    monkeypatch.setattr(InterprocessModeController, "poll_interval", 0.01)
+    logfile = runtime_dir / "log"
+    method_cls = _get_logging_method(logfile)
+    failures = []
+    mode1 = Mode([method_cls], name="interprocess", interprocess=True)
+    mode2 = Mode(
+        [method_cls], name="interprocess", interprocess=True, on_fail=failures.append
+    )
+
+    with mode1:
+        with mode2:
+            assert mode2.active is True
+            # The Method does not work anymore when the follower takes over
+            monkeypatch.setattr(method_cls, "enter_mode", lambda self: "fails")
+            mode1.__exit__(None, None, None)
+            _wait_for(lambda: len(failures) == 1)
+            assert mode2.active is False
+            assert mode2.activation_result is failures[0]
+            assert mode2.activation_result.success is False
+            assert mode2.controller.is_leader is False
+        assert _read_log(logfile)[1:] == [("exit", str(os.getpid()))]
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_interprocess_mode_without_runtime_dir(monkeypatch):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    monkeypatch.delenv("XDG_RUNTIME_DIR", raising=False)
+    method_cls = _get_logging_method(os.devnull)
+
+    # Without the lock files, each Mode activates on its own.
+    with Mode([method_cls], name="interprocess", interprocess=True) as mode1:
+        with Mode([method_cls], name="interprocess", interprocess=True) as mode2:
+            assert mode1.controller.is_leader is True
+            assert mode2.controller.is_leader is True
+
+
+def _worker(method_cls, ready, stop):
+    with Mode([method_cls], name="interprocess", interprocess=True) as mode:
+        ready.put((os.getpid(), mode.active, mode.controller.is_leader))
+        stop.wait(10)
+
+
+@pytest.mark.skipif(sys.platform != "linux", reason="Uses fork")
+@pytest.mark.usefixtures("empty_method_registry")
+def test_interprocess_mode_multiprocessing(runtime_dir, monkeypatch):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    monkeypatch.setattr(InterprocessModeController, "poll_interval", 0.01)
+    logfile = runtime_dir / "log"
+    method_cls = _get_logging_method(logfile)
+    ctx = multiprocessing.get_context("fork")
+    ready = ctx.Queue()
+    stops = [ctx.Event() for _ in range(3)]
+    processes = [
+        ctx.Process(target=_worker, args=(method_cls, ready, stop)) for stop in stops
+    ]
+    try:
+        processes[0].start()
+        assert ready.get(timeout=5) == (processes[0].pid, True, True)
+        for process in processes[1:]:
+            process.start()
+        followers = {ready.get(timeout=5), ready.get(timeout=5)}
+        assert followers == {(p.pid, True, False) for p in processes[1:]}
+        assert _read_log(logfile) == [("enter", str(processes[0].pid))]
+
+        # The leader exits the mode, and one of the followers takes over.
+        stops[0].set()
+        processes[0].join(5)
+        _wait_for(lambda: len(_read_log(logfile)) == 3)
+        new_leader_pid = int(_read_log(logfile)[2][1])
+        assert new_leader_pid in {p.pid for p in processes[1:]}
+
+        # The new leader crashes; the lock is released by the OS, and the
+        # last process takes over.
+        os.kill(new_leader_pid, signal.SIGKILL)
+        _wait_for(lambda: len(_read_log(logfile)) == 4)
+        (last,) = [p for p in processes[1:] if p.pid != new_leader_pid]
+        assert _read_log(logfile)[3] == ("enter", str(last.pid))
+
+        # (Setting the Event of the killed process would block.)
+        stops[processes.index(last)].set()
+        last.join(5)
+        assert _read_log(logfile)[4:] == [("exit", str(last.pid))]
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.kill()
+            process.join()
@@ -1,7 +1,9 @@
 import re
+from unittest.mock import Mock
 
 import pytest
 
+from wakepy.core import BusType, DbusAdapter
 from wakepy.core.method import Method, select_methods
 from wakepy.core.registry import MethodRegistryError, get_method, get_methods
 
@@ -169,3 +171,40 @@ def test_method_string_representations():
     method = MethodB()
     assert method.__str__() == "<wakepy Method: MethodB>"
     assert method.__repr__() == f"<wakepy Method: MethodB at {hex(id(method))}>"
+
+
+def test_method_caniuse_checks_dbus_bus():
+    class DbusBasedMethod(TestMethod):
+        dbus_bus = BusType.SESSION
+
+    assert TestMethod().caniuse() is None
+    assert DbusBasedMethod().caniuse() == "DbusBasedMethod needs a DbusAdapter"
+
+    adapter = Mock(spec=DbusAdapter)
+    adapter.check_bus.return_value = "No session bus"
+    assert DbusBasedMethod(dbus_adapter=adapter).caniuse() == "No session bus"
+    adapter.check_bus.assert_called_once_with(BusType.SESSION)
+
+
+def test_method_caniuse_checks_dbus_service():
+    class DbusServiceMethod(TestMethod):
+        dbus_bus = BusType.SESSION
+        dbus_service = "org.example.Service"
+
+    adapter = Mock(spec=DbusAdapter)
+    adapter.check_bus.return_value = None
+    adapter.check_service.return_value = "No service"
+    method = DbusServiceMethod(dbus_adapter=adapter)
+    assert method.caniuse() == "No service"
+    adapter.check_service.assert_called_once_with(
+        BusType.SESSION, "org.example.Service"
+    )
+
+    adapter.check_service.return_value = None
+    assert method.caniuse() is None
+
+    # The service is not checked if the bus can not be reached
+    adapter.check_bus.return_value = "No session bus"
+    adapter.check_service.reset_mock()
+    assert method.caniuse() == "No session bus"
+    adapter.check_service.assert_not_called()
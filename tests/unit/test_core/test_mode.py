@@ -1,19 +1,49 @@
+import asyncio
+import concurrent.futures
+import gc
+import os
+import random
+import subprocess
+import sys
+import textwrap
+import threading
+import time
 from unittest.mock import Mock, call
 
 import pytest
 from testmethods import get_test_method_class
 
+from wakepy.core import activation as activation_module
+from wakepy.core import mode as mode_module
+from wakepy.core.activation import ActivationStrategy
+from wakepy.core.constants import PlatformName
 from wakepy.core.dbus import DbusAdapter
 from wakepy.core.heartbeat import Heartbeat
-from wakepy.core.mode import ActivationResult, Mode, ModeController, ModeExit
+from wakepy.core.method import Method
+from wakepy.core.mode import (
+    ActivationError,
+    ActivationResult,
+    CombinedMode,
+    Mode,
+    ModeController,
+    ModeExit,
+    ModeTemplate,
+    PlannedModeController,
+    SharedModeController,
+    create_mode,
+    release_lingering_modes,
+)
+from wakepy.core.platform import CURRENT_PLATFORM
 
 
 def mocks_for_test_mode():
     # Setup test
     mocks = Mock()
 
-    mocks.dbus_adapter_cls = Mock(spec_set=type(DbusAdapter))
+    mocks.dbus_adapter_cls = Mock(spec=type(DbusAdapter))
     mocks.dbus_adapter_cls.return_value = Mock(spec_set=DbusAdapter)
+    # Not a process-wide adapter, so it is instantiated when entering the mode
+    mocks.dbus_adapter_cls.process_wide = False
 
     mocks.mode_controller_cls = Mock()
     mocks.mode_controller_cls.return_value = Mock(spec_set=ModeController)
@@ -79,7 +109,15 @@ def test_mode_contextmanager_protocol():
         )
         # And called ModeController.activate
         assert mocks.mock_calls[2] == call.controller_class().activate(
-            mocks.methods, methods_priority=mocks.methods_priority, modename="TestMode"
+            mocks.methods,
+            methods_priority=mocks.methods_priority,
+            modename="TestMode",
+            strategy=ActivationStrategy.SEQUENTIAL,
+            use_cache=False,
+            timing=False,
+            activation_timeout=None,
+            method_timeout=None,
+            requirements_check=None,
         )
         # The __enter__ returns the Mode
         assert m is mode
@@ -182,7 +220,15 @@ def _assert_context_manager_used_correctly(mocks, mode):
         call.dbus_adapter_cls(),
         call.controller_class(dbus_adapter=mocks.dbus_adapter_cls.return_value),
         call.controller_class().activate(
-            mocks.methods, methods_priority=mocks.methods_priority, modename=mode.name
+            mocks.methods,
+            methods_priority=mocks.methods_priority,
+            modename=mode.name,
+            strategy=ActivationStrategy.SEQUENTIAL,
+            use_cache=False,
+            timing=False,
+            activation_timeout=None,
+            method_timeout=None,
+            requirements_check=None,
         ),
         call.controller_class().deactivate(),
     ]
@@ -211,3 +257,1153 @@ def test_modecontroller(monkeypatch):
 
     # Calling a deactivate for mode which is not activated will return False
     assert controller.deactivate() is False
+
+
+def test_modecontroller_async(monkeypatch):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+
+    method_cls = get_test_method_class(enter_mode=None, exit_mode=None)
+    controller = ModeController(Mock(spec_set=DbusAdapter))
+
+    async def main():
+        result = await controller.activate_async([method_cls])
+        assert result.success is True
+        assert isinstance(controller.active_method, method_cls)
+
+        assert await controller.deactivate_async() is True
+        assert controller.active_method is None
+        assert await controller.deactivate_async() is False
+
+    asyncio.run(main())
+
+
+def _get_slow_method(delay: float):
+    """A Method which blocks the calling thread for `delay` seconds when
+    entering and exiting the mode (like a slow D-Bus call)."""
+
+    class SlowMethod(Method):
+        name = "SlowMethod"
+        mode = "_test"
+        supported_platforms = (CURRENT_PLATFORM,)
+
+        def enter_mode(self):
+            time.sleep(delay)
+
+        def exit_mode(self):
+            time.sleep(delay)
+
+    return SlowMethod
+
+
+async def _measure_max_loop_lag(coro, interval=0.005) -> float:
+    """Runs the `coro` and returns the maximum event loop lag (how much later
+    than requested a sleeping task was woken up) during it, in seconds."""
+    max_lag = 0.0
+    done = False
+
+    async def ticker():
+        nonlocal max_lag
+        while not done:
+            t0 = time.perf_counter()
+            await asyncio.sleep(interval)
+            max_lag = max(max_lag, time.perf_counter() - t0 - interval)
+
+    task = asyncio.ensure_future(ticker())
+    await asyncio.sleep(interval)  # let the ticker start
+    try:
+        await coro
+    finally:
+        done = True
+        await task
+    return max_lag
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_mode_async_context_manager_event_loop_lag(monkeypatch):
+    """Entering and exiting a Mode with `async with` does not block the event
+    loop, even if the Method blocks."""
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    delay = 0.2
+    mode = Mode([_get_slow_method(delay)], name="TestMode")
+
+    async def use_async_with():
+        async with mode as m:
+            assert m is mode
+            assert m.active is True
+            assert m.activation_result.active_method == "SlowMethod"
+        assert mode.active is False
+
+    async def use_with():
+        with mode:
+            pass
+
+    async def main():
+        return (
+            await _measure_max_loop_lag(use_async_with()),
+            await _measure_max_loop_lag(use_with()),
+        )
+
+    lag_async_with, lag_with = asyncio.run(main())
+    print(
+        f"\nMax event loop lag, async with: {lag_async_with * 1000:.1f}ms"
+        f"\nMax event loop lag, with: {lag_with * 1000:.1f}ms"
+    )
+    assert lag_with >= delay
+    assert lag_async_with < delay / 2
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_mode_async_context_manager_exit_and_fail(monkeypatch):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+
+    class UnsupportedMethod(Method):
+        name = "UnsupportedMethod"
+        mode = "_test"
+        supported_platforms = (PlatformName.OTHER,)
+
+    method = _get_slow_method(0)
+
+    async def main():
+        # ModeExit is swallowed
+        async with Mode([method]) as m:
+            raise ModeExit
+        assert m.active is False
+
+        # Other exceptions are re-raised
+        with pytest.raises(ValueError, match="foo"):
+            async with Mode([method]):
+                raise ValueError("foo")
+
+        # on_fail is used also with async with
+        with pytest.raises(ActivationError):
+            async with Mode([UnsupportedMethod], on_fail="error"):
+                pass
+
+    asyncio.run(main())
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_mode_async_context_manager_thread(monkeypatch):
+    """The mode is entered and exited in one thread owned by the Mode, which
+    stays alive while the mode is active (see Method.thread_bound)."""
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    threads: list = []
+    method_cls = _get_thread_recording_method(threads)
+
+    async def main():
+        for _ in range(2):
+            async with Mode([method_cls], name="bound"):
+                (_, thread) = threads[-1]
+                assert thread.is_alive()
+                await asyncio.sleep(0.01)
+        return threading.current_thread()
+
+    loop_thread = asyncio.run(main())
+    assert [event for event, _ in threads] == ["enter", "exit"] * 2
+    for (_, enter_thread), (_, exit_thread) in (threads[:2], threads[2:]):
+        assert enter_thread is exit_thread
+        assert enter_thread is not loop_thread
+        assert enter_thread.name == "wakepy-mode-bound"
+        enter_thread.join(timeout=5)
+        assert not enter_thread.is_alive()
+
+
+def test_mode_aexit_before_aenter():
+    with pytest.raises(RuntimeError, match="Must __aenter__ before __aexit__!"):
+        asyncio.run(Mode([]).__aexit__(None, None, None))
+
+
+def _get_methods_for_combined_mode(calls: list):
+    """Methods for testing CombinedMode. The calls to .caniuse(),
+    .enter_mode() and .exit_mode() are recorded to `calls`, with the
+    dbus_adapter of the method."""
+
+    class RecordingMethod(Method):
+        mode = "_test"
+        supported_platforms = (CURRENT_PLATFORM,)
+
+        def caniuse(self):
+            calls.append((self.name, "caniuse", self._dbus_adapter))
+            return True
+
+        def enter_mode(self):
+            calls.append((self.name, "enter_mode", self._dbus_adapter))
+
+        def exit_mode(self):
+            calls.append((self.name, "exit_mode", self._dbus_adapter))
+
+    class MethodA(RecordingMethod):
+        name = "A"
+
+    class MethodB(RecordingMethod):
+        name = "B"
+
+    class MethodFailing(RecordingMethod):
+        name = "Failing"
+
+        def enter_mode(self):
+            raise RuntimeError("Failing fails")
+
+    return MethodA, MethodB, MethodFailing
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_combined_mode(monkeypatch):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    calls: list = []
+    method_a, method_b, method_failing = _get_methods_for_combined_mode(calls)
+    mode1 = Mode([method_a], name="first")
+    # The MethodA fails on second mode as the mode is entered already, but its
+    # caniuse result is reused.
+    mode2 = Mode(
+        [method_failing, method_a, method_b],
+        methods_priority=["Failing", "A", "B"],
+        name="second",
+    )
+
+    with CombinedMode([mode1, mode2], dbus_adapter=DbusAdapter) as m:
+        assert m.active is True
+        assert mode1.active is True
+        assert mode2.active is True
+        assert m.name == "first + second"
+        result = m.activation_result
+        assert result.success is True
+        assert result.active_methods == ["A", "A"]
+        assert [r.method_name for r in result.list_methods()] == ["A", "Failing", "A"]
+        assert [r.active_method for r in result.results] == ["A", "A"]
+
+    assert m.active is False
+    assert mode1.active is False
+    assert mode2.active is False
+
+    assert [call[:2] for call in calls] == [
+        ("A", "caniuse"),
+        ("A", "enter_mode"),
+        ("Failing", "caniuse"),
+        # No "caniuse" call for the second A.
+        ("A", "enter_mode"),
+        # Deactivation in reverse order
+        ("A", "exit_mode"),
+        ("A", "exit_mode"),
+    ]
+    # All the methods use the same dbus adapter instance
+    assert len({id(call[2]) for call in calls}) == 1
+    assert isinstance(calls[0][2], DbusAdapter)
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_combined_mode_activation_fails(monkeypatch):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    calls: list = []
+    method_a, _, method_failing = _get_methods_for_combined_mode(calls)
+    mode1 = Mode([method_a], name="first")
+    mode2 = Mode([method_failing], name="second")
+    combined_mode = CombinedMode([mode1, mode2], dbus_adapter=DbusAdapter)
+
+    # The first mode is deactivated before raising ActivationError
+    with pytest.raises(ActivationError, match='Could not activate Mode "second"'):
+        with combined_mode:
+            assert False, "should not get here"
+    assert mode1.active is False
+    assert [call[:2] for call in calls][-1] == ("A", "exit_mode")
+
+    # With on_fail="pass", the successfully activated modes stay active.
+    calls.clear()
+    combined_mode.on_fail = "pass"
+    with combined_mode as m:
+        assert m.active is False
+        assert m.activation_result.success is False
+        assert m.activation_result.active_method == "A"
+        assert mode1.active is True
+        assert mode2.active is False
+    assert mode1.active is False
+    assert [call[:2] for call in calls][-1] == ("A", "exit_mode")
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_combined_mode_activation_raises(monkeypatch):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    calls: list = []
+    method_a, method_b, _ = _get_methods_for_combined_mode(calls)
+    mode1, mode2 = Mode([method_a], name="first"), Mode([method_b], name="second")
+    mode3 = Mode([method_a], name="third")
+
+    # The Modes entered before the raising one are deactivated in reverse order
+    monkeypatch.setattr(mode3, "_activate", Mock(side_effect=KeyboardInterrupt))
+    with pytest.raises(KeyboardInterrupt):
+        with CombinedMode([mode1, mode2, mode3], dbus_adapter=DbusAdapter):
+            assert False, "should not get here"
+    assert [call[:2] for call in calls if call[1] != "caniuse"] == [
+        ("A", "enter_mode"),
+        ("B", "enter_mode"),
+        ("B", "exit_mode"),
+        ("A", "exit_mode"),
+    ]
+    assert mode1.active is False
+    assert mode2.active is False
+
+    # A Mode which is already active is not deactivated by the CombinedMode
+    calls.clear()
+    with mode2:
+        with pytest.raises(RuntimeError, match='The Mode "second" is already active'):
+            CombinedMode([mode1, mode2], dbus_adapter=DbusAdapter).__enter__()
+        assert mode1.active is False
+        assert mode2.active is True
+    assert [call[:2] for call in calls if call[1] != "caniuse"] == [
+        ("B", "enter_mode"),
+        ("A", "enter_mode"),
+        ("A", "exit_mode"),
+        ("B", "exit_mode"),
+    ]
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_combined_mode_async(monkeypatch):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    calls: list = []
+    method_a, method_b, _ = _get_methods_for_combined_mode(calls)
+
+    async def main():
+        async with CombinedMode(
+            [Mode([method_a]), Mode([method_b])], dbus_adapter=DbusAdapter
+        ) as m:
+            assert m.active is True
+        assert m.active is False
+
+    asyncio.run(main())
+    assert [call[:2] for call in calls if call[1] != "caniuse"] == [
+        ("A", "enter_mode"),
+        ("B", "enter_mode"),
+        ("B", "exit_mode"),
+        ("A", "exit_mode"),
+    ]
+
+
+def test_combined_mode_bad_usage():
+    with pytest.raises(ValueError, match="needs at least one Mode"):
+        CombinedMode([])
+    with pytest.raises(RuntimeError, match="Must __enter__ before __exit__!"):
+        CombinedMode([Mode([])]).__exit__(None, None, None)
+
+
+@pytest.fixture
+def shared_activations(monkeypatch):
+    shared_activations: dict = dict()
+    monkeypatch.setattr("wakepy.core.mode._shared_activations", shared_activations)
+    return shared_activations
+
+
+def _get_counting_method(fail: bool = False):
+    """A Method which counts the enter_mode() and exit_mode() calls and the
+    maximum number of simultaneous activations."""
+
+    class CountingMethod(Method):
+        name = "CountingMethod"
+        mode = "_test"
+        supported_platforms = (CURRENT_PLATFORM,)
+        lock = threading.Lock()
+        n_enter = 0
+        n_exit = 0
+        n_active = 0
+        max_active = 0
+
+        def enter_mode(self):
+            if fail:
+                raise RuntimeError("CountingMethod fails")
+            cls = type(self)
+            with cls.lock:
+                cls.n_enter += 1
+                cls.n_active += 1
+                cls.max_active = max(cls.max_active, cls.n_active)
+
+        def exit_mode(self):
+            cls = type(self)
+            with cls.lock:
+                cls.n_exit += 1
+                cls.n_active -= 1
+
+    return CountingMethod
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_shared_mode(monkeypatch, shared_activations):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    method_cls = _get_counting_method()
+    mode1 = Mode([method_cls], name="shared", shared=True)
+    mode2 = Mode([method_cls], name="shared", shared=True)
+    # Not shared, as the name is different
+    mode3 = Mode([method_cls], name="other", shared=True)
+
+    with mode1:
+        assert isinstance(mode1.controller, SharedModeController)
+        with mode2:
+            assert mode2.active is True
+            # The result of the real activation
+            assert mode2.activation_result is mode1.activation_result
+            assert mode2.controller.active_method is mode1.controller.active_method
+            assert method_cls.n_enter == 1
+            with mode3:
+                assert method_cls.n_enter == 2
+            assert method_cls.n_exit == 1
+        # mode1 still holds a reference
+        assert method_cls.n_exit == 1
+        assert mode2.active is False
+        assert mode2.controller.active_method is None
+    assert method_cls.n_exit == 2
+    assert len(shared_activations) == 2
+
+    # The mode is activated again for the next entrant
+    with mode2:
+        assert method_cls.n_enter == 3
+    assert method_cls.n_exit == 3
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_shared_mode_activation_fails(monkeypatch, shared_activations):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    method_cls = _get_counting_method(fail=True)
+
+    for _ in range(2):
+        # Every entrant tries to activate, as there is no successful activation
+        # to share
+        with Mode([method_cls], name="shared", shared=True, on_fail="pass") as m:
+            assert m.active is False
+            assert m.activation_result.success is False
+            assert m.controller.holds_reference is False
+    assert shared_activations[m._get_shared_key()].count == 0
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_shared_mode_async(monkeypatch, shared_activations):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    method_cls = _get_counting_method()
+
+    async def main():
+        async with Mode([method_cls], name="shared", shared=True) as m1:
+            async with Mode([method_cls], name="shared", shared=True) as m2:
+                assert m2.activation_result is m1.activation_result
+        assert m1.active is False
+
+    asyncio.run(main())
+    assert (method_cls.n_enter, method_cls.n_exit) == (1, 1)
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_shared_mode_stress(monkeypatch, shared_activations):
+    """1000 threads entering and exiting the same shared mode."""
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    method_cls = _get_counting_method()
+    n_threads = 1000
+    barrier = threading.Barrier(n_threads, timeout=30)
+    results = []
+    errors = []
+
+    def _worker(wait_for_all: bool):
+        try:
+            with Mode([method_cls], name="shared", shared=True) as m:
+                results.append(m.activation_result)
+                if wait_for_all:
+                    # All the threads are in the mode at the same time.
+                    barrier.wait()
+                else:
+                    time.sleep(random.random() / 1000)
+        except Exception as exc:
+            errors.append(exc)
+
+    def _run_threads(wait_for_all: bool):
+        threads = [
+            threading.Thread(target=_worker, args=(wait_for_all,))
+            for _ in range(n_threads)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    # Case 1: All the threads hold the mode at the same time -> one activation
+    _run_threads(wait_for_all=True)
+    assert errors == []
+    assert (method_cls.n_enter, method_cls.n_exit) == (1, 1)
+    assert len(results) == n_threads
+    assert all(result is results[0] for result in results)
+    assert results[0].success is True
+
+    # Case 2: The threads enter and exit at random times. The mode may be
+    # activated multiple times, but never twice at the same time, and all
+    # the activations are deactivated.
+    _run_threads(wait_for_all=False)
+    assert errors == []
+    assert method_cls.n_enter == method_cls.n_exit
+    assert method_cls.max_active == 1
+    assert method_cls.n_active == 0
+    assert len(shared_activations) == 1
+    assert next(iter(shared_activations.values())).count == 0
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_mode_linger(monkeypatch, shared_activations):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    method_cls = _get_counting_method()
+
+    results = []
+    for _ in range(3):
+        with Mode([method_cls], name="linger", linger=0.2) as m:
+            results.append(m.activation_result)
+        assert m.active is False
+
+    # The active Method was reused; exited only after the linger time.
+    assert (method_cls.n_enter, method_cls.n_exit) == (1, 0)
+    assert all(result is results[0] for result in results)
+    time.sleep(0.3)
+    assert (method_cls.n_enter, method_cls.n_exit) == (1, 1)
+
+    # Entered again after the linger time -> activated again.
+    with Mode([method_cls], name="linger", linger=0.2):
+        assert method_cls.n_enter == 2
+    release_lingering_modes()
+    assert (method_cls.n_enter, method_cls.n_exit) == (2, 2)
+    # The timer does not deactivate again
+    time.sleep(0.3)
+    assert method_cls.n_exit == 2
+
+
+def _wait_for(condition, timeout=5.0):
+    end = time.time() + timeout
+    while not condition():
+        if time.time() > end:
+            raise TimeoutError("Condition not met in time")
+        time.sleep(0.001)
+
+
+def _get_thread_recording_method(threads: list):
+    """A thread bound Method which records the threads calling enter_mode()
+    and exit_mode()."""
+
+    class ThreadBoundMethod(Method):
+        name = "ThreadBoundMethod"
+        mode = "_test"
+        supported_platforms = (CURRENT_PLATFORM,)
+        thread_bound = True
+
+        def enter_mode(self):
+            threads.append(("enter", threading.current_thread()))
+
+        def exit_mode(self):
+            threads.append(("exit", threading.current_thread()))
+
+    return ThreadBoundMethod
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_mode_method_timeout_enters_and_exits_in_same_thread(monkeypatch):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    threads: list = []
+    method_cls = _get_thread_recording_method(threads)
+
+    with Mode([method_cls], method_timeout=1.0) as mode:
+        assert mode.active is True
+
+    current_thread = threading.current_thread()
+    assert threads == [("enter", current_thread), ("exit", current_thread)]
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_mode_shared_enters_and_exits_in_same_thread(monkeypatch, shared_activations):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    threads: list = []
+    method_cls = _get_thread_recording_method(threads)
+    entered, release = threading.Event(), threading.Event()
+
+    def hold_mode():
+        with Mode([method_cls], name="shared", shared=True):
+            entered.set()
+            release.wait(5)
+
+    # The first holder of the shared activation enters in a thread which
+    # exits the mode before the last holder (the main thread).
+    first_holder = threading.Thread(target=hold_mode)
+    first_holder.start()
+    assert entered.wait(5)
+    with Mode([method_cls], name="shared", shared=True):
+        release.set()
+        first_holder.join(5)
+        assert [event for event, _ in threads] == ["enter"]
+
+    assert [event for event, _ in threads] == ["enter", "exit"]
+    (_, enter_thread), (_, exit_thread) = threads
+    assert enter_thread is exit_thread
+    assert enter_thread.name == "wakepy-shared"
+    enter_thread.join(timeout=5)
+    assert not enter_thread.is_alive()
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+@pytest.mark.parametrize("release_at_once", [False, True])
+def test_mode_linger_enters_and_exits_in_same_thread(
+    monkeypatch, shared_activations, release_at_once
+):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    threads: list = []
+    method_cls = _get_thread_recording_method(threads)
+
+    for _ in range(2):
+        with Mode([method_cls], name="linger", linger=0.1):
+            pass
+    if release_at_once:
+        release_lingering_modes()
+    else:
+        _wait_for(lambda: len(threads) == 2)
+
+    assert [event for event, _ in threads] == ["enter", "exit"]
+    (_, enter_thread), (_, exit_thread) = threads
+    assert enter_thread is exit_thread
+    assert enter_thread.name == "wakepy-shared"
+    enter_thread.join(timeout=5)
+    assert not enter_thread.is_alive()
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_mode_linger_releases_activation_without_linger(
+    monkeypatch, shared_activations
+):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    threads: list = []
+    method_cls = _get_thread_recording_method(threads)
+    without_linger = Mode([method_cls], name="linger", shared=True)
+    with_linger = Mode([method_cls], name="linger", linger=0.05)
+
+    # The activation is made by the Mode without linger, and released by the
+    # lingering Mode, in the background.
+    without_linger.__enter__()
+    with with_linger:
+        without_linger.__exit__(None, None, None)
+    _wait_for(lambda: len(threads) == 2)
+
+    assert [event for event, _ in threads] == ["enter", "exit"]
+    (_, enter_thread), (_, exit_thread) = threads
+    assert enter_thread is exit_thread
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_mode_linger_deactivation_fails(monkeypatch, shared_activations):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    method_cls = get_test_method_class(enter_mode=None, exit_mode=RuntimeError("oh"))
+
+    with Mode([method_cls], name="linger", linger=60):
+        pass
+    with pytest.warns(UserWarning, match="Could not deactivate a lingering mode"):
+        release_lingering_modes()
+
+
+def test_mode_bad_linger():
+    with pytest.raises(ValueError, match="linger must be a non-negative number"):
+        Mode([], linger=-1)
+
+
+def test_mode_linger_released_at_exit():
+    script = textwrap.dedent(
+        """
+        from wakepy.core import CURRENT_PLATFORM, Method, Mode
+
+        class PrintingMethod(Method):
+            name = "PrintingMethod"
+            mode = "_test"
+            supported_platforms = (CURRENT_PLATFORM,)
+
+            def enter_mode(self):
+                print("enter_mode")
+
+            def exit_mode(self):
+                print("exit_mode")
+
+        with Mode([PrintingMethod], name="linger", linger=60):
+            pass
+        print("end of script")
+        """
+    )
+    env = dict(os.environ, WAKEPY_FAKE_SUCCESS="0")
+    out = subprocess.run(
+        [sys.executable, "-c", script],
+        capture_output=True,
+        text=True,
+        env=env,
+        timeout=30,
+    )
+    assert out.stdout.splitlines() == ["enter_mode", "end of script", "exit_mode"]
+
+
+def _get_blocking_method(calls: list, release: threading.Event, fail: bool = False):
+    """A Method whose enter_mode() waits for `release`. The enter_mode() and
+    exit_mode() calls are recorded to `calls`."""
+
+    class BlockingMethod(Method):
+        name = "BlockingMethod"
+        mode = "_test"
+        supported_platforms = (CURRENT_PLATFORM,)
+
+        def enter_mode(self):
+            release.wait(5)
+            calls.append("enter_mode")
+            if fail:
+                raise RuntimeError("BlockingMethod fails")
+
+        def exit_mode(self):
+            calls.append("exit_mode")
+
+    return BlockingMethod
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_mode_non_blocking(monkeypatch):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    calls: list = []
+    release = threading.Event()
+    method_cls = _get_blocking_method(calls, release)
+
+    with Mode([method_cls], name="slow", blocking=False) as m:
+        # The with block starts before the activation has finished.
+        assert calls == []
+        assert m.active is False
+        future = m.activation_future
+        assert isinstance(future, concurrent.futures.Future)
+        release.set()
+        result = future.result(timeout=5)
+        assert result is m.activation_result
+        assert result.success is True
+        assert m.active is True
+    assert m.active is False
+    assert calls == ["enter_mode", "exit_mode"]
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_mode_non_blocking_exit_while_activating(monkeypatch):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    calls: list = []
+    release = threading.Event()
+    method_cls = _get_blocking_method(calls, release)
+
+    threading.Timer(0.1, release.set).start()
+    with Mode([method_cls], name="slow", blocking=False) as m:
+        pass
+    # The exit waited for the activation, and rolled it back.
+    assert m.activation_future.done()
+    assert m.activation_result.success is True
+    assert m.active is False
+    assert calls == ["enter_mode", "exit_mode"]
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_mode_non_blocking_activation_fails(monkeypatch):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    calls: list = []
+    release = threading.Event()
+    release.set()
+    method_cls = _get_blocking_method(calls, release, fail=True)
+
+    # The on_fail action is done in the background; the error is raised by the
+    # Future (and not by __exit__)
+    with Mode([method_cls], name="slow", blocking=False) as m:
+        with pytest.raises(ActivationError, match='Could not activate Mode "slow"'):
+            m.activation_future.result(timeout=5)
+    assert calls == ["enter_mode"]
+
+    with Mode([method_cls], name="slow", blocking=False, on_fail="pass") as m:
+        assert m.activation_future.result(timeout=5).success is False
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_mode_non_blocking_enters_and_exits_in_same_thread(monkeypatch):
+    """The Methods bound to a thread (like SetThreadExecutionState on
+    Windows) must be exited in the thread which entered the mode, and the
+    thread must stay alive while the mode is active."""
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    threads = []
+
+    class ThreadBoundMethod(Method):
+        name = "ThreadBoundMethod"
+        mode = "_test"
+        supported_platforms = (CURRENT_PLATFORM,)
+        thread_bound = True
+
+        def enter_mode(self):
+            threads.append(threading.current_thread())
+
+        def exit_mode(self):
+            threads.append(threading.current_thread())
+
+    with Mode([ThreadBoundMethod], name="bound", blocking=False) as m:
+        m.activation_future.result(timeout=5)
+        time.sleep(0.01)
+        assert threads[0] is not threading.current_thread()
+        assert threads[0].is_alive()
+    assert len(threads) == 2
+    assert threads[0] is threads[1]
+    threads[0].join(timeout=5)
+    assert not threads[0].is_alive()
+
+
+def test_mode_background_activation_cancelled():
+    mode = Mode([])
+    mode._activate = Mock()
+    future: concurrent.futures.Future = concurrent.futures.Future()
+    assert future.cancel() is True
+
+    mode._activate_in_background(future)
+    mode._activate.assert_not_called()
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_mode_non_blocking_async(monkeypatch):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    calls: list = []
+    release = threading.Event()
+    method_cls = _get_blocking_method(calls, release)
+
+    async def main():
+        async with Mode([method_cls], name="slow", blocking=False) as m:
+            assert calls == []
+            release.set()
+            result = await asyncio.wrap_future(m.activation_future)
+            assert result.success is True
+        assert m.active is False
+
+    asyncio.run(main())
+    assert calls == ["enter_mode", "exit_mode"]
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_mode_wrap(monkeypatch):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    method_cls = _get_counting_method()
+
+    def numbers():
+        for i in range(3):
+            # The mode is active while the items are produced
+            assert method_cls.n_active == 1
+            yield i
+
+    wrapped = Mode([method_cls], name="wrap").wrap(numbers())
+    # Lazy: nothing is activated before the first next()
+    assert method_cls.n_enter == 0
+    assert list(wrapped) == [0, 1, 2]
+    assert (method_cls.n_enter, method_cls.n_exit) == (1, 1)
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_mode_wrap_closed_and_garbage_collected(monkeypatch):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    method_cls = _get_counting_method()
+    closed = []
+
+    def numbers():
+        try:
+            yield from range(10)
+        finally:
+            closed.append(True)
+
+    wrapped = Mode([method_cls], name="wrap").wrap(numbers())
+    assert next(wrapped) == 0
+    assert method_cls.n_active == 1
+    wrapped.close()
+    # The wrapped generator is closed, too
+    assert closed == [True]
+    assert (method_cls.n_enter, method_cls.n_exit) == (1, 1)
+
+    wrapped = Mode([method_cls], name="wrap").wrap(numbers())
+    assert next(wrapped) == 0
+    del wrapped
+    gc.collect()
+    assert closed == [True, True]
+    assert (method_cls.n_enter, method_cls.n_exit) == (2, 2)
+
+    # Never started: nothing to exit
+    wrapped = Mode([method_cls], name="wrap").wrap(numbers())
+    wrapped.close()
+    assert (method_cls.n_enter, method_cls.n_exit) == (2, 2)
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_mode_wrap_activation_fails(monkeypatch):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    method_cls = _get_counting_method(fail=True)
+
+    wrapped = Mode([method_cls], name="wrap").wrap(range(3))
+    with pytest.raises(ActivationError):
+        next(wrapped)
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_mode_wrap_async(monkeypatch):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    method_cls = _get_counting_method()
+    closed = []
+
+    async def numbers():
+        try:
+            for i in range(3):
+                assert method_cls.n_active == 1
+                yield i
+        finally:
+            closed.append(True)
+
+    async def main():
+        wrapped = Mode([method_cls], name="wrap").wrap_async(numbers())
+        assert method_cls.n_enter == 0
+        assert [i async for i in wrapped] == [0, 1, 2]
+        assert (method_cls.n_enter, method_cls.n_exit) == (1, 1)
+
+        wrapped = Mode([method_cls], name="wrap").wrap_async(numbers())
+        assert await wrapped.__anext__() == 0
+        await wrapped.aclose()
+        assert (method_cls.n_enter, method_cls.n_exit) == (2, 2)
+
+    asyncio.run(main())
+    assert closed == [True, True]
+
+
+@pytest.mark.benchmark
+@pytest.mark.usefixtures("empty_method_registry")
+def test_mode_wrap_overhead(monkeypatch):
+    """Benchmark: The overhead of the wrapper per item is small."""
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    method_cls = _get_counting_method()
+    n = 1_000_000
+
+    def consume(iterable):
+        start = time.perf_counter()
+        for _ in iterable:
+            pass
+        return time.perf_counter() - start
+
+    plain = min(consume(iter(range(n))) for _ in range(3))
+    wrapped = min(
+        consume(Mode([method_cls], name="wrap").wrap(range(n))) for _ in range(3)
+    )
+    assert (wrapped - plain) / n < 1e-6
+
+
+def _get_methods_for_template(calls: list, fail: set):
+    """Methods of the "_template" mode, in priority order. The first one can
+    not be used. The others record the caniuse(), enter_mode() and exit_mode()
+    calls into `calls`, and fail to enter if their name is in `fail`."""
+
+    class Unusable(Method):
+        name = "Unusable"
+        mode = "_template"
+        supported_platforms = (CURRENT_PLATFORM,)
+
+        def caniuse(self):
+            calls.append(("caniuse", self.name))
+            return "Not usable"
+
+        def enter_mode(self):
+            calls.append(("enter", self.name))
+
+    class Recording(Method):
+        mode = "_template"
+        supported_platforms = (CURRENT_PLATFORM,)
+
+        def caniuse(self):
+            calls.append(("caniuse", self.name))
+            return True
+
+        def enter_mode(self):
+            calls.append(("enter", self.name))
+            if self.name in fail:
+                raise RuntimeError(f"{self.name} fails")
+
+        def exit_mode(self):
+            calls.append(("exit", self.name))
+
+    class First(Recording):
+        name = "First"
+
+    class Second(Recording):
+        name = "Second"
+
+    return [Unusable, First, Second]
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_mode_template(monkeypatch):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    calls: list = []
+    fail: set = set()
+    methods = _get_methods_for_template(calls, fail)
+    template = ModeTemplate(
+        "_template", omit=["Unusable"], methods_priority=["First", "Second"]
+    )
+    assert template.methods_classes == methods[1:]
+    assert template.planned_method is None
+
+    # The first Mode makes the plan with the full activation
+    with template() as mode:
+        assert mode.active
+        assert mode.activation_result.active_method == "First"
+    assert calls == [("caniuse", "First"), ("enter", "First"), ("exit", "First")]
+    assert template.planned_method is methods[1]
+    first_result = mode.activation_result
+
+    # The later Modes enter the planned method directly, and share the dbus
+    # adapter of the template.
+    calls.clear()
+    modes = [template() for _ in range(3)]
+    for mode in modes:
+        assert isinstance(mode.controller, PlannedModeController)
+        with mode:
+            assert mode.active
+            assert mode.activation_result.active_method == "First"
+            assert mode.activation_result.query() == first_result.query()
+    assert calls == [("enter", "First"), ("exit", "First")] * 3
+
+    # Each Mode gets its own copy of the ActivationResult
+    results = [mode.activation_result for mode in modes]
+    assert len({id(result) for result in [first_result] + results}) == 4
+    results[0].query()[0].failure_reason = "changed"
+    results[0].started_methods.append("changed")
+    assert results[1].query() == first_result.query()
+    assert first_result.query()[0].failure_reason == ""
+    assert first_result.started_methods == results[1].started_methods == []
+    assert len({id(mode.controller.dbus_adapter) for mode in modes}) == 1
+
+    # If the planned method fails, the mode is activated normally, and the
+    # plan is updated.
+    calls.clear()
+    fail.add("First")
+    with template() as mode:
+        assert mode.activation_result.active_method == "Second"
+    assert template.planned_method is methods[2]
+    assert calls == [
+        ("enter", "First"),
+        ("caniuse", "First"),
+        ("enter", "First"),
+        ("caniuse", "Second"),
+        ("enter", "Second"),
+        ("exit", "Second"),
+    ]
+
+    # If all the methods fail, there is no plan.
+    fail.add("Second")
+    with pytest.raises(ActivationError):
+        template().__enter__()
+    assert template.planned_method is None
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_mode_template_options(monkeypatch, shared_activations):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    calls: list = []
+    _get_methods_for_template(calls, fail=set())
+
+    # The plan is not used with the options which need their own controller
+    # or the full activation process.
+    for kwargs in ({"shared": True}, {"timing": True}, {"method_timeout": 5}):
+        template = ModeTemplate("_template", methods=["Second"], **kwargs)
+        for _ in range(2):
+            with template() as mode:
+                assert not isinstance(mode.controller, PlannedModeController)
+                assert mode.active
+        assert calls.count(("caniuse", "Second")) == 2
+        calls.clear()
+
+    with pytest.raises(ValueError, match="linger must be a non-negative"):
+        ModeTemplate("_template", linger=-1)()
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_mode_template_skips_method_selection(monkeypatch):
+    """The Modes of a ModeTemplate skip the selection and the prioritization
+    of the Methods, and the requirement checks, which are done for each Mode
+    created with create_mode."""
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    caniuse_calls: list = []
+
+    class Unusable(Method):
+        name = "Unusable"
+        mode = "_template"
+        supported_platforms = (CURRENT_PLATFORM,)
+
+        def caniuse(self):
+            caniuse_calls.append(self.name)
+            return "Not usable"
+
+        def enter_mode(self):
+            return None
+
+    class Usable(Unusable):
+        name = "Usable"
+
+        def caniuse(self):
+            caniuse_calls.append(self.name)
+            return True
+
+    get_methods = Mock(wraps=mode_module.get_methods_for_mode)
+    monkeypatch.setattr("wakepy.core.mode.get_methods_for_mode", get_methods)
+    prioritize = Mock(wraps=activation_module.get_checked_prioritized_methods)
+    monkeypatch.setattr(
+        "wakepy.core.activation.get_checked_prioritized_methods", prioritize
+    )
+    n = 10
+
+    for _ in range(n):
+        with create_mode("_template") as mode:
+            assert mode.activation_result.active_method == "Usable"
+    assert get_methods.call_count == prioritize.call_count == n
+    assert caniuse_calls == ["Unusable", "Usable"] * n
+
+    get_methods.reset_mock()
+    prioritize.reset_mock()
+    caniuse_calls.clear()
+    template = ModeTemplate("_template")
+    for _ in range(n):
+        with template() as mode:
+            assert mode.activation_result.active_method == "Usable"
+    # Only the template creation selects the methods, and only the first
+    # activation (which makes the plan) prioritizes and checks them.
+    assert get_methods.call_count == prioritize.call_count == 1
+    assert caniuse_calls == ["Unusable", "Usable"]
+
+
+@pytest.mark.benchmark
+@pytest.mark.usefixtures("empty_method_registry")
+def test_mode_template_overhead(monkeypatch):
+    """Benchmark: Entering and exiting a Mode of a ModeTemplate compared to
+    creating the Mode for each with block. The Methods of the mode are like
+    the keep.running on Linux: there are Methods for other platforms, a
+    Method which can not be used, and the Method which is used."""
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    other_platform = next(p for p in PlatformName if p != CURRENT_PLATFORM)
+    for name in ("OtherPlatform1", "OtherPlatform2", "OtherPlatform3"):
+        type(
+            name,
+            (get_test_method_class(enter_mode=None),),
+            dict(name=name, mode="_template", supported_platforms=(other_platform,)),
+        )
+    for name, caniuse in (("Unusable", "Not usable"), ("Usable", True)):
+        type(
+            name,
+            (get_test_method_class(caniuse=caniuse, enter_mode=None, exit_mode=None),),
+            dict(name=name, mode="_template"),
+        )
+    n = 3_000
+
+    def cpu_time_per_enter(get_mode) -> float:
+        times = []
+        for _ in range(3):
+            start = time.process_time()
+            for _ in range(n):
+                with get_mode():
+                    pass
+            times.append((time.process_time() - start) / n)
+        return min(times)
+
+    template = ModeTemplate("_template")
+    mode = template()
+    with mode:
+        assert mode.activation_result.active_method == "Usable"
+
+    without_template = cpu_time_per_enter(lambda: create_mode("_template"))
+    new_modes = cpu_time_per_enter(template)
+    reused_mode = cpu_time_per_enter(lambda: mode)
+    assert new_modes * 4 < without_template
+    assert reused_mode * 6 < without_template
@@ -3,7 +3,7 @@ import re
 import pytest
 
 from wakepy.core import Method, get_method, get_methods, get_methods_for_mode
-from wakepy.core.registry import register_method
+from wakepy.core.registry import get_registry_version, register_method
 
 
 class TestMethod(Method):
@@ -133,3 +133,23 @@ def test_register_method():
         ),
     ):
         get_method("A")
+
+
+@pytest.mark.usefixtures("empty_method_registry")
+def test_get_registry_version():
+    version = get_registry_version()
+
+    class MethodA(TestMethod):
+        name = "A"
+
+    assert get_registry_version() == version + 1
+
+    # Registering the same class again does not change the registry.
+    register_method(MethodA)
+    assert get_registry_version() == version + 1
+
+    # Methods without a name are not registered.
+    class MethodWithoutName(TestMethod):
+        ...
+
+    assert get_registry_version() == version + 1
@@ -0,0 +1,188 @@
+"""Tests for the wakepy daemon (wakepy/daemon.py)"""
+
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from wakepy.core import CURRENT_PLATFORM, Method, ModeName
+from wakepy.daemon import (
+    DaemonAlreadyRunningError,
+    WakepyDaemon,
+    get_daemon_socket_path,
+)
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(socket, "AF_UNIX"), reason="Needs Unix sockets"
+)
+
+
+@pytest.fixture
+def socket_path(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+    monkeypatch.setattr("wakepy.core.mode._shared_activations", dict())
+    return tmp_path / "wakepy" / "daemon.sock"
+
+
+@pytest.fixture
+def counting_method(monkeypatch, empty_method_registry):
+    """A keep.running Method which counts the enter_mode() and exit_mode()
+    calls."""
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+
+    class CountingMethod(Method):
+        name = "CountingMethod"
+        mode = ModeName.KEEP_RUNNING
+        supported_platforms = (CURRENT_PLATFORM,)
+        n_enter = 0
+        n_exit = 0
+
+        def enter_mode(self):
+            type(self).n_enter += 1
+
+        def exit_mode(self):
+            type(self).n_exit += 1
+
+    return CountingMethod
+
+
+@pytest.fixture
+def daemon(socket_path, counting_method):
+    daemon = WakepyDaemon(socket_path)
+    thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+    thread.start()
+    yield daemon
+    daemon.shutdown()
+    thread.join(5)
+
+
+class Client:
+    def __init__(self, socket_path):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(5)
+        self.sock.connect(str(socket_path))
+        self.file = self.sock.makefile("rb")
+
+    def request(self, request: str) -> str:
+        self.sock.sendall(f"{request}\n".encode())
+        return self.file.readline().decode().strip()
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
+
+
+def _wait_for(condition, timeout=5.0):
+    t_end = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < t_end, "timed out"
+        time.sleep(0.005)
+
+
+def test_get_daemon_socket_path(monkeypatch, tmp_path):
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+    assert get_daemon_socket_path() == tmp_path / "wakepy" / "daemon.sock"
+    monkeypatch.delenv("XDG_RUNTIME_DIR")
+    assert get_daemon_socket_path() is None
+
+
+def test_daemon_acquire_and_release(daemon, socket_path, counting_method):
+    assert socket_path.stat().st_mode & 0o777 == 0o600
+    client1 = Client(socket_path)
+    client2 = Client(socket_path)
+
+    response1 = client1.request("ACQUIRE keep.running")
+    response2 = client2.request("ACQUIRE keep.running")
+    assert response1.startswith("OK ")
+    assert response2.startswith("OK ")
+    assert response1 != response2
+    # The mode is activated only once
+    assert (counting_method.n_enter, counting_method.n_exit) == (1, 0)
+    assert daemon.n_leases == 2
+
+    assert client1.request(f"RELEASE {response1.split()[1]}") == "OK"
+    assert counting_method.n_exit == 0
+    # A client can only release its own leases
+    assert client1.request(f"RELEASE {response2.split()[1]}").startswith(
+        "ERROR Unknown lease"
+    )
+    assert client2.request(f"RELEASE {response2.split()[1]}") == "OK"
+    # The last lease was released -> deactivated
+    assert (counting_method.n_enter, counting_method.n_exit) == (1, 1)
+    assert daemon.n_leases == 0
+
+    client1.close()
+    client2.close()
+
+
+def test_daemon_releases_leases_of_closed_connection(
+    daemon, socket_path, counting_method
+):
+    client = Client(socket_path)
+    assert client.request("ACQUIRE keep.running").startswith("OK ")
+    assert client.request("ACQUIRE keep.running").startswith("OK ")
+    assert daemon.n_leases == 2
+
+    client.close()
+    _wait_for(lambda: daemon.n_leases == 0)
+    assert (counting_method.n_enter, counting_method.n_exit) == (1, 1)
+
+
+def test_daemon_bad_requests(daemon, socket_path):
+    client = Client(socket_path)
+    assert client.request("ACQUIRE no.such.mode") == "ERROR Unknown mode: no.such.mode"
+    assert client.request("HELLO") == "ERROR Unknown command: HELLO"
+    # There are no keep.presenting methods
+    assert client.request("ACQUIRE keep.presenting").startswith(
+        'ERROR Could not activate Mode "keep.presenting"'
+    )
+    assert daemon.n_leases == 0
+    client.close()
+
+
+def test_daemon_shutdown_releases_leases(socket_path, counting_method):
+    daemon = WakepyDaemon(socket_path)
+    daemon.acquire("keep.running")
+    assert counting_method.n_enter == 1
+
+    daemon.close()
+    assert counting_method.n_exit == 1
+    assert not socket_path.exists()
+
+
+def test_daemon_already_running(daemon, socket_path):
+    with pytest.raises(DaemonAlreadyRunningError):
+        WakepyDaemon(socket_path)
+
+
+def test_daemon_stale_socket(socket_path, counting_method):
+    # A socket file left behind by a daemon which is not running anymore.
+    socket_path.parent.mkdir(parents=True)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(str(socket_path))
+    sock.close()
+
+    daemon = WakepyDaemon(socket_path)
+    daemon.close()
+
+
+def test_daemon_cli(socket_path):
+    process = subprocess.Popen(
+        [sys.executable, "-m", "wakepy", "daemon", "--socket", str(socket_path)],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        assert process.stdout is not None
+        assert process.stdout.readline().startswith(
+            f"wakepy daemon listening at {socket_path}"
+        )
+        assert socket_path.exists()
+    finally:
+        process.send_signal(signal.SIGINT)
+        process.wait(10)
+    assert not socket_path.exists()
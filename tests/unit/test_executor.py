@@ -0,0 +1,172 @@
+"""Tests for the KeepRunningExecutor (wakepy/executor.py)"""
+
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from wakepy import ActivationError, KeepRunningExecutor
+from wakepy.core import (
+    CURRENT_PLATFORM,
+    BusType,
+    DbusAdapter,
+    DbusAddress,
+    DbusMethod,
+    DbusMethodCall,
+    Method,
+    ModeName,
+)
+from wakepy.modes import keep
+
+inhibitor = DbusAddress(
+    bus=BusType.SESSION,
+    service="org.example.Inhibitor",
+    path="/org/example/Inhibitor",
+    interface="org.example.Inhibitor",
+)
+method_inhibit = DbusMethod(name="Inhibit", signature="", output_signature="u").of(
+    inhibitor
+)
+method_uninhibit = DbusMethod(name="UnInhibit", signature="u").of(inhibitor)
+
+
+class CountingDbusAdapter(DbusAdapter):
+    """Counts the D-Bus calls."""
+
+    calls: list = []
+
+    def process(self, call):
+        self.calls.append(call.method.name)
+        return (1,) if call.method is method_inhibit else None
+
+
+@pytest.fixture
+def dbus_method(monkeypatch, empty_method_registry):
+    """A keep.running Method which uses D-Bus for entering and exiting the
+    mode."""
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    monkeypatch.setattr(CountingDbusAdapter, "calls", [])
+
+    class DbusInhibit(Method):
+        name = "DbusInhibit"
+        mode = ModeName.KEEP_RUNNING
+        supported_platforms = (CURRENT_PLATFORM,)
+
+        def enter_mode(self):
+            (self.cookie,) = self.process_dbus_call(DbusMethodCall(method_inhibit))
+
+        def exit_mode(self):
+            self.process_dbus_call(DbusMethodCall(method_uninhibit, (self.cookie,)))
+
+    return DbusInhibit
+
+
+def _get_mode():
+    return keep.running(dbus_adapter=CountingDbusAdapter)
+
+
+def _wait_for(condition, timeout=5.0):
+    end = time.time() + timeout
+    while not condition():
+        if time.time() > end:
+            raise TimeoutError("Condition not met in time")
+        time.sleep(0.001)
+
+
+def test_keep_running_executor(dbus_method):
+    release = threading.Event()
+    with KeepRunningExecutor(ThreadPoolExecutor(4), mode=_get_mode) as executor:
+        assert executor.mode is None
+        futures = [executor.submit(release.wait, 5) for _ in range(10)]
+        assert executor.n_pending == 10
+        assert executor.mode is not None and executor.mode.active
+        assert CountingDbusAdapter.calls == ["Inhibit"]
+        release.set()
+        assert all(f.result() for f in futures)
+        # The mode is exited in the background thread
+        _wait_for(lambda: executor.mode is None)
+        assert executor.n_pending == 0
+        _wait_for(lambda: CountingDbusAdapter.calls == ["Inhibit", "UnInhibit"])
+
+        # The next busy period enters the mode again
+        assert list(executor.map(abs, [-1, -2])) == [1, 2]
+    assert CountingDbusAdapter.calls == ["Inhibit", "UnInhibit"] * 2
+
+
+@pytest.mark.parametrize("n_tasks", [10, 10_000])
+def test_keep_running_executor_dbus_traffic(dbus_method, n_tasks):
+    """Benchmark: The number of D-Bus calls does not depend on the number of
+    tasks."""
+    release = threading.Event()
+    with KeepRunningExecutor(ThreadPoolExecutor(8), mode=_get_mode) as executor:
+        # The first task keeps the executor busy until all are submitted.
+        futures = [executor.submit(release.wait, 5)]
+        futures += [executor.submit(abs, -i) for i in range(n_tasks)]
+        release.set()
+        for future in futures:
+            future.result()
+    assert CountingDbusAdapter.calls == ["Inhibit", "UnInhibit"]
+
+
+def test_keep_running_executor_activation_fails(monkeypatch, empty_method_registry):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    with KeepRunningExecutor(ThreadPoolExecutor(1)) as executor:
+        # No Methods; the activation fails and the task is not submitted.
+        with pytest.raises(ActivationError):
+            executor.submit(abs, -1)
+        assert executor.n_pending == 0
+
+    mode = functools.partial(keep.running, on_fail="pass")
+    with KeepRunningExecutor(ThreadPoolExecutor(1), mode=mode) as executor:
+        assert executor.submit(abs, -1).result() == 1
+        assert executor.n_pending == 0
+
+
+def test_keep_running_executor_submit_fails(dbus_method):
+    inner = ThreadPoolExecutor(1)
+    executor = KeepRunningExecutor(inner, mode=_get_mode)
+    inner.shutdown()
+    # The wrapped executor fails; the mode is exited again.
+    with pytest.raises(RuntimeError, match="shutdown"):
+        executor.submit(abs, -1)
+    assert executor.n_pending == 0
+    executor.shutdown()
+    assert CountingDbusAdapter.calls == ["Inhibit", "UnInhibit"]
+
+    # After the shutdown, the mode is not entered anymore
+    with pytest.raises(RuntimeError, match="shutdown"):
+        executor.submit(abs, -1)
+    assert CountingDbusAdapter.calls == ["Inhibit", "UnInhibit"]
+
+
+def test_keep_running_executor_enters_and_exits_in_same_thread(
+    monkeypatch, empty_method_registry
+):
+    """The Methods bound to a thread (like SetThreadExecutionState on
+    Windows) must be exited in the thread which entered the mode."""
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    threads = []
+
+    class ThreadBoundMethod(Method):
+        name = "ThreadBoundMethod"
+        mode = ModeName.KEEP_RUNNING
+        supported_platforms = (CURRENT_PLATFORM,)
+        thread_bound = True
+
+        def enter_mode(self):
+            threads.append(("enter", threading.current_thread()))
+
+        def exit_mode(self):
+            threads.append(("exit", threading.current_thread()))
+
+    with KeepRunningExecutor(ThreadPoolExecutor(2)) as executor:
+        for _ in range(3):
+            executor.submit(abs, -1).result()
+            _wait_for(lambda: executor.mode is None)
+
+    assert [event for event, _ in threads] == ["enter", "exit"] * 3
+    assert {thread.name for _, thread in threads} == {"wakepy-executor"}
+    assert len({thread for _, thread in threads}) == 1
+    assert not threads[0][1].is_alive()
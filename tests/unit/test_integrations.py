@@ -0,0 +1,215 @@
+"""Tests for the integrations (wakepy/integrations)"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from wakepy.core import CURRENT_PLATFORM, Method, ModeName
+from wakepy.integrations import InFlightTracker
+from wakepy.integrations.asgi import KeepRunningMiddleware as ASGIMiddleware
+from wakepy.integrations.wsgi import KeepRunningMiddleware as WSGIMiddleware
+
+
+@pytest.fixture
+def counting_method(monkeypatch, empty_method_registry):
+    """A keep.running Method which records the threads calling enter_mode()
+    and exit_mode()."""
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+
+    class CountingMethod(Method):
+        name = "CountingMethod"
+        mode = ModeName.KEEP_RUNNING
+        supported_platforms = (CURRENT_PLATFORM,)
+        calls: list = []
+
+        def enter_mode(self):
+            self.calls.append(("enter", threading.current_thread().name))
+
+        def exit_mode(self):
+            self.calls.append(("exit", threading.current_thread().name))
+
+    return CountingMethod
+
+
+def _wait_for(condition, timeout=5.0):
+    end = time.time() + timeout
+    while not condition():
+        if time.time() > end:
+            raise TimeoutError("Condition not met in time")
+        time.sleep(0.001)
+
+
+def test_inflight_tracker(counting_method):
+    tracker = InFlightTracker(grace_period=0.1)
+    calls = counting_method.calls
+
+    tracker.request_started()
+    tracker.request_started()
+    assert tracker.n_in_flight == 2
+    _wait_for(lambda: tracker.active)
+    # The mode is entered in the background thread
+    assert calls == [("enter", "wakepy-inflight")]
+
+    tracker.request_finished()
+    tracker.request_finished()
+    # A new request within the grace period keeps the mode active as is
+    time.sleep(0.02)
+    tracker.request_started()
+    tracker.request_finished()
+    assert tracker.active
+
+    _wait_for(lambda: not tracker.active)
+    assert calls == [("enter", "wakepy-inflight"), ("exit", "wakepy-inflight")]
+
+    # The mode is entered again for the next request
+    tracker.request_started()
+    _wait_for(lambda: tracker.active)
+    tracker.request_finished()
+    tracker.close()
+    assert tracker.active is False
+    assert len(calls) == 4
+
+
+def test_inflight_tracker_bad_grace_period():
+    with pytest.raises(ValueError, match="grace_period must be a non-negative"):
+        InFlightTracker(grace_period=-1)
+
+
+def test_inflight_tracker_activation_fails(monkeypatch, empty_method_registry):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    tracker = InFlightTracker(grace_period=0)
+    with pytest.warns(UserWarning, match="Could not activate"):
+        tracker.request_started()
+        _wait_for(lambda: tracker.mode is not None)
+    assert tracker.active is False
+    tracker.request_finished()
+    tracker.close()
+
+
+def test_inflight_tracker_overhead(counting_method):
+    """Benchmark: The overhead of a request, when the mode is active, is a few
+    microseconds at most."""
+    tracker = InFlightTracker(grace_period=60)
+    tracker.request_started()
+    _wait_for(lambda: tracker.active)
+
+    n = 100_000
+    start = time.perf_counter()
+    for _ in range(n):
+        tracker.request_started()
+        tracker.request_finished()
+    per_request = (time.perf_counter() - start) / n
+
+    tracker.request_finished()
+    tracker.close()
+    print(f"\nOverhead per request: {per_request * 1e6:.3f} us")
+    assert per_request < 10e-6
+    assert len(counting_method.calls) == 2
+
+
+def test_asgi_middleware(counting_method):
+    seen_during_request = []
+
+    async def app(scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        await asyncio.get_running_loop().run_in_executor(
+            None, _wait_for, lambda: middleware.tracker.active
+        )
+        seen_during_request.append(middleware.tracker.n_in_flight)
+        await send({"type": "http.response.start", "status": 200})
+
+    middleware = ASGIMiddleware(app, grace_period=60)
+
+    async def main():
+        sent = []
+
+        async def send(message):
+            sent.append(message["type"])
+
+        async def receive():
+            return {"type": "http.request"}
+
+        await middleware({"type": "http"}, receive, send)
+        assert middleware.tracker.n_in_flight == 0
+        assert middleware.tracker.active
+
+        lifespan_messages = iter(
+            [{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}]
+        )
+
+        async def lifespan_receive():
+            return next(lifespan_messages)
+
+        await middleware({"type": "lifespan"}, lifespan_receive, send)
+        return sent
+
+    sent = asyncio.run(main())
+    assert seen_during_request == [1]
+    assert sent == [
+        "http.response.start",
+        "lifespan.startup.complete",
+        "lifespan.shutdown.complete",
+    ]
+    # The mode is exited at the shutdown
+    assert middleware.tracker.active is False
+    assert counting_method.calls == [
+        ("enter", "wakepy-inflight"),
+        ("exit", "wakepy-inflight"),
+    ]
+
+
+def test_asgi_middleware_request_fails(counting_method):
+    async def app(scope, receive, send):
+        raise RuntimeError("app fails")
+
+    middleware = ASGIMiddleware(app, grace_period=0)
+    with pytest.raises(RuntimeError, match="app fails"):
+        asyncio.run(middleware({"type": "http"}, None, None))
+    assert middleware.tracker.n_in_flight == 0
+    middleware.tracker.close()
+
+
+def test_wsgi_middleware(counting_method):
+    closed = []
+
+    class Response(list):
+        def close(self):
+            closed.append(True)
+
+    def app(environ, start_response):
+        start_response("200 OK", [])
+        return Response([b"hello", b" world"])
+
+    middleware = WSGIMiddleware(app, grace_period=60)
+    response = middleware({}, lambda status, headers: None)
+    # In flight until the server closes the response
+    assert middleware.tracker.n_in_flight == 1
+    _wait_for(lambda: middleware.tracker.active)
+    assert b"".join(response) == b"hello world"
+    response.close()
+    response.close()
+    assert closed == [True, True]
+    assert middleware.tracker.n_in_flight == 0
+
+    middleware.tracker.close()
+    assert [call for call, _ in counting_method.calls] == ["enter", "exit"]
+
+
+def test_wsgi_middleware_request_fails(counting_method):
+    def app(environ, start_response):
+        raise RuntimeError("app fails")
+
+    middleware = WSGIMiddleware(app, grace_period=0)
+    with pytest.raises(RuntimeError, match="app fails"):
+        middleware({}, lambda status, headers: None)
+    assert middleware.tracker.n_in_flight == 0
+    middleware.tracker.close()
@@ -0,0 +1,78 @@
+"""This module tests the Methods using the wakepy daemon. A real daemon is run
+in a thread, with a fake keep.running Method."""
+
+import socket
+import threading
+
+import pytest
+
+from wakepy.core import CURRENT_PLATFORM, Method, ModeName
+from wakepy.daemon import WakepyDaemon
+from wakepy.methods.wakepyd import WakepyDaemonKeepPresenting, WakepyDaemonKeepRunning
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(socket, "AF_UNIX"), reason="Needs Unix sockets"
+)
+
+
+@pytest.fixture
+def daemon(tmp_path, monkeypatch, empty_method_registry):
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "0")
+    monkeypatch.setattr("wakepy.core.mode._shared_activations", dict())
+
+    class FakeKeepRunning(Method):
+        name = "FakeKeepRunning"
+        mode = ModeName.KEEP_RUNNING
+        supported_platforms = (CURRENT_PLATFORM,)
+
+        def enter_mode(self):
+            pass
+
+    daemon = WakepyDaemon(tmp_path / "wakepy" / "daemon.sock")
+    thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+    thread.start()
+    yield daemon
+    daemon.shutdown()
+    thread.join(5)
+
+
+def test_wakepyd_caniuse(tmp_path, monkeypatch):
+    monkeypatch.delenv("XDG_RUNTIME_DIR", raising=False)
+    assert WakepyDaemonKeepRunning().caniuse() == "XDG_RUNTIME_DIR is not set"
+
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+    assert WakepyDaemonKeepRunning().caniuse() == (
+        "The wakepy daemon is not running (no socket at "
+        f"{tmp_path / 'wakepy' / 'daemon.sock'})"
+    )
+
+
+def test_wakepyd_enter_and_exit_mode(daemon):
+    method1 = WakepyDaemonKeepRunning()
+    method2 = WakepyDaemonKeepRunning()
+    assert method1.caniuse() is True
+
+    method1.enter_mode()
+    method2.enter_mode()
+    assert method1.lease_id != method2.lease_id
+    assert daemon.n_leases == 2
+
+    method1.exit_mode()
+    method2.exit_mode()
+    assert method1.lease_id is None
+    assert daemon.n_leases == 0
+    # Exiting again does nothing
+    method1.exit_mode()
+
+
+def test_wakepyd_enter_mode_fails(daemon):
+    # There are no keep.presenting Methods in the daemon.
+    method = WakepyDaemonKeepPresenting()
+    with pytest.raises(
+        RuntimeError,
+        match='The wakepy daemon responded: ERROR Could not activate Mode "keep.presenting"',
+    ):
+        method.enter_mode()
+    assert method._socket is None
+    assert daemon.n_leases == 0
@@ -3,8 +3,16 @@ import re
 import pytest
 
 from wakepy import ActivationError
-from wakepy.core import ActivationResult, DbusAdapter, Method, Mode, ModeName
-from wakepy.modes import keep
+from wakepy.core import (
+    ActivationResult,
+    CombinedActivationResult,
+    CombinedMode,
+    DbusAdapter,
+    Method,
+    Mode,
+    ModeName,
+)
+from wakepy.modes import combined, keep
 
 
 @pytest.mark.parametrize(
@@ -70,6 +78,38 @@ def test_keep_running_mode_creation(input_args, monkeypatch, testutils):
     mode = function_under_test(dbus_adapter=MyDbusAdapter)
     assert mode._dbus_adapter_cls == MyDbusAdapter
 
+    # Case: Test "strategy" parameter
+    mode = function_under_test(strategy="parallel-probe")
+    assert mode.strategy == "parallel-probe"
+
+    # Case: Test "use_cache" parameter
+    mode = function_under_test(use_cache=True)
+    assert mode.use_cache is True
+
+    # Case: Test "timing" parameter
+    mode = function_under_test(timing=True)
+    assert mode.timing is True
+
+    # Case: Test "activation_timeout" and "method_timeout" parameters
+    mode = function_under_test(activation_timeout=2.5, method_timeout=0.5)
+    assert mode.activation_timeout == 2.5
+    assert mode.method_timeout == 0.5
+
+    # Case: Test "shared" parameter
+    assert function_under_test().shared is False
+    assert function_under_test(shared=True).shared is True
+
+    # Case: Test "linger" parameter
+    assert function_under_test(linger=1.5).linger == 1.5
+
+    # Case: Test "blocking" parameter
+    assert function_under_test().blocking is True
+    assert function_under_test(blocking=False).blocking is False
+
+    # Case: Test "interprocess" parameter
+    assert function_under_test().interprocess is False
+    assert function_under_test(interprocess=True).interprocess is True
+
 
 def test_keep_running_with_fake_success(monkeypatch, fake_dbus_adapter):
     """Simple smoke test for keep.running()"""
@@ -139,3 +179,26 @@ class TestOnFail:
         assert isinstance(m, Mode)
         assert m.name == expected_name
         assert m.activation_result.modename == expected_name
+
+
+def test_combined_with_fake_success(monkeypatch, fake_dbus_adapter):
+    monkeypatch.setenv("WAKEPY_FAKE_SUCCESS", "1")
+    running, presenting = keep.running(), keep.presenting()
+    mode = combined(running, presenting, dbus_adapter=fake_dbus_adapter)
+    assert isinstance(mode, CombinedMode)
+    assert mode.modes == [running, presenting]
+    assert mode.name == "keep.running + keep.presenting"
+
+    with mode as m:
+        assert m.active is True
+        assert running.active is True
+        assert presenting.active is True
+        assert isinstance(m.activation_result, CombinedActivationResult)
+        assert m.activation_result.success is True
+        assert m.activation_result.real_success is False
+        # The modes share the dbus adapter
+        assert running.controller.dbus_adapter is m.dbus_adapter
+        assert presenting.controller.dbus_adapter is m.dbus_adapter
+
+    assert running.active is False
+    assert presenting.active is False
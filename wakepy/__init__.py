@@ -6,6 +6,8 @@ from .core import DbusAdapter as DbusAdapter
 from .core import Method as Method
 from .core import Mode as Mode
 from .core import ModeExit as ModeExit
+from .core import ModeTemplate as ModeTemplate
+from .executor import KeepRunningExecutor as KeepRunningExecutor
 from .modes import keep as keep
 
 __version__ = "0.8.0dev"
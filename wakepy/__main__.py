@@ -7,6 +7,8 @@ This is called either with
 or using the executable
 
     wakepy [args]
+
+The wakepy daemon is started with `wakepy daemon [args]`; see wakepy/daemon.py.
 """
 from __future__ import annotations
 
@@ -42,6 +44,12 @@ WAKEPY_TICKBOXES_TEMPLATE = """
 
 
 def main():
+    if sys.argv[1:2] == ["daemon"]:
+        from wakepy.daemon import run_daemon
+
+        run_daemon(sys.argv[2:])
+        return
+
     modename = parse_arguments(sys.argv[1:])
     mode = create_mode(modename=modename, on_fail=handle_activation_error)
     print(get_startup_text(mode=modename))
@@ -107,6 +115,10 @@ def _get_argparser() -> argparse.ArgumentParser:
             # makes more space for the "options" area on the left
             max_help_position=27,
         ),
+        epilog=(
+            'Run "wakepy daemon -h" for the wakepy daemon, which serves the modes to '
+            "other processes over a Unix socket."
+        ),
     )
 
     parser.add_argument(
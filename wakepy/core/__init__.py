@@ -5,6 +5,8 @@ See the public Python API at: https://wakepy.readthedocs.io/
 """
 
 from .activation import ActivationResult as ActivationResult
+from .activation import ActivationStrategy as ActivationStrategy
+from .activation import CombinedActivationResult as CombinedActivationResult
 from .activation import MethodActivationResult as MethodActivationResult
 from .constants import BusType as BusType
 from .constants import ModeName as ModeName
@@ -15,8 +17,10 @@ from .dbus import DbusMethod as DbusMethod
 from .dbus import DbusMethodCall as DbusMethodCall
 from .method import Method as Method
 from .mode import ActivationError as ActivationError
+from .mode import CombinedMode as CombinedMode
 from .mode import Mode as Mode
 from .mode import ModeExit as ModeExit
+from .mode import ModeTemplate as ModeTemplate
 from .platform import CURRENT_PLATFORM as CURRENT_PLATFORM
 from .registry import get_method as get_method
 from .registry import get_methods as get_methods
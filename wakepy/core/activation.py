@@ -19,23 +19,34 @@ MethodActivationResult
 """
 from __future__ import annotations
 
+import asyncio
 import datetime as dt
+import functools
+import threading
+import time
 import typing
+import warnings
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import List, Set, Union
+from typing import Dict, List, Set, Union
 
+from . import cache
 from .constants import PlatformName
 from .dbus import DbusAdapter
 from .heartbeat import Heartbeat
 from .method import Method, MethodError, MethodOutcome
 from .platform import CURRENT_PLATFORM
+from .registry import get_registry_version
 from .strenum import StrEnum, auto
 
 if typing.TYPE_CHECKING:
-    from typing import Optional, Sequence, Tuple, Type
+    from concurrent.futures import Future
+    from typing import Any, Callable, Optional, Sequence, Tuple, Type
 
     from .method import MethodCls
 
+    RequirementsCheck = Callable[[Method], Tuple[bool, str]]
+
 """The strings in MethodsPriorityOrder are names of wakepy.Methods or the
 asterisk ('*')."""
 MethodsPriorityOrder = List[Union[str, Set[str]]]
@@ -53,6 +64,39 @@ class StageName(StrEnum):
     ACTIVATION = auto()
 
 
+class ActivationStrategy(StrEnum):
+    """The strategy used for going through the prioritized Methods when
+    activating a Mode."""
+
+    # Use the Methods one by one, in priority order. For each Method, the
+    # requirements are checked (.caniuse()) just before trying to enter the
+    # mode with it.
+    SEQUENTIAL = "sequential"
+
+    # Check the requirements (.caniuse()) of all the candidate Methods at the
+    # same time in a thread pool. The modes are still entered one by one, in
+    # the priority order.
+    PARALLEL_PROBE = "parallel-probe"
+
+    # Activate the MAX_RACE_METHODS highest priority Methods at the same time.
+    # The highest priority one which succeeds is kept, and the modes entered
+    # with the others are rolled back (exited).
+    RACE = "race"
+
+
+MAX_PROBE_WORKERS = 8
+"""The maximum number of threads used for checking the requirements of Methods
+with the ActivationStrategy.PARALLEL_PROBE."""
+
+MAX_RACE_METHODS = 4
+"""The maximum number of Methods activated at the same time with the
+ActivationStrategy.RACE."""
+
+PRIORITIZATION_CACHE_SIZE = 128
+"""The maximum number of prioritized method orders kept in memory by
+get_checked_prioritized_methods."""
+
+
 class ActivationResult:
     """The ActivationResult is responsible of keeping track on the possibly
     successful (max 1), failed and unused methods and providing different views
@@ -74,6 +118,18 @@ class ActivationResult:
         Always opposite of `success`. Included for convenience.
     active_method: str | None
         The name of the the active (successful) method, if any.
+    total_time: float | None
+        The total (wall) time of the activation process, in seconds. None
+        unless timing was enabled in the activation.
+    started_methods: list[str]
+        The names of the methods which were activated at the same time with
+        the "race" activation strategy. Empty with other strategies.
+    rolled_back_methods: list[str]
+        The names of the methods which succeeded in the "race" but were rolled
+        back as a higher priority method succeeded, too. These are marked as
+        failed in the method results. The methods which had not finished when
+        the winner was chosen are not waited for (and not listed here); they
+        are rolled back in the background if they succeed.
 
     Methods
     -------
@@ -91,6 +147,9 @@ class ActivationResult:
         self,
         results: Optional[List[MethodActivationResult]] = None,
         modename: Optional[str] = None,
+        total_time: Optional[float] = None,
+        started_methods: Optional[List[str]] = None,
+        rolled_back_methods: Optional[List[str]] = None,
     ):
         """
         Parameters
@@ -99,6 +158,14 @@ class ActivationResult:
             The MethodActivationResults to be used to fill the ActivationResult
         modename:
             Name of the Mode. Optional.
+        total_time:
+            The total time of the activation process, in seconds. Optional.
+        started_methods:
+            The names of the methods started at the same time in a "race".
+            Optional.
+        rolled_back_methods:
+            The names of the methods which were rolled back after a "race".
+            Optional.
         """
 
         # These are the retuls for each of the used wakepy.Methods, in the
@@ -106,6 +173,9 @@ class ActivationResult:
         # lowest priority)
         self._method_results: list[MethodActivationResult] = results or []
         self.modename = modename
+        self.total_time = total_time
+        self.started_methods: List[str] = started_methods or []
+        self.rolled_back_methods: List[str] = rolled_back_methods or []
 
     @property
     def real_success(self) -> bool:
@@ -237,6 +307,74 @@ class ActivationResult:
             f"order (highest priority first):\n{debug_info}"
         )
 
+    def __repr__(self):
+        total_time = (
+            f", total_time={_format_duration(self.total_time)}"
+            if self.total_time is not None
+            else ""
+        )
+        return (
+            f"<ActivationResult {self.modename or '[unnamed mode]'}: "
+            f"{'SUCCESS' if self.success else 'FAIL'}{total_time}, "
+            f"methods={self.query()}>"
+        )
+
+
+class CombinedActivationResult(ActivationResult):
+    """The ActivationResult of multiple Modes which were activated together
+    (see wakepy.modes.combined). The method results of all the Modes are
+    listed by .list_methods() and .query(), in the order of the Modes.
+
+    Attributes
+    ----------
+    results: list[ActivationResult]
+        The activation results of the Modes, in the order of the Modes.
+    success: bool
+        True if the activation of all the Modes was successful.
+    real_success: bool
+        Like `success`, but may not be faked with WAKEPY_FAKE_SUCCESS.
+    active_methods: list[str]
+        The names of the active methods of all the Modes.
+    """
+
+    def __init__(
+        self,
+        results: List[ActivationResult],
+        modename: Optional[str] = None,
+    ):
+        super().__init__(
+            [res for result in results for res in result._method_results],
+            modename=modename,
+        )
+        self.results = results
+
+    @property
+    def real_success(self) -> bool:
+        return bool(self.results) and all(r.real_success for r in self.results)
+
+    @property
+    def success(self) -> bool:
+        return bool(self.results) and all(r.success for r in self.results)
+
+    @property
+    def active_methods(self) -> list[str]:
+        """The names of the active methods of all the Modes."""
+        return [str(r.active_method) for r in self.results if r.active_method]
+
+    @property
+    def active_method(self) -> str | None:
+        """The names of the active methods of all the Modes, separated with
+        commas. None if no method is active."""
+        return ", ".join(self.active_methods) or None
+
+    def get_error_text(self) -> str:
+        """Gets information about the failures of the Modes as text. In case
+        the activation of all the Modes was successful, returns an empty
+        string."""
+        return "\n\n".join(
+            result.get_error_text() for result in self.results if result.failure
+        )
+
 
 @dataclass
 class MethodActivationResult:
@@ -255,13 +393,39 @@ class MethodActivationResult:
 
     failure_reason: str = ""
 
+    # The durations of each of the stages (in seconds) which were run, and the
+    # duration of the heartbeat() call in the ACTIVATION stage, if it was
+    # called. None unless timing was enabled in the activation.
+    stage_durations: Optional[Dict[StageName, float]] = None
+    heartbeat_duration: Optional[float] = None
+
+    # True if the method did not finish in its time budget (see the
+    # activation_timeout and method_timeout in activate_mode). Then, the
+    # failure_stage is the stage which was in progress.
+    timed_out: bool = False
+
     def __repr__(self):
         error_at = " @" + self.failure_stage if self.failure_stage else ""
         failure_reason = f', "{self.failure_reason}"' if self.success is False else ""
         success_str = (
             "SUCCESS" if self.success else "FAIL" if self.success is False else "UNUSED"
         )
-        return f"({success_str}{error_at}, {self.method_name}{failure_reason})"
+        durations = ""
+        if self.stage_durations is not None:
+            items = [
+                f"{stage}: {_format_duration(duration)}"
+                for stage, duration in self.stage_durations.items()
+            ]
+            if self.heartbeat_duration is not None:
+                items.append(f"heartbeat: {_format_duration(self.heartbeat_duration)}")
+            durations = f" [{', '.join(items)}]"
+        return (
+            f"({success_str}{error_at}, {self.method_name}{failure_reason}{durations})"
+        )
+
+
+def _format_duration(seconds: float) -> str:
+    return f"{seconds * 1000:.3f}ms"
 
 
 def activate_mode(
@@ -269,6 +433,12 @@ def activate_mode(
     dbus_adapter: Optional[DbusAdapter] = None,
     methods_priority: Optional[MethodsPriorityOrder] = None,
     modename: Optional[str] = None,
+    strategy: ActivationStrategy | str = ActivationStrategy.SEQUENTIAL,
+    use_cache: bool = False,
+    timing: bool = False,
+    activation_timeout: Optional[float] = None,
+    method_timeout: Optional[float] = None,
+    requirements_check: Optional[RequirementsCheck] = None,
 ) -> Tuple[ActivationResult, Optional[Method], Optional[Heartbeat]]:
     """Activates a mode defined by a collection of Methods. Only the first
     Method which succeeds activation will be used, in order from highest
@@ -294,31 +464,504 @@ def activate_mode(
         Name of the Mode. Used for communication to user, logging and in
         error messages (can be "any string" which makes sense to you).
         Optional.
+    strategy:
+        The activation strategy. Either "sequential" (the default),
+        "parallel-probe" or "race". See ActivationStrategy. The
+        "sequential" and "parallel-probe" strategies give the same
+        ActivationResult. With "race", the methods which succeeded but lost
+        the race are rolled back, and are marked as failed in the
+        ActivationResult.
+    use_cache:
+        If True, and the `modename` is given, uses the on-disk cache of
+        activation plans (see wakepy.core.cache): The Method which succeeded
+        last time in the same environment is tried first, and the rest of the
+        methods are tried in the normal priority order only if it fails. The
+        cache is updated after the activation.
+    timing:
+        If True, the durations of the activation stages of each Method are
+        recorded into the MethodActivationResults, and the total time into the
+        ActivationResult. Default: False.
+    activation_timeout:
+        The maximum total time (in seconds) to spend in the activation. When
+        the time runs out, the method being tried is abandoned (recorded as
+        timed out), and the rest of the methods are not tried. None (the
+        default) means no time limit.
+    method_timeout:
+        The maximum time (in seconds) to spend with a single Method. A method
+        which does not finish in time is recorded as timed out, and the next
+        method is tried. Not applied to the thread bound methods (see
+        Method.thread_bound). None (the default) means no time limit.
+    requirements_check:
+        The function used for checking the requirements of the methods. See
+        activate_method. If None (the default), uses caniuse_fails.
+
+    Notes
+    -----
+    With `activation_timeout` or `method_timeout`, the methods are activated
+    in a separate (daemon) thread, which is abandoned if the method does not
+    finish in time. If an abandoned method succeeds later, the mode is exited
+    with it right away. Methods which must be entered and exited in the same
+    thread (like the SetThreadExecutionState on Windows) do not work with the
+    timeouts.
     """
-    check_methods_priority(methods_priority, methods)
+    start = time.perf_counter() if timing else 0.0
+    deadline = (
+        time.monotonic() + activation_timeout
+        if activation_timeout is not None
+        else None
+    )
 
-    if not methods:
+    if strategy not in ActivationStrategy:
+        raise ValueError(
+            f'Unknown activation strategy "{strategy}"! Valid options are: '
+            f"{[str(s) for s in ActivationStrategy]}"
+        )
+    for name, timeout in (
+        ("activation_timeout", activation_timeout),
+        ("method_timeout", method_timeout),
+    ):
+        if timeout is not None and timeout <= 0:
+            raise ValueError(f"{name} must be a positive number! Got: {timeout}")
+    prioritized_methods = get_checked_prioritized_methods(methods, methods_priority)
+
+    if not prioritized_methods:
         # Cannot activate anything as there are no methods.
         return ActivationResult(modename=modename), None, None
 
-    prioritized_methods = get_prioritized_methods(methods, methods_priority)
+    use_cache = use_cache and modename is not None
+    if use_cache:
+        methods_to_try = _get_methods_using_cached_plan(
+            prioritized_methods, cache.get_cached_plan(str(modename))
+        )
+    else:
+        methods_to_try = list(prioritized_methods)
     # The fake method is always checked first (WAKEPY_FAKE_SUCCESS)
-    prioritized_methods.insert(0, WakepyFakeSuccess)
+    methods_to_try.insert(0, WakepyFakeSuccess)
+
+    if strategy == ActivationStrategy.PARALLEL_PROBE:
+        activate = _activate_mode_with_parallel_probes
+    elif strategy == ActivationStrategy.RACE:
+        activate = _activate_mode_with_race
+    else:
+        activate = _activate_mode_sequentially
+    result, active_method, heartbeat = activate(
+        methods_to_try,
+        dbus_adapter=dbus_adapter,
+        modename=modename,
+        timing=timing,
+        deadline=deadline,
+        method_timeout=method_timeout,
+        requirements_check=requirements_check,
+    )
+
+    if use_cache:
+        _update_cached_plan(str(modename), prioritized_methods, result)
+
+    if timing:
+        result.total_time = time.perf_counter() - start
+
+    return result, active_method, heartbeat
+
+
+async def activate_mode_async(
+    methods: list[Type[Method]], **kwargs: Any
+) -> Tuple[ActivationResult, Optional[Method], Optional[Heartbeat]]:
+    """Like activate_mode, but a coroutine. Takes the same arguments as
+    activate_mode.
+
+    The activation is run in a thread of the default executor of the running
+    event loop, so the blocking calls of the Methods (for example, D-Bus
+    calls) do not block the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        None, functools.partial(activate_mode, methods, **kwargs)
+    )
+
+
+def _activate_mode_sequentially(
+    prioritized_methods: List[MethodCls],
+    dbus_adapter: Optional[DbusAdapter] = None,
+    modename: Optional[str] = None,
+    timing: bool = False,
+    deadline: Optional[float] = None,
+    method_timeout: Optional[float] = None,
+    requirements_check: Optional[RequirementsCheck] = None,
+) -> Tuple[ActivationResult, Optional[Method], Optional[Heartbeat]]:
+    """The ActivationStrategy.SEQUENTIAL version of activate_mode."""
+    methods = [
+        methodcls(dbus_adapter=dbus_adapter) for methodcls in prioritized_methods
+    ]
+    results, active_method, heartbeat = _activate_first_working(
+        methods,
+        requirements_check=requirements_check,
+        timing=timing,
+        deadline=deadline,
+        method_timeout=method_timeout,
+    )
+    return ActivationResult(results, modename=modename), active_method, heartbeat
+
+
+def _activate_mode_with_parallel_probes(
+    prioritized_methods: List[MethodCls],
+    dbus_adapter: Optional[DbusAdapter] = None,
+    modename: Optional[str] = None,
+    timing: bool = False,
+    deadline: Optional[float] = None,
+    method_timeout: Optional[float] = None,
+    requirements_check: Optional[RequirementsCheck] = None,
+) -> Tuple[ActivationResult, Optional[Method], Optional[Heartbeat]]:
+    """The ActivationStrategy.PARALLEL_PROBE version of activate_mode. The
+    requirements of all the platform-supported methods are checked at the same
+    time in a thread pool, and the methods are then activated in the priority
+    order, each one as soon as its requirements check is ready. With timing,
+    the REQUIREMENTS duration is the time spent waiting for the check."""
+
+    methods = [
+        methodcls(dbus_adapter=dbus_adapter) for methodcls in prioritized_methods
+    ]
+    candidates = [m for m in methods if get_platform_supported(m, CURRENT_PLATFORM)]
+
+    probes: Dict[Method, Future[Tuple[bool, str]]] = dict()
+
+    executor = ThreadPoolExecutor(
+        max_workers=max(1, min(len(candidates), MAX_PROBE_WORKERS)),
+        thread_name_prefix="wakepy-probe",
+    )
+    try:
+        for method in candidates:
+            probes[method] = executor.submit(
+                requirements_check or caniuse_fails, method
+            )
+
+        results, active_method, heartbeat = _activate_first_working(
+            methods,
+            requirements_check=lambda m: probes[m].result(),
+            timing=timing,
+            deadline=deadline,
+            method_timeout=method_timeout,
+        )
+    finally:
+        # Do not wait for the requirement checks which are not needed anymore.
+        for probe in probes.values():
+            probe.cancel()
+        executor.shutdown(wait=False)
+
+    return ActivationResult(results, modename=modename), active_method, heartbeat
+
+
+def _activate_mode_with_race(
+    prioritized_methods: List[MethodCls],
+    dbus_adapter: Optional[DbusAdapter] = None,
+    modename: Optional[str] = None,
+    timing: bool = False,
+    deadline: Optional[float] = None,
+    method_timeout: Optional[float] = None,
+    requirements_check: Optional[RequirementsCheck] = None,
+) -> Tuple[ActivationResult, Optional[Method], Optional[Heartbeat]]:
+    """The ActivationStrategy.RACE version of activate_mode. The fake method
+    (WakepyFakeSuccess) is used first, as always. Then, the MAX_RACE_METHODS
+    highest priority methods supported by the platform are activated at the
+    same time in a thread pool. As soon as all the methods with a higher
+    priority have failed, the highest priority method which succeeded is kept,
+    without waiting for the rest. The modes entered with the other methods are
+    rolled back; right away, if they had finished, and otherwise in the
+    background, when they finish. If none of them succeeded, the rest of the
+    methods are tried one by one. The thread bound methods (see
+    Method.thread_bound) are not raced, but activated in the calling thread.
+
+    Raises
+    ------
+    RuntimeError, if any of the methods which lost the race can not be
+    rolled back (of the ones which had finished when the winner was
+    chosen). All the losers are rolled back, and the winner is deactivated,
+    before raising. The failed background rollbacks are warned about.
+    """
+
+    methods = [
+        methodcls(dbus_adapter=dbus_adapter) for methodcls in prioritized_methods
+    ]
+    if methods and isinstance(methods[0], WakepyFakeSuccess):
+        fake_method = methods.pop(0)
+        fake_result, _ = activate_method(fake_method, timing=timing)
+        if fake_result.success:
+            return ActivationResult([fake_result], modename=modename), fake_method, None
+        results = [fake_result]
+    else:
+        results = []
+
+    # The race covers the methods up to the MAX_RACE_METHODS:th supported one.
+    # The ones not supported by the platform fail right away. The thread bound
+    # methods are not raced, as the threads of the race exit afterwards; they
+    # are activated in this thread, in their turn, if no method with higher
+    # priority succeeded.
+    racers: List[Method] = []
+    n_raced = 0
+    for method in methods:
+        if len(racers) == MAX_RACE_METHODS:
+            break
+        n_raced += 1
+        if get_platform_supported(method, CURRENT_PLATFORM):
+            if not method.thread_bound:
+                racers.append(method)
+
+    budget = _get_time_budget(deadline, method_timeout)
+    outcomes: Dict[Method, Future[Tuple[MethodActivationResult, Heartbeat | None]]]
+    outcomes = dict()
+    executor = ThreadPoolExecutor(
+        max_workers=max(1, len(racers)), thread_name_prefix="wakepy-race"
+    )
+    active_method: Optional[Method] = None
+    heartbeat: Optional[Heartbeat] = None
+    losers: List[Tuple[Method, Heartbeat | None]] = []
+    try:
+        for method in racers:
+            if budget is None:
+                outcomes[method] = executor.submit(
+                    activate_method,
+                    method,
+                    requirements_check=requirements_check,
+                    timing=timing,
+                )
+            else:
+                outcomes[method] = executor.submit(
+                    activate_method_with_timeout,
+                    method,
+                    budget,
+                    requirements_check=requirements_check,
+                    timing=timing,
+                )
+
+        for method in methods[:n_raced]:
+            future = outcomes.pop(method, None)
+            if method.thread_bound and future is None:
+                if active_method is not None:
+                    results.append(
+                        MethodActivationResult(
+                            method_name=str(method.name), success=None
+                        )
+                    )
+                    continue
+                methodresult, method_heartbeat = activate_method(
+                    method, requirements_check=requirements_check, timing=timing
+                )
+            elif future is None:
+                methodresult, _ = activate_method(method, timing=timing)
+                results.append(methodresult)
+                continue
+            elif active_method is not None and not future.done():
+                # The winner is known; do not wait for the lower priority ones.
+                _rollback_race_loser_when_done(method, future)
+                results.append(
+                    MethodActivationResult(
+                        method_name=str(method.name),
+                        success=False,
+                        failure_stage=StageName.ACTIVATION,
+                        failure_reason=(
+                            "Not waited for; the higher priority method "
+                            f"{active_method.name} succeeded"
+                        ),
+                    )
+                )
+                continue
+            else:
+                methodresult, method_heartbeat = future.result()
+            if methodresult.success and active_method is not None:
+                losers.append((method, method_heartbeat))
+                methodresult.success = False
+                methodresult.failure_stage = StageName.ACTIVATION
+                methodresult.failure_reason = (
+                    f"Rolled back; the higher priority method {active_method.name} "
+                    "succeeded"
+                )
+            elif methodresult.success:
+                active_method, heartbeat = method, method_heartbeat
+            results.append(methodresult)
+    except BaseException:
+        # Do not leave any of the modes on.
+        for method, future in outcomes.items():
+            _rollback_race_loser_when_done(method, future)
+        if active_method is not None:
+            losers.append((active_method, heartbeat))
+        for method, method_heartbeat in losers:
+            try:
+                _rollback_race_loser(method, method_heartbeat)
+            except RuntimeError:
+                pass
+        raise
+    finally:
+        # Do not wait for the methods which are not needed anymore.
+        executor.shutdown(wait=False)
+
+    result = ActivationResult(
+        results,
+        modename=modename,
+        started_methods=[str(m.name) for m in racers],
+        rolled_back_methods=[str(m.name) for m, _ in losers],
+    )
+    # Every loser is rolled back, even if some of the rollbacks fail.
+    rollback_errors: List[RuntimeError] = []
+    for method, method_heartbeat in losers:
+        try:
+            _rollback_race_loser(method, method_heartbeat)
+        except RuntimeError as exc:
+            rollback_errors.append(exc)
+    if rollback_errors:
+        # Cannot tell in which state the system is; do not leave the mode on.
+        if active_method is not None:
+            deactivate_method(active_method, heartbeat)
+        raise RuntimeError(
+            f"Could not roll back {len(rollback_errors)} method(s) which lost "
+            "the race: " + " | ".join(str(exc) for exc in rollback_errors)
+        ) from rollback_errors[0]
+
+    if active_method is not None:
+        return result, active_method, heartbeat
+
+    # Nothing in the race succeeded. Fall back to the rest of the methods.
+    fallback_results, active_method, heartbeat = _activate_first_working(
+        methods[n_raced:],
+        requirements_check=requirements_check,
+        timing=timing,
+        deadline=deadline,
+        method_timeout=method_timeout,
+    )
+    result._method_results.extend(fallback_results)
+    return result, active_method, heartbeat
 
-    results = []
 
-    for methodcls in prioritized_methods:
-        method = methodcls(dbus_adapter=dbus_adapter)
-        methodresult, heartbeat = activate_method(method)
+def _rollback_race_loser(method: Method, heartbeat: Optional[Heartbeat]) -> None:
+    """Rolls back a mode entered with a method which lost the race."""
+    if heartbeat is not None:
+        heartbeat.stop()
+    _rollback_with_exit(method)
+
+
+def _rollback_race_loser_when_done(
+    method: Method, future: Future[Tuple[MethodActivationResult, Heartbeat | None]]
+) -> None:
+    """Rolls back a mode entered with a method which lost the race, when the
+    activation (`future`) finishes, in the background. Used for the methods
+    which had not finished when the winner of the race was chosen."""
+
+    def _rollback(
+        future: Future[Tuple[MethodActivationResult, Heartbeat | None]],
+    ) -> None:
+        if future.cancelled() or future.exception() is not None:
+            return
+        methodresult, heartbeat = future.result()
+        if not methodresult.success:
+            return
+        try:
+            _rollback_race_loser(method, heartbeat)
+        except RuntimeError as exc:
+            warnings.warn(
+                f"Could not roll back {method.name}, which succeeded after losing "
+                f"the race! {exc}"
+            )
+
+    future.add_done_callback(_rollback)
+
+
+def _activate_first_working(
+    methods: List[Method],
+    requirements_check: Optional[RequirementsCheck] = None,
+    timing: bool = False,
+    deadline: Optional[float] = None,
+    method_timeout: Optional[float] = None,
+) -> Tuple[List[MethodActivationResult], Optional[Method], Optional[Heartbeat]]:
+    """Tries to activate the `methods` one by one, in the given order, until
+    one of them succeeds.
+
+    If `deadline` (a time.monotonic() value) or `method_timeout` (seconds) is
+    given, each of the methods is given a time budget; the smaller one of the
+    `method_timeout` and the time left until the `deadline`. A method which
+    does not finish in its budget is recorded as timed out, and the next
+    method is tried. If the `deadline` is reached, the methods not tried yet
+    are recorded as unused."""
+    results: List[MethodActivationResult] = []
+
+    for idx, method in enumerate(methods):
+        budget = _get_time_budget(deadline, method_timeout)
+        if budget is not None and budget <= 0:
+            results.extend(
+                MethodActivationResult(method_name=str(m.name), success=None)
+                for m in methods[idx:]
+            )
+            break
+
+        if budget is None:
+            methodresult, heartbeat = activate_method(
+                method, requirements_check=requirements_check, timing=timing
+            )
+        else:
+            methodresult, heartbeat = activate_method_with_timeout(
+                method,
+                timeout=budget,
+                requirements_check=requirements_check,
+                timing=timing,
+            )
         results.append(methodresult)
         if methodresult.success:
-            break
-    else:
-        # Tried activate with all methods, but none of them succeed
-        return ActivationResult(results, modename=modename), None, None
+            return results, method, heartbeat
+
+    # Tried activate with all methods, but none of them succeed
+    return results, None, None
+
+
+def _get_time_budget(
+    deadline: Optional[float], method_timeout: Optional[float]
+) -> Optional[float]:
+    """The time budget (in seconds) for the next method, or None if there is
+    no time limit."""
+    if deadline is None:
+        return method_timeout
+    time_left = deadline - time.monotonic()
+    return time_left if method_timeout is None else min(time_left, method_timeout)
+
+
+def _get_methods_using_cached_plan(
+    prioritized_methods: Sequence[MethodCls], plan: Optional[cache.CachedPlan]
+) -> List[MethodCls]:
+    """Reorders the `prioritized_methods` using the cached activation `plan`.
+    If the plan is valid, the winner of the plan is moved first, and the rest
+    of the methods are kept in the priority order (as a fallback). The plan is
+    valid only if the methods before the winner in the `prioritized_methods`
+    are exactly the methods which failed before the winner when the plan was
+    stored; otherwise the methods or their priority order have changed."""
 
-    # Activation was succesful.
-    return ActivationResult(results, modename=modename), method, heartbeat
+    names = [m.name for m in prioritized_methods]
+    if plan is None or plan.winner not in names:
+        return list(prioritized_methods)
+
+    winner_idx = names.index(plan.winner)
+    if tuple(names[:winner_idx]) != plan.failed:
+        return list(prioritized_methods)
+
+    winner = prioritized_methods[winner_idx]
+    return [winner] + [m for m in prioritized_methods if m is not winner]
+
+
+def _update_cached_plan(
+    modename: str, prioritized_methods: Sequence[MethodCls], result: ActivationResult
+) -> None:
+    """Updates the cached activation plan for a mode after activation. Fake
+    successes (WAKEPY_FAKE_SUCCESS) are not stored."""
+
+    if not result.real_success:
+        if result.success is False:
+            cache.remove_plan(modename)
+        return
+
+    names = [m.name for m in prioritized_methods]
+    winner = result.active_method
+    if winner not in names:  # pragma: no cover
+        return
+    cache.store_plan(
+        modename,
+        winner=str(winner),
+        failed=tuple(str(name) for name in names[: names.index(winner)]),
+    )
 
 
 def check_methods_priority(
@@ -391,6 +1034,73 @@ def _iterate_methods_priority(
             yield item, False
 
 
+def get_checked_prioritized_methods(
+    methods: Sequence[MethodCls],
+    methods_priority: Optional[MethodsPriorityOrder] = None,
+) -> Tuple[MethodCls, ...]:
+    """Checks the `methods_priority` with check_methods_priority and returns
+    the `methods` in priority order, like get_prioritized_methods.
+
+    The results are memoized (in a LRU cache with PRIORITIZATION_CACHE_SIZE
+    entries), as the same Mode is typically activated with the same arguments
+    over and over again. The cache key consists of the `methods`, the
+    normalized `methods_priority`, the CURRENT_PLATFORM and the version of the
+    method registry, so the cached results are not used if any of them
+    change.
+
+    Raises
+    ------
+    ValueError or TypeError if the `methods_priority` is not valid.
+    """
+    try:
+        priority_key = _get_methods_priority_key(methods_priority)
+        key = (tuple(methods), priority_key, CURRENT_PLATFORM, get_registry_version())
+        hash(key)
+    except TypeError:
+        # Invalid methods_priority. Let check_methods_priority tell what is
+        # wrong with it.
+        return _get_checked_prioritized_methods(tuple(methods), methods_priority)
+    return _get_checked_prioritized_methods_cached(*key)
+
+
+def _get_methods_priority_key(
+    methods_priority: Optional[MethodsPriorityOrder],
+) -> Optional[Tuple[str | frozenset[str], ...]]:
+    """Converts `methods_priority` to a hashable form."""
+    if methods_priority is None:
+        return None
+    return tuple(
+        frozenset(item) if isinstance(item, set) else item for item in methods_priority
+    )
+
+
+@functools.lru_cache(maxsize=PRIORITIZATION_CACHE_SIZE)
+def _get_checked_prioritized_methods_cached(
+    methods: Tuple[MethodCls, ...],
+    priority_key: Optional[Tuple[str | frozenset[str], ...]],
+    platform: PlatformName,
+    registry_version: int,
+) -> Tuple[MethodCls, ...]:
+    # The platform and registry_version are only part of the cache key.
+    _ = platform, registry_version
+    methods_priority: Optional[MethodsPriorityOrder] = (
+        None
+        if priority_key is None
+        else [
+            set(item) if isinstance(item, frozenset) else item for item in priority_key
+        ]
+    )
+    return _get_checked_prioritized_methods(methods, methods_priority)
+
+
+def _get_checked_prioritized_methods(
+    methods: Tuple[MethodCls, ...],
+    methods_priority: Optional[MethodsPriorityOrder],
+) -> Tuple[MethodCls, ...]:
+    check_methods_priority(methods_priority, list(methods))
+    return tuple(get_prioritized_methods(list(methods), methods_priority))
+
+
 def get_prioritized_methods_groups(
     methods: List[MethodCls], methods_priority: Optional[MethodsPriorityOrder]
 ) -> List[Set[MethodCls]]:
@@ -540,9 +1250,26 @@ def get_prioritized_methods(
     return [method for group in ordered_groups for method in group]
 
 
-def activate_method(method: Method) -> Tuple[MethodActivationResult, Heartbeat | None]:
+def activate_method(
+    method: Method,
+    requirements_check: Optional[RequirementsCheck] = None,
+    timing: bool = False,
+) -> Tuple[MethodActivationResult, Heartbeat | None]:
     """Activates a mode defined by a single Method.
 
+    Parameters
+    ----------
+    method:
+        The Method to activate the mode with.
+    requirements_check:
+        The function used for checking the requirements of the `method`. Takes
+        the method as the only argument and returns a (fail, message) tuple
+        like caniuse_fails, which is used if this is None (the default). Any
+        other function may be used for example for using a requirements check
+        which has been started beforehand.
+    timing:
+        If True, records the durations of the stages into the result.
+
     Returns
     -------
     result:
@@ -555,18 +1282,33 @@ def activate_method(method: Method) -> Tuple[MethodActivationResult, Heartbeat |
         raise ValueError("Methods without a name may not be used to activate modes!")
 
     result = MethodActivationResult(success=False, method_name=method.name)
-
-    if not get_platform_supported(method, platform=CURRENT_PLATFORM):
+    if timing:
+        result.stage_durations = dict()
+        start = time.perf_counter()
+
+    platform_supported = get_platform_supported(method, platform=CURRENT_PLATFORM)
+    if timing:
+        start = _record_stage_duration(result, StageName.PLATFORM_SUPPORT, start)
+    if not platform_supported:
         result.failure_stage = StageName.PLATFORM_SUPPORT
         return result, None
 
-    requirements_fail, err_message = caniuse_fails(method)
+    requirements_check = requirements_check or caniuse_fails
+    requirements_fail, err_message = requirements_check(method)
+    if timing:
+        start = _record_stage_duration(result, StageName.REQUIREMENTS, start)
     if requirements_fail:
         result.failure_stage = StageName.REQUIREMENTS
         result.failure_reason = err_message
         return result, None
 
-    success, err_message, heartbeat_call_time = try_enter_and_heartbeat(method)
+    if timing:
+        success, err_message, heartbeat_call_time = try_enter_and_heartbeat(
+            method, result=result
+        )
+        _record_stage_duration(result, StageName.ACTIVATION, start)
+    else:
+        success, err_message, heartbeat_call_time = try_enter_and_heartbeat(method)
     if not success:
         result.failure_stage = StageName.ACTIVATION
         result.failure_reason = err_message
@@ -584,6 +1326,121 @@ def activate_method(method: Method) -> Tuple[MethodActivationResult, Heartbeat |
     return result, heartbeat
 
 
+def activate_method_with_timeout(
+    method: Method,
+    timeout: float,
+    requirements_check: Optional[RequirementsCheck] = None,
+    timing: bool = False,
+) -> Tuple[MethodActivationResult, Heartbeat | None]:
+    """Activates a mode defined by a single Method, like activate_method, but
+    gives up waiting for the `method` after `timeout` seconds.
+
+    The activation is run in a separate (daemon) thread. If it does not finish
+    in time, the thread is abandoned and a failed result with timed_out=True
+    is returned; the failure_stage is the stage which was in progress. If the
+    abandoned activation succeeds later, the mode is exited right away with
+    deactivate_method, so that the mode is not left on (no lock is leaked).
+
+    The thread bound Methods (see Method.thread_bound) would be entered only
+    for the short-lived activation thread. They are activated in the calling
+    thread, with activate_method, and the `timeout` is not applied to them.
+
+    Parameters
+    ----------
+    method:
+        The Method to activate the mode with.
+    timeout:
+        The maximum time to wait for the activation, in seconds.
+    requirements_check:
+        The function used for checking the requirements of the `method`. See
+        activate_method.
+    timing:
+        If True, records the durations of the stages into the result.
+    """
+    if method.thread_bound:
+        return activate_method(
+            method, requirements_check=requirements_check, timing=timing
+        )
+
+    check: RequirementsCheck = requirements_check or caniuse_fails
+    lock = threading.Lock()
+    # The stage in progress, and the outcome of the activation (if it finished
+    # in time). Shared with the activation thread.
+    stage = [StageName.PLATFORM_SUPPORT]
+    outcome: List[Tuple[MethodActivationResult, Heartbeat | None] | Exception] = []
+    abandoned = threading.Event()
+
+    def _check_requirements(method: Method) -> Tuple[bool, str]:
+        stage[0] = StageName.REQUIREMENTS
+        requirements_fail, err_message = check(method)
+        stage[0] = StageName.ACTIVATION
+        return requirements_fail, err_message
+
+    def _activate() -> None:
+        res: Tuple[MethodActivationResult, Heartbeat | None] | Exception
+        try:
+            res = activate_method(
+                method, requirements_check=_check_requirements, timing=timing
+            )
+        except Exception as exc:
+            res = exc
+        with lock:
+            if not abandoned.is_set():
+                outcome.append(res)
+                return
+        if not isinstance(res, Exception) and res[0].success:
+            _deactivate_abandoned(method, res[1])
+
+    thread = threading.Thread(
+        target=_activate, name=f"wakepy-activate-{method.name}", daemon=True
+    )
+    thread.start()
+    thread.join(timeout)
+
+    with lock:
+        if not outcome:
+            abandoned.set()
+    if outcome:
+        if isinstance(outcome[0], Exception):
+            raise outcome[0]
+        return outcome[0]
+
+    return (
+        MethodActivationResult(
+            method_name=str(method.name),
+            success=False,
+            failure_stage=stage[0],
+            failure_reason=f"Timed out after {timeout:.3g} seconds",
+            timed_out=True,
+        ),
+        None,
+    )
+
+
+def _deactivate_abandoned(method: Method, heartbeat: Optional[Heartbeat]) -> None:
+    """Deactivates a mode which was activated with a method which had already
+    timed out."""
+    try:
+        deactivate_method(method, heartbeat)
+    except MethodError as exc:
+        warnings.warn(
+            f"Could not exit the mode with {method.name}, which succeeded after it "
+            f"had timed out! {exc}"
+        )
+
+
+def _record_stage_duration(
+    result: MethodActivationResult, stage: StageName, start: float
+) -> float:
+    """Records the duration of a `stage` which started at `start` (a
+    time.perf_counter() value) into the `result`. Returns the current
+    time.perf_counter() value, which is the start of the next stage."""
+    now = time.perf_counter()
+    assert result.stage_durations is not None
+    result.stage_durations[stage] = now - start
+    return now
+
+
 def deactivate_method(method: Method, heartbeat: Optional[Heartbeat] = None) -> None:
     """Deactivates a mode defined by the `method`.
 
@@ -595,19 +1452,19 @@ def deactivate_method(method: Method, heartbeat: Optional[Heartbeat] = None) ->
     heartbeat_stopped = heartbeat.stop() if heartbeat is not None else True
 
     if method.has_exit:
-        errortxt = (
-            f"The exit_mode of '{method.__class__.__name__}' ({method.name}) was "
-            "unsuccessful! This should never happen, and could mean that the "
-            "implementation has a bug. Entering the mode has been successful, and "
-            "since exiting was not, your system might still be in the mode defined "
-            f"by the '{method.__class__.__name__}', or not.  Suggesting submitting "
-            f"a bug report and rebooting for clearing the mode. "
-        )
         try:
             retval = method.exit_mode()
             if retval is not None:
                 raise ValueError("exit_mode returned a value other than None!")
         except Exception as e:
+            errortxt = (
+                f"The exit_mode of '{method.__class__.__name__}' ({method.name}) was "
+                "unsuccessful! This should never happen, and could mean that the "
+                "implementation has a bug. Entering the mode has been successful, and "
+                "since exiting was not, your system might still be in the mode "
+                f"defined by the '{method.__class__.__name__}', or not.  Suggesting "
+                "submitting a bug report and rebooting for clearing the mode. "
+            )
             raise MethodError(errortxt + "Original error: " + str(e))
 
     if heartbeat_stopped is not True:
@@ -618,6 +1475,20 @@ def deactivate_method(method: Method, heartbeat: Optional[Heartbeat] = None) ->
         )
 
 
+async def deactivate_method_async(
+    method: Method, heartbeat: Optional[Heartbeat] = None
+) -> None:
+    """Like deactivate_method, but a coroutine. The deactivation is run in a
+    thread of the default executor of the running event loop.
+
+    Raises
+    ------
+    MethodError (RuntimeError), if the deactivation was not successful.
+    """
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, deactivate_method, method, heartbeat)
+
+
 def get_platform_supported(method: Method, platform: PlatformName) -> bool:
     """Checks if method is supported by the platform
 
@@ -661,10 +1532,20 @@ def caniuse_fails(method: Method) -> tuple[bool, str]:
     return fail, message
 
 
-def try_enter_and_heartbeat(method: Method) -> Tuple[bool, str, Optional[dt.datetime]]:
+def try_enter_and_heartbeat(
+    method: Method, result: Optional[MethodActivationResult] = None
+) -> Tuple[bool, str, Optional[dt.datetime]]:
     """Try to use a Method to to activate a mode. First, with
     method.enter_mode(), and then with the method.heartbeat()
 
+    Parameters
+    ----------
+    method:
+        The method to use.
+    result:
+        If given, the duration of the method.heartbeat() call is recorded
+        into the result (as heartbeat_duration). Optional.
+
     Returns
     -------
     success, err_message, heartbeat_call_time
@@ -716,7 +1597,7 @@ def try_enter_and_heartbeat(method: Method) -> Tuple[bool, str, Optional[dt.date
     if enter_outcome == MethodOutcome.FAILURE:  # 1) F*
         return False, enter_errmessage, None
 
-    hb_outcome, hb_errmessage, hb_calltime = _try_heartbeat(method)
+    hb_outcome, hb_errmessage, hb_calltime = _try_heartbeat(method, result)
 
     method_name = f"Method {method.__class__.__name__} ({method.name})"
     if enter_outcome == MethodOutcome.NOT_IMPLEMENTED:
@@ -758,7 +1639,9 @@ def _try_enter_mode(method: Method) -> Tuple[MethodOutcome, str]:
     return outcome, err_message
 
 
-def _try_heartbeat(method: Method) -> Tuple[MethodOutcome, str, Optional[dt.datetime]]:
+def _try_heartbeat(
+    method: Method, result: Optional[MethodActivationResult] = None
+) -> Tuple[MethodOutcome, str, Optional[dt.datetime]]:
     """Calls the method.heartbeat(). This function catches any possible
     Exceptions during the call.
 
@@ -771,7 +1654,12 @@ def _try_heartbeat(method: Method) -> Tuple[MethodOutcome, str, Optional[dt.date
         return MethodOutcome.NOT_IMPLEMENTED, "", None
 
     heartbeat_call_time = dt.datetime.now(dt.timezone.utc)
-    outcome, err_message = _try_method_call(method, "heartbeat")
+    if result is None:
+        outcome, err_message = _try_method_call(method, "heartbeat")
+    else:
+        start = time.perf_counter()
+        outcome, err_message = _try_method_call(method, "heartbeat")
+        result.heartbeat_duration = time.perf_counter() - start
 
     return outcome, err_message, heartbeat_call_time
 
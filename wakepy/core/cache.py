@@ -0,0 +1,159 @@
+"""This module contains the on-disk cache for the activation plans. The cache
+stores, per Mode name, the name of the Method which was last used succesfully
+for activating the Mode (the "winner"), and the names of the Methods which were
+tried before it and failed. This way the next activation of the same Mode can
+try the winner first, instead of re-discovering which Method works.
+
+The cache is stored as a JSON file under $XDG_CACHE_HOME/wakepy (defaults to
+~/.cache/wakepy). The cached plans are only valid in the environment where they
+were created, so they are keyed by an environment fingerprint. Plans for at
+most MAX_ENVIRONMENTS latest environments are kept.
+
+Functions
+---------
+get_cached_plan
+    Get the cached activation plan for a Mode
+store_plan
+    Store an activation plan for a Mode
+remove_plan
+    Remove the cached activation plan of a Mode
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import typing
+from pathlib import Path
+from typing import NamedTuple, Tuple
+
+from .platform import CURRENT_PLATFORM
+
+if typing.TYPE_CHECKING:
+    from typing import Any, Dict, Optional
+
+CACHE_FILENAME = "activation-plans.json"
+
+MAX_ENVIRONMENTS = 8
+"""The maximum number of environments (fingerprints) to keep in the cache."""
+
+
+class CachedPlan(NamedTuple):
+    """An activation plan for a Mode, read from the cache."""
+
+    winner: str
+    """Name of the Method which was last used successfully to activate the
+    Mode."""
+
+    failed: Tuple[str, ...]
+    """Names of the Methods which were tried (and which failed) before the
+    `winner`, in the priority order."""
+
+
+def get_cache_path() -> Path:
+    """The path to the cache file. Uses $XDG_CACHE_HOME/wakepy, or
+    ~/.cache/wakepy if XDG_CACHE_HOME is not set."""
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return Path(cache_home) / "wakepy" / CACHE_FILENAME
+
+
+def get_environment_fingerprint() -> str:
+    """Creates a fingerprint of the environment. The cached plans are valid
+    only as long as the fingerprint stays the same. The fingerprint changes
+    if the platform, the desktop environment, the D-Bus session bus address
+    or the boot id changes."""
+    parts = (
+        str(CURRENT_PLATFORM),
+        os.environ.get("XDG_CURRENT_DESKTOP", ""),
+        os.environ.get("DBUS_SESSION_BUS_ADDRESS", ""),
+        _get_boot_id(),
+    )
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+def get_cached_plan(modename: str) -> Optional[CachedPlan]:
+    """Get the cached activation plan for the mode called `modename`. Returns
+    None if there is no plan for the mode, or if the cache is not valid for
+    the current environment."""
+    plan = _read_plans(get_environment_fingerprint()).get(modename)
+    if not plan:
+        return None
+    try:
+        return CachedPlan(winner=str(plan["winner"]), failed=tuple(plan["failed"]))
+    except (KeyError, TypeError):
+        return None
+
+
+def store_plan(modename: str, winner: str, failed: Tuple[str, ...]) -> None:
+    """Store the activation plan for the mode called `modename` into the
+    cache. Does nothing if the same plan is already stored."""
+    fingerprint = get_environment_fingerprint()
+    plans = _read_plans(fingerprint)
+    plan = dict(winner=winner, failed=list(failed))
+    if plans.get(modename) == plan:
+        return
+    plans[modename] = plan
+    _write_plans(fingerprint, plans)
+
+
+def remove_plan(modename: str) -> None:
+    """Remove the cached activation plan of the mode called `modename`, if
+    any."""
+    fingerprint = get_environment_fingerprint()
+    plans = _read_plans(fingerprint)
+    if modename not in plans:
+        return
+    del plans[modename]
+    _write_plans(fingerprint, plans)
+
+
+def _get_boot_id() -> str:
+    try:
+        with open("/proc/sys/kernel/random/boot_id") as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+def _read_environments() -> Dict[str, Any]:
+    # The cache is only an optimization. Any problems with reading it are
+    # handled as if there was no cache at all.
+    try:
+        with open(get_cache_path()) as f:
+            content = json.load(f)
+    except (OSError, ValueError):
+        return dict()
+
+    if not isinstance(content, dict):
+        return dict()
+    environments = content.get("environments")
+    return environments if isinstance(environments, dict) else dict()
+
+
+def _read_plans(fingerprint: str) -> Dict[str, Any]:
+    plans = _read_environments().get(fingerprint)
+    return plans if isinstance(plans, dict) else dict()
+
+
+def _write_plans(fingerprint: str, plans: Dict[str, Any]) -> None:
+    environments = _read_environments()
+    # The latest updated environment is kept last, and the oldest ones are
+    # removed first.
+    environments.pop(fingerprint, None)
+    environments[fingerprint] = plans
+    for old_fingerprint in list(environments)[:-MAX_ENVIRONMENTS]:
+        del environments[old_fingerprint]
+
+    path = get_cache_path()
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_path, "w") as f:
+            json.dump(dict(environments=environments), f)
+        # Atomic; other processes never see a partially written file.
+        os.replace(tmp_path, path)
+    except OSError:
+        return
@@ -10,15 +10,19 @@ Wakepy is not tied to any specific D-Bus implementation. If you want to use a
 non-standard way to communicate with D-Bus, you need to subclass DbusAdapter.
 
 There's also get_dbus_adapter function, which is used for getting a D-Bus
-adapter instance.
+adapter instance. The adapters are created lazily, on the first D-Bus call,
+and there is one instance per adapter class per process (see
+DbusAdapter.process_wide).
 """
 
 from __future__ import annotations
 
+import threading
 import typing
 from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Type, Union
 
 from .constants import BusType
+from .fork import register_after_fork_in_child
 
 CallArguments = Optional[Union[Dict[str, Any], Tuple[Any, ...], List[Any]]]
 
@@ -270,33 +274,148 @@ class DbusAdapter:
     The __init__() should not take any arguments, and it may raise any subtype
     of Exception, which simply means that the DbusAdapter may not be used. The
     Exception will be omitted if using the high-level API of wakepy.
+
+    Attributes
+    ----------
+    process_wide: bool
+        If True (the default), get_dbus_adapter creates one instance of the
+        adapter class per process, on the first D-Bus call, and all the Modes
+        use it. Set to False if the instances may not be shared (for example,
+        if they are bound to an event loop); then, each Mode creates its own
+        instance when it is entered.
     """
 
+    process_wide: bool = True
+
     def process(self, call: DbusMethodCall):
         ...
 
+    def check_bus(self, bus: Optional[Union[str, BusType]]) -> Optional[str]:
+        """Tells if the message `bus` (see DbusAddress.bus) can be reached.
+        Used by Method.caniuse() of the D-Bus based Methods. Should be fast,
+        also when the bus can not be reached.
+
+        Returns
+        -------
+        reason:
+            None if the bus can be reached, or if it is not known. Otherwise,
+            the reason why the bus can not be reached. The default
+            implementation always returns None.
+        """
+        return None
+
+    def check_service(
+        self, bus: Optional[Union[str, BusType]], service: str
+    ) -> Optional[str]:
+        """Tells if the D-Bus `service` (a well-known bus name, like
+        "org.freedesktop.ScreenSaver") is available on the message `bus`.
+        Used by Method.caniuse() of the D-Bus based Methods. Should be fast;
+        for example, a lookup from a cached set of the names on the bus.
+
+        Returns
+        -------
+        reason:
+            None if the service is available, or if it is not known. Otherwise,
+            the reason why the service is not available. The default
+            implementation always returns None.
+        """
+        return None
+
+    async def aclose(self) -> None:
+        """Closes the resources (like connections) which are bound to this
+        adapter instance, if any. Called when exiting a Mode entered with
+        `async with`. Does nothing by default."""
+
+
+# The adapter classes to try, in order, or None for the default adapter.
+_AdapterClasses = Optional[Tuple[Type[DbusAdapter], ...]]
+
+
+class LazyDbusAdapter(DbusAdapter):
+    """A DbusAdapter which passes the calls to the process-wide instance of
+    the first usable adapter class in `adapter_classes`. The instance is
+    created on the first call to .process(). If none of the adapter classes
+    can be used, the result is remembered, and .process() raises RuntimeError
+    without trying again. Returned by get_dbus_adapter."""
+
+    def __init__(self, adapter_classes: _AdapterClasses):
+        """
+        Parameters
+        ----------
+        adapter_classes:
+            The adapter classes to try, in order. None means the default
+            adapter (see get_default_dbus_adapter).
+        """
+        self.adapter_classes = adapter_classes
+
+    def process(self, call: DbusMethodCall):
+        adapter = _get_process_wide_adapter(self.adapter_classes)
+        if adapter is None:
+            raise RuntimeError(
+                f'Cannot process dbus method call "{call}": '
+                + _unavailable_adapters[self.adapter_classes]
+            )
+        return adapter.process(call)
+
+    def check_bus(self, bus: Optional[Union[str, BusType]]) -> Optional[str]:
+        adapter = _get_process_wide_adapter(self.adapter_classes)
+        if adapter is None:
+            return _unavailable_adapters[self.adapter_classes]
+        return adapter.check_bus(bus)
+
+    def check_service(
+        self, bus: Optional[Union[str, BusType]], service: str
+    ) -> Optional[str]:
+        adapter = _get_process_wide_adapter(self.adapter_classes)
+        if adapter is None:
+            return _unavailable_adapters[self.adapter_classes]
+        return adapter.check_service(bus, service)
+
+
+# The process-wide adapter instances, by adapter classes (see
+# LazyDbusAdapter). The adapters which could not be created are not here, but
+# in _unavailable_adapters, with the reason.
+_process_wide_adapters: Dict[_AdapterClasses, DbusAdapter] = dict()
+_unavailable_adapters: Dict[_AdapterClasses, str] = dict()
+_lazy_adapters: Dict[_AdapterClasses, LazyDbusAdapter] = dict()
+_adapters_lock = threading.Lock()
+
 
 def get_dbus_adapter(
     dbus_adapter: Optional[Type[DbusAdapter] | DbusAdapterTypeSeq] = None,
 ) -> DbusAdapter | None:
-    """Creates a dbus adapter instance"""
-
+    """Gets a dbus adapter for the `dbus_adapter` class, or the first usable
+    class of a sequence of classes. If None, gets the default adapter (see
+    get_default_dbus_adapter).
+
+    For the process-wide adapter classes (see DbusAdapter.process_wide),
+    returns a LazyDbusAdapter, which creates the adapter instance on the first
+    D-Bus call. Returns None if it is already known that none of the classes
+    can be used. Other adapter classes are instantiated right away.
+    """
+    adapter_classes: _AdapterClasses
     if dbus_adapter is None:
-        return get_default_dbus_adapter()
-
-    if isinstance(dbus_adapter, type):
-        return dbus_adapter()
-
-    # TODO: create some better logic which tests if the dbus adapter may be
-    # used. For now, just return first from the iterable which won't crash upon
-    # initialization
-    for adapter_cls in dbus_adapter:
-        try:
-            adapter = adapter_cls()
-            return adapter
-        except Exception:
-            continue
-    return None
+        adapter_classes = None
+    elif isinstance(dbus_adapter, type):
+        adapter_classes = (dbus_adapter,)
+    else:
+        adapter_classes = tuple(dbus_adapter)
+
+    if adapter_classes is not None and not all(
+        cls.process_wide for cls in adapter_classes
+    ):
+        if isinstance(dbus_adapter, type):
+            return dbus_adapter()
+        return _create_dbus_adapter(adapter_classes)[0]
+
+    lazy_adapter = _lazy_adapters.get(adapter_classes)
+    if lazy_adapter is None:
+        lazy_adapter = _lazy_adapters.setdefault(
+            adapter_classes, LazyDbusAdapter(adapter_classes)
+        )
+    if adapter_classes in _unavailable_adapters:
+        return None
+    return lazy_adapter
 
 
 def get_default_dbus_adapter() -> DbusAdapter | None:
@@ -305,3 +424,56 @@ def get_default_dbus_adapter() -> DbusAdapter | None:
     except ImportError:
         return None
     return JeepneyDbusAdapter()
+
+
+def _get_process_wide_adapter(
+    adapter_classes: _AdapterClasses,
+) -> Optional[DbusAdapter]:
+    adapter = _process_wide_adapters.get(adapter_classes)
+    if adapter is not None or adapter_classes in _unavailable_adapters:
+        return adapter
+
+    with _adapters_lock:
+        if adapter_classes in _process_wide_adapters:
+            return _process_wide_adapters[adapter_classes]
+        if adapter_classes in _unavailable_adapters:
+            return None
+        adapter, reason = _create_dbus_adapter(adapter_classes)
+        if adapter is None:
+            _unavailable_adapters[adapter_classes] = reason
+        else:
+            _process_wide_adapters[adapter_classes] = adapter
+        return adapter
+
+
+def _create_dbus_adapter(
+    adapter_classes: _AdapterClasses,
+) -> Tuple[Optional[DbusAdapter], str]:
+    """Creates an instance of the first adapter class which does not raise
+    an Exception upon initialization. Returns (adapter, "") or (None, reason).
+    """
+    if adapter_classes is None:
+        adapter = get_default_dbus_adapter()
+        if adapter is None:
+            return None, "The default dbus adapter (jeepney) is not installed."
+        return adapter, ""
+
+    errors = []
+    for adapter_cls in adapter_classes:
+        try:
+            return adapter_cls(), ""
+        except Exception as exc:
+            errors.append(f"{adapter_cls.__name__}: {exc!r}")
+    return None, "None of the dbus adapters could be used. " + "; ".join(errors)
+
+
+def _reset_dbus_adapters_after_fork() -> None:
+    # The adapters may hold resources (like connections) of the parent
+    # process. The child creates its own adapters. The LazyDbusAdapters are
+    # kept, as the Modes of the parent may hold them.
+    global _process_wide_adapters, _adapters_lock
+    _process_wide_adapters = dict()
+    _adapters_lock = threading.Lock()
+
+
+register_after_fork_in_child(_reset_dbus_adapters_after_fork)
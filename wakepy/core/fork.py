@@ -0,0 +1,50 @@
+"""This module contains the fork safety of wakepy. When a process with an
+active Mode forks, the child process inherits the state of the parent: the
+active Methods (with, for example, the inhibit cookies), the D-Bus connections
+and the locks. None of them belong to the child. The child must not exit the
+modes of the parent (that would release the inhibitor of the parent), and it
+must not use the D-Bus connections of the parent (the parent and the child
+would interleave messages on the same socket).
+
+The fork generation is incremented in the child process after each fork. The
+objects which hold state of the process store the generation when they take
+the state (for example, when a mode is activated), and drop the state without
+using it when the generation has changed. The modules holding process-wide
+state (caches, connections, schedulers) reset it in the child with the
+`after_in_child` hooks of os.register_at_fork (see register_after_fork_in_child).
+
+Fork safety is available on the platforms with os.register_at_fork (all but
+Windows, which does not fork).
+"""
+
+from __future__ import annotations
+
+import os
+import typing
+
+if typing.TYPE_CHECKING:
+    from typing import Callable
+
+_fork_generation = 0
+
+
+def get_fork_generation() -> int:
+    """The number of forks between the original process and this process.
+    Zero in the original process."""
+    return _fork_generation
+
+
+def register_after_fork_in_child(func: Callable[[], None]) -> None:
+    """Registers `func` to be called in the child process after a fork, after
+    the fork generation has been incremented. Does nothing on the platforms
+    without os.register_at_fork."""
+    if hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=func)
+
+
+def _increment_fork_generation() -> None:
+    global _fork_generation
+    _fork_generation += 1
+
+
+register_after_fork_in_child(_increment_fork_generation)
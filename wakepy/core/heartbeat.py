@@ -1,24 +1,480 @@
+"""This module contains the Heartbeat, which calls the heartbeat() of an active
+Method periodically, every Method.heartbeat_period seconds, and the
+HeartbeatScheduler, which runs the heartbeat() calls of all the Heartbeats of
+the process.
+
+The calls are scheduled on a monotonic clock, and the deadlines are computed
+from the time of the first heartbeat() call (the one made in the activation)
+instead of from the end of the previous call, so that the calls do not drift
+even if the heartbeat() calls take some time. If a deadline is missed by a
+whole period or more (for example, because the previous heartbeat() call took
+too long), the missed calls are not made afterwards, but they are counted
+in Heartbeat.missed_deadlines.
+
+There is only one scheduler thread per process, no matter how many Heartbeats
+are running. It keeps the next deadlines of the Heartbeats in a min-heap and
+hands the due heartbeat() calls to a bounded pool of worker threads, so a slow
+heartbeat() call does not delay the calls of the other Heartbeats.
+
+To save CPU wakeups, a Method may allow its heartbeat() to be called up to
+Method.heartbeat_tolerance seconds early. The scheduler thread sleeps until
+the earliest deadline, and then calls all the heartbeats whose tolerance
+window has already started, so the heartbeats with overlapping windows are
+batched into one wakeup. On Linux, the scheduler thread also sets a higher
+timer slack (SCHEDULER_TIMER_SLACK), which lets the kernel coalesce the
+wakeups with other timers of the system.
+
+The scheduler threads do not survive a fork, so the child process gets a new
+scheduler, and the Heartbeats started in the parent process are not running
+in the child.
+"""
+
 from __future__ import annotations
 
+import ctypes
 import datetime as dt
+import heapq
+import itertools
+import math
+import queue
+import threading
+import time
 import typing
+from typing import List, NamedTuple
+
+from .constants import PlatformName
+from .fork import get_fork_generation, register_after_fork_in_child
+from .platform import CURRENT_PLATFORM
 
 if typing.TYPE_CHECKING:
-    from typing import Optional
+    from typing import Callable, Dict, Optional, Tuple
 
     from .method import Method
 
+MAX_HEARTBEAT_WORKERS = 4
+"""The maximum number of worker threads calling the heartbeat() methods."""
+
+SCHEDULER_TIMER_SLACK = 0.01
+"""The timer slack of the scheduler thread, in seconds (Linux only). The
+kernel may delay the wakeups of the thread, and therefore the heartbeat()
+calls, this much to coincide them with other wakeups."""
+
+PR_SET_TIMERSLACK = 29
+"""The prctl() option for setting the timer slack of a thread on Linux."""
+
+
+class HeartbeatError(NamedTuple):
+    """A failed call of method.heartbeat()."""
+
+    call_time: dt.datetime
+    """The UTC time just before the method.heartbeat() was called."""
+
+    message: str
+    """Tells what went wrong."""
+
 
 class Heartbeat:
-    # TODO: This is just temporary dummy implementation.
+    """Calls the heartbeat() of a Method every method.heartbeat_period seconds,
+    from .start() until .stop(). The calls are made by the process-wide
+    HeartbeatScheduler (see get_heartbeat_scheduler()).
+
+    Attributes
+    ----------
+    method: Method
+        The Method whose heartbeat() is called.
+    prev_call: datetime | None
+        The UTC time just before the previous method.heartbeat() call.
+    n_calls: int
+        The number of heartbeat() calls made by the Heartbeat (not counting
+        the call made in the activation).
+    missed_deadlines: int
+        The number of scheduled heartbeat() calls which were skipped, as they
+        would have been late by one heartbeat_period or more.
+    errors: list[HeartbeatError]
+        The failed heartbeat() calls; the ones which raised an exception or
+        returned something else than None.
+    """
+
+    stop_timeout: float = 5
+    """The maximum time (in seconds) to wait for an ongoing heartbeat() call to
+    finish when stopping the Heartbeat."""
+
     def __init__(
         self, method: Method, heartbeat_call_time: Optional[dt.datetime] = None
     ):
+        """
+        Parameters
+        ----------
+        method:
+            The Method whose heartbeat() is called.
+        heartbeat_call_time:
+            The UTC time when the method.heartbeat() was called the last time
+            (in the activation). The next call is scheduled to be made
+            method.heartbeat_period seconds after it. If None, the next call
+            is made method.heartbeat_period seconds after .start().
+        """
         self.method = method
         self.prev_call = heartbeat_call_time
+        self.n_calls = 0
+        self.missed_deadlines = 0
+        self.errors: List[HeartbeatError] = []
+        self._scheduler: Optional[HeartbeatScheduler] = None
+        self._stop_event = threading.Event()
+        # Held while a heartbeat() call is made (and the next one scheduled).
+        self._call_lock = threading.Lock()
+        self._calling_thread: Optional[threading.Thread] = None
+        self._fork_generation = get_fork_generation()
 
     def start(self) -> bool:
+        """Starts calling the method.heartbeat() periodically. Returns True if
+        the Heartbeat was started, and False if it had been started already.
+
+        Raises
+        ------
+        ValueError, if the method.heartbeat_period is not positive or the
+        method.heartbeat_tolerance is negative.
+        """
+        if self._scheduler is not None:
+            return False
+        if self.method.heartbeat_period <= 0:
+            raise ValueError(
+                f"The heartbeat_period of {self.method.name} must be positive!"
+            )
+        if self.method.heartbeat_tolerance < 0:
+            raise ValueError(
+                f"The heartbeat_tolerance of {self.method.name} must not be negative!"
+            )
+
+        self._fork_generation = get_fork_generation()
+        self._scheduler = get_heartbeat_scheduler()
+        self._scheduler.add(self, self._get_first_deadline(), self.tolerance)
         return True
 
     def stop(self) -> bool:
+        """Stops the Heartbeat. No heartbeat() calls are made after this
+        returns True. If a heartbeat() call is ongoing, waits for it to finish
+        (at most stop_timeout seconds).
+
+        Returns
+        -------
+        stopped:
+            True if the Heartbeat was stopped (or was never started), and
+            False if an ongoing heartbeat() call did not finish in time.
+        """
+        self._stop_event.set()
+        if (
+            self._scheduler is None
+            or self._calling_thread is threading.current_thread()
+            or self._fork_generation != get_fork_generation()
+        ):
+            # Not started, or called from the heartbeat() itself (then, the
+            # next call is not scheduled), or started in the parent process
+            # (then, nothing runs in this process, and the locks may be held
+            # by threads which do not exist here).
+            return True
+        if not self._call_lock.acquire(timeout=self.stop_timeout):
+            return False
+        try:
+            self._scheduler.cancel(self)
+        finally:
+            self._call_lock.release()
         return True
+
+    @property
+    def running(self) -> bool:
+        """True if the Heartbeat has been started and not stopped."""
+        return (
+            self._scheduler is not None
+            and not self._stop_event.is_set()
+            and self._fork_generation == get_fork_generation()
+        )
+
+    @property
+    def tolerance(self) -> float:
+        """How many seconds early the heartbeat() may be called. The
+        method.heartbeat_tolerance, but at most the heartbeat_period."""
+        return min(self.method.heartbeat_tolerance, self.method.heartbeat_period)
+
+    def _get_first_deadline(self) -> float:
+        """The time.monotonic() time for the first heartbeat() call."""
+        period = self.method.heartbeat_period
+        if self.prev_call is None:
+            return time.monotonic() + period
+        since_prev_call = dt.datetime.now(dt.timezone.utc) - self.prev_call
+        return time.monotonic() + period - max(since_prev_call.total_seconds(), 0)
+
+    def _run_once(self, deadline: float) -> None:
+        """Makes the heartbeat() call which was due at `deadline` and schedules
+        the next one. Called by the HeartbeatScheduler in a worker thread."""
+        with self._call_lock:
+            if self._stop_event.is_set():
+                return
+            period = self.method.heartbeat_period
+            late_by = time.monotonic() - deadline
+            if late_by >= period:
+                # Do not try to catch up with the missed calls.
+                missed = int(late_by // period)
+                self.missed_deadlines += missed
+                deadline += missed * period
+
+            self._calling_thread = threading.current_thread()
+            try:
+                self._call_heartbeat()
+            finally:
+                self._calling_thread = None
+
+            if not self._stop_event.is_set() and self._scheduler is not None:
+                self._scheduler.add(self, deadline + period, self.tolerance)
+
+    def _call_heartbeat(self) -> None:
+        call_time = dt.datetime.now(dt.timezone.utc)
+        self.prev_call = call_time
+        self.n_calls += 1
+        try:
+            retval = self.method.heartbeat()
+            if retval is not None:
+                raise ValueError(
+                    f"The heartbeat of {self.method.__class__.__name__} "
+                    f"({self.method.name}) returned an unsupported value {retval}. "
+                    "The only accepted return value is None"
+                )
+        except Exception as exc:
+            self.errors.append(HeartbeatError(call_time, repr(exc)))
+
+
+class _ScheduledCall:
+    """An entry in the heap of the HeartbeatScheduler."""
+
+    __slots__ = ("deadline", "earliest", "seq", "heartbeat", "cancelled")
+
+    def __init__(
+        self, deadline: float, tolerance: float, seq: int, heartbeat: Heartbeat
+    ):
+        self.deadline = deadline
+        self.earliest = deadline - tolerance
+        self.seq = seq
+        self.heartbeat = heartbeat
+        self.cancelled = False
+
+    def __lt__(self, other: _ScheduledCall) -> bool:
+        return (self.deadline, self.seq) < (other.deadline, other.seq)
+
+
+class HeartbeatScheduler:
+    """Runs the heartbeat() calls of many Heartbeats with a single scheduler
+    thread and a bounded pool of worker threads.
+
+    The next deadline of each Heartbeat is kept in a min-heap, so adding a
+    Heartbeat is O(log n). Cancelling marks the entry as cancelled (O(1)); the
+    cancelled entries are dropped when they reach the top of the heap, or all
+    at once if more than half of the heap is cancelled. The scheduler thread
+    sleeps until the earliest deadline, and hands all the calls whose
+    tolerance window has started to the workers.
+    The threads are daemon threads, and they are started lazily.
+
+    Attributes
+    ----------
+    max_workers: int
+        The maximum number of worker threads.
+    n_wakeups: int
+        The number of times the scheduler thread has woken up.
+    """
+
+    def __init__(self, max_workers: int = MAX_HEARTBEAT_WORKERS):
+        self.max_workers = max_workers
+        self.n_wakeups = 0
+        self._heap: List[_ScheduledCall] = []
+        self._entries: Dict[Heartbeat, _ScheduledCall] = dict()
+        self._n_cancelled = 0
+        # Upper bound for the tolerances of the entries in the heap.
+        self._max_tolerance = 0.0
+        # The time (time.monotonic()) until which the scheduler thread sleeps,
+        # when it is waiting.
+        self._wakeup_at = math.inf
+        self._counter = itertools.count()
+        # The clock of the deadlines. Replaced in the tests.
+        self._clock: Callable[[], float] = time.monotonic
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._work_queue: queue.SimpleQueue[
+            Tuple[Heartbeat, float]
+        ] = queue.SimpleQueue()
+        self._workers: List[threading.Thread] = []
+        self._n_idle_workers = 0
+
+    def __len__(self) -> int:
+        """The number of Heartbeats waiting for their next call."""
+        with self._cond:
+            return len(self._entries)
+
+    @property
+    def n_threads(self) -> int:
+        """The number of threads started by the scheduler."""
+        return int(self._thread is not None) + len(self._workers)
+
+    def add(self, heartbeat: Heartbeat, deadline: float, tolerance: float = 0) -> None:
+        """Schedule the next heartbeat() call of `heartbeat` to be made at
+        `deadline` (a time.monotonic() time), or at most `tolerance` seconds
+        before it. Replaces the previously scheduled call of the `heartbeat`,
+        if any."""
+        with self._cond:
+            entry = self._push(heartbeat, deadline, tolerance)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="wakepy-heartbeat-scheduler", daemon=True
+                )
+                self._thread.start()
+            elif entry.deadline < self._wakeup_at:
+                # The scheduler thread sleeps past the new call.
+                self._cond.notify()
+
+    def cancel(self, heartbeat: Heartbeat) -> None:
+        """Cancel the scheduled heartbeat() call of `heartbeat`, if any. Does
+        not affect an ongoing call."""
+        with self._cond:
+            self._cancel(heartbeat)
+
+    def _push(
+        self, heartbeat: Heartbeat, deadline: float, tolerance: float
+    ) -> _ScheduledCall:
+        """Adds the call to the heap. Called with self._cond held."""
+        self._cancel(heartbeat)
+        self._max_tolerance = max(self._max_tolerance, tolerance)
+        entry = _ScheduledCall(deadline, tolerance, next(self._counter), heartbeat)
+        self._entries[heartbeat] = entry
+        heapq.heappush(self._heap, entry)
+        return entry
+
+    def _cancel(self, heartbeat: Heartbeat) -> None:
+        entry = self._entries.pop(heartbeat, None)
+        if entry is None:
+            return
+        entry.cancelled = True
+        self._n_cancelled += 1
+        if self._n_cancelled > len(self._heap) // 2:
+            self._heap = [e for e in self._heap if not e.cancelled]
+            heapq.heapify(self._heap)
+            self._n_cancelled = 0
+            self._max_tolerance = max(
+                (e.deadline - e.earliest for e in self._heap), default=0.0
+            )
+
+    def _run(self) -> None:
+        set_timer_slack(SCHEDULER_TIMER_SLACK)
+        with self._cond:
+            while True:
+                head = self._get_head()
+                if head is None:
+                    self._wakeup_at = math.inf
+                    self._cond.wait()
+                    self.n_wakeups += 1
+                    continue
+
+                now = self._clock()
+                if head.earliest > now:
+                    # Waking up at the last moment lets the tolerance windows
+                    # of as many calls as possible start before it.
+                    self._wakeup_at = head.deadline
+                    self._cond.wait(head.deadline - now)
+                    self.n_wakeups += 1
+                    continue
+
+                for heartbeat, deadline in self._pop_due_calls(now):
+                    self._submit(heartbeat, deadline)
+
+    def _get_head(self) -> Optional[_ScheduledCall]:
+        """The entry with the earliest deadline, or None if there are no
+        entries. Drops the cancelled entries from the top of the heap. Called
+        with self._cond held."""
+        while self._heap and self._heap[0].cancelled:
+            heapq.heappop(self._heap)
+            self._n_cancelled -= 1
+        return self._heap[0] if self._heap else None
+
+    def _pop_due_calls(self, now: float) -> List[Tuple[Heartbeat, float]]:
+        """Removes and returns (heartbeat, deadline) of all the calls whose
+        tolerance window has started at `now` (a time.monotonic() time). The
+        heap is ordered by the deadlines, so only the entries with deadline
+        at most the maximum tolerance ahead need to be checked. Called with
+        self._cond held."""
+        due = []
+        not_due = []
+        while self._heap and self._heap[0].deadline <= now + self._max_tolerance:
+            entry = heapq.heappop(self._heap)
+            if entry.cancelled:
+                self._n_cancelled -= 1
+            elif entry.earliest > now:
+                not_due.append(entry)
+            else:
+                del self._entries[entry.heartbeat]
+                due.append((entry.heartbeat, entry.deadline))
+        for entry in not_due:
+            heapq.heappush(self._heap, entry)
+        return due
+
+    def _submit(self, heartbeat: Heartbeat, deadline: float) -> None:
+        # Called with self._cond held.
+        self._work_queue.put((heartbeat, deadline))
+        if (
+            len(self._workers) < self.max_workers
+            and self._work_queue.qsize() > self._n_idle_workers
+        ):
+            worker = threading.Thread(
+                target=self._work,
+                name=f"wakepy-heartbeat-worker-{len(self._workers)}",
+                daemon=True,
+            )
+            self._workers.append(worker)
+            worker.start()
+
+    def _work(self) -> None:
+        while True:
+            with self._cond:
+                self._n_idle_workers += 1
+            heartbeat, deadline = self._work_queue.get()
+            with self._cond:
+                self._n_idle_workers -= 1
+            heartbeat._run_once(deadline)
+
+
+_scheduler: Optional[HeartbeatScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_heartbeat_scheduler() -> HeartbeatScheduler:
+    """Get the process-wide HeartbeatScheduler. Creates it on the first
+    call."""
+    global _scheduler
+
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = HeartbeatScheduler()
+        return _scheduler
+
+
+def _reset_scheduler_after_fork() -> None:
+    # The threads of the scheduler of the parent process do not exist in the
+    # child, and the lock may have been held by one of them.
+    global _scheduler, _scheduler_lock
+    _scheduler = None
+    _scheduler_lock = threading.Lock()
+
+
+register_after_fork_in_child(_reset_scheduler_after_fork)
+
+
+_prctl: Optional[Callable[..., int]] = None
+
+
+def set_timer_slack(slack: float) -> None:
+    """Sets the timer slack of the calling thread to `slack` seconds. With
+    a larger timer slack, the kernel may delay the timer wakeups of the thread
+    so that they coincide with other wakeups. Zero sets the default slack.
+    Does nothing on other platforms than Linux."""
+    global _prctl
+
+    if CURRENT_PLATFORM != PlatformName.LINUX:
+        return
+    if _prctl is None:
+        _prctl = ctypes.CDLL(None, use_errno=True).prctl
+    _prctl(PR_SET_TIMERSLACK, ctypes.c_ulong(int(slack * 1e9)), 0, 0, 0)
@@ -0,0 +1,155 @@
+"""This module contains the lock files used for coordinating the activation of
+a Mode between processes (see the `interprocess` of Mode). The processes using
+the same mode on the host take part in a leader election: The leader holds an
+exclusive lock (flock) on the lock file of the mode, and holds the real
+inhibitor (the active Method). The other processes are followers; they do not
+activate any Method, but stand by and try to take the lock periodically. When
+the leader exits the mode, or the leader process exits or crashes, the lock is
+released by the operating system, and one of the followers takes over.
+
+The lock files are stored under $XDG_RUNTIME_DIR/wakepy, which is private to
+the user. The leader writes its process id and the name of the active Method
+into the lock file, so that the followers can tell if the mode is active.
+
+A lock belongs to the open file, which is inherited by the child processes in
+a fork. So that a child process does not keep the lock of the parent (or
+release it), the lock files are closed in the child right after a fork.
+
+Only available on the platforms with fcntl.flock (Linux, macOS, BSD).
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import typing
+import weakref
+from pathlib import Path
+from typing import NamedTuple
+
+from .fork import register_after_fork_in_child
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    # For example, on Windows.
+    fcntl = None  # type: ignore[assignment]
+
+if typing.TYPE_CHECKING:
+    from typing import Optional
+
+LOCK_DIRNAME = "wakepy"
+
+
+class LeaderState(NamedTuple):
+    """The state of the leader, read from the lock file."""
+
+    pid: int
+    """The process id of the leader."""
+
+    method_name: str
+    """The name of the Method which the leader used to activate the mode."""
+
+
+def get_lock_path(modename: str) -> Optional[Path]:
+    """The path to the lock file of the mode called `modename`: $XDG_RUNTIME_DIR/
+    wakepy/<modename>. None if XDG_RUNTIME_DIR is not set or if flock is not
+    available on the platform."""
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if not runtime_dir or fcntl is None:
+        return None
+    filename = re.sub(r"[^\w.-]", "_", modename)
+    return Path(runtime_dir) / LOCK_DIRNAME / filename
+
+
+class LeaderLock:
+    """The lock file of a mode, as seen by one participant. Each instance
+    opens the file separately, so the instances exclude each other even in the
+    same process. Not thread-safe.
+
+    Attributes
+    ----------
+    path: Path
+        The path of the lock file.
+    is_leader: bool
+        True if this instance holds the lock.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.is_leader = False
+        path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        self._fd: Optional[int] = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        _open_locks.add(self)
+
+    def try_acquire(self) -> bool:
+        """Tries to take the lock (become the leader) without blocking.
+        Returns True if the lock was taken, and False if another participant
+        holds it."""
+        assert self._fd is not None
+        if self.is_leader:
+            return True
+        try:
+            fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        self.is_leader = True
+        # Clear the state left behind by a leader which crashed.
+        os.ftruncate(self._fd, 0)
+        return True
+
+    def write_state(self, method_name: str) -> None:
+        """Writes the state of the leader (this process) into the lock file.
+        Must be the leader."""
+        assert self._fd is not None and self.is_leader
+        content = f"{os.getpid()} {method_name}\n".encode("utf-8")
+        os.ftruncate(self._fd, 0)
+        os.pwrite(self._fd, content, 0)
+
+    def read_state(self) -> Optional[LeaderState]:
+        """Reads the state of the leader from the lock file. None if the
+        leader has not (yet) activated the mode."""
+        assert self._fd is not None
+        content = os.pread(self._fd, 4096, 0).decode("utf-8", errors="replace")
+        pid, _, method_name = content.strip().partition(" ")
+        if not pid.isdigit() or not method_name:
+            return None
+        return LeaderState(int(pid), method_name)
+
+    def release(self) -> None:
+        """Clears the state and releases the lock, if held."""
+        if self._fd is None or not self.is_leader:
+            return
+        os.ftruncate(self._fd, 0)
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self.is_leader = False
+
+    def close(self) -> None:
+        """Releases the lock (if held) and closes the lock file."""
+        if self._fd is None:
+            return
+        try:
+            self.release()
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    def _close_inherited(self) -> None:
+        """Closes the lock file inherited from the parent process, without
+        releasing the lock of the parent."""
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        self.is_leader = False
+
+
+_open_locks: weakref.WeakSet[LeaderLock] = weakref.WeakSet()
+
+
+def _close_inherited_locks() -> None:
+    for lock in list(_open_locks):
+        lock._close_inherited()
+    _open_locks.clear()
+
+
+register_after_fork_in_child(_close_inherited_locks)
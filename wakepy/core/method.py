@@ -18,7 +18,7 @@ import typing
 from abc import ABC, ABCMeta
 from typing import Any, List, Optional, Set, Tuple, Type, TypeVar, Union
 
-from .constants import ModeName, PlatformName
+from .constants import BusType, ModeName, PlatformName
 from .registry import register_method
 from .strenum import StrEnum, auto
 
@@ -95,6 +95,23 @@ class Method(ABC, metaclass=MethodMeta):
     create documentation.
     """
 
+    thread_bound: bool = False
+    """True if the mode entered with the Method is bound to the thread which
+    called .enter_mode(): the .exit_mode() must be called in the same thread,
+    and the mode ends when the thread exits (like SetThreadExecutionState on
+    Windows). wakepy enters and exits such Methods only in a thread which
+    stays alive for the whole activation."""
+
+    dbus_bus: Optional[Union[str, BusType]] = None
+    """The message bus used by the Method, if the Method is based on D-Bus
+    (see DbusAddress.bus). If set, the default .caniuse() checks that the bus
+    can be reached with the DbusAdapter. Optional."""
+
+    dbus_service: Optional[str] = None
+    """The D-Bus service (a well-known bus name) used by the Method, on the
+    `dbus_bus`. If set, the default .caniuse() checks that the service is
+    available on the bus. Optional."""
+
     name: str | None = None
     """Human-readable name for the method. Used by end-users to define
     the Methods used for entering a Mode, for example. If not None, must be
@@ -156,6 +173,20 @@ class Method(ABC, metaclass=MethodMeta):
         #   KDE is something that is needed.
         # - If a Method depends on availability of certain software on PATH,
         #   could test that it exist on PATH. (and that the version is suitable)
+        #
+        # The default implementation checks the D-Bus requirements (see
+        # dbus_bus and dbus_service). Call super().caniuse() when overriding
+        # this in a D-Bus based Method.
+        if self.dbus_bus is not None:
+            if self._dbus_adapter is None:
+                return f"{self.__class__.__name__} needs a DbusAdapter"
+            reason = self._dbus_adapter.check_bus(self.dbus_bus)
+            if reason is None and self.dbus_service is not None:
+                reason = self._dbus_adapter.check_service(
+                    self.dbus_bus, self.dbus_service
+                )
+            return reason
+        return None
 
     def enter_mode(self):
         """Enter to a Mode using this Method. Pair with a `exit_mode`.
@@ -217,6 +248,14 @@ class Method(ABC, metaclass=MethodMeta):
     `heartbeat()`.
     """
 
+    heartbeat_tolerance: int | float = 0
+    """The amount of time (in seconds) the `heartbeat()` may be called before
+    its due time. The heartbeat calls are batched with the other heartbeat
+    calls within the tolerance window, which saves CPU wakeups. The schedule
+    does not drift because of early calls. Should be less than the
+    `heartbeat_period`.
+    """
+
     def heartbeat(self):
         """Called periodically, every `heartbeat_period` seconds.
 
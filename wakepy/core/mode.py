@@ -1,25 +1,65 @@
 from __future__ import annotations
 
+import asyncio
+import atexit
+import concurrent.futures
+import functools
+import queue
+import threading
+import time
 import typing
 import warnings
 from abc import ABC
+from typing import TypeVar
 
-from .activation import ActivationResult, activate_mode, deactivate_method
+from .activation import (
+    ActivationResult,
+    ActivationStrategy,
+    CombinedActivationResult,
+    MethodActivationResult,
+    _get_methods_priority_key,
+    activate_mode,
+    activate_mode_async,
+    caniuse_fails,
+    deactivate_method,
+    deactivate_method_async,
+    try_enter_and_heartbeat,
+)
 from .dbus import get_dbus_adapter
+from .fork import get_fork_generation, register_after_fork_in_child
 from .heartbeat import Heartbeat
-from .method import select_methods
+from .lockfile import LeaderLock, get_lock_path
+from .method import Method, MethodError, select_methods
 from .registry import get_methods_for_mode
 
 if typing.TYPE_CHECKING:
+    from pathlib import Path
     from types import TracebackType
-    from typing import Callable, Literal, Optional, Type
+    from typing import (
+        Any,
+        AsyncIterable,
+        AsyncIterator,
+        Callable,
+        Dict,
+        Hashable,
+        Iterable,
+        Iterator,
+        Literal,
+        Optional,
+        Sequence,
+        Tuple,
+        Type,
+    )
 
-    from .activation import MethodsPriorityOrder
+    from .activation import MethodsPriorityOrder, RequirementsCheck
     from .constants import ModeName
     from .dbus import DbusAdapter, DbusAdapterTypeSeq
-    from .method import Method, StrCollection
+    from .method import StrCollection
 
     OnFail = Literal["error", "warn", "pass"] | Callable[[ActivationResult], None]
+    _Task = Tuple[concurrent.futures.Future[Any], Callable[..., Any], Tuple[Any, ...]]
+
+T = TypeVar("T")
 
 
 class ActivationError(RuntimeError):
@@ -53,12 +93,20 @@ class ModeController:
         self.dbus_adapter = dbus_adapter
         self.active_method: Method | None = None
         self.heartbeat: Heartbeat | None = None
+        # The fork generation (see wakepy/core/fork.py) of the activation.
+        self._fork_generation = get_fork_generation()
 
     def activate(
         self,
         method_classes: list[Type[Method]],
         methods_priority: Optional[MethodsPriorityOrder] = None,
         modename: Optional[str] = None,
+        strategy: ActivationStrategy | str = ActivationStrategy.SEQUENTIAL,
+        use_cache: bool = False,
+        timing: bool = False,
+        activation_timeout: Optional[float] = None,
+        method_timeout: Optional[float] = None,
+        requirements_check: Optional[RequirementsCheck] = None,
     ) -> ActivationResult:
         """Activates the mode with one of the methods in the input method
         classes. The methods are used with descending priority; highest
@@ -69,9 +117,47 @@ class ModeController:
             methods_priority=methods_priority,
             dbus_adapter=self.dbus_adapter,
             modename=modename,
+            strategy=strategy,
+            use_cache=use_cache,
+            timing=timing,
+            activation_timeout=activation_timeout,
+            method_timeout=method_timeout,
+            requirements_check=requirements_check,
+        )
+        self.active_method = active_method
+        self.heartbeat = heartbeat
+        self._fork_generation = get_fork_generation()
+        return result
+
+    async def activate_async(
+        self,
+        method_classes: list[Type[Method]],
+        methods_priority: Optional[MethodsPriorityOrder] = None,
+        modename: Optional[str] = None,
+        strategy: ActivationStrategy | str = ActivationStrategy.SEQUENTIAL,
+        use_cache: bool = False,
+        timing: bool = False,
+        activation_timeout: Optional[float] = None,
+        method_timeout: Optional[float] = None,
+        requirements_check: Optional[RequirementsCheck] = None,
+    ) -> ActivationResult:
+        """Like .activate(), but a coroutine which does not block the event
+        loop."""
+        result, active_method, heartbeat = await activate_mode_async(
+            methods=method_classes,
+            methods_priority=methods_priority,
+            dbus_adapter=self.dbus_adapter,
+            modename=modename,
+            strategy=strategy,
+            use_cache=use_cache,
+            timing=timing,
+            activation_timeout=activation_timeout,
+            method_timeout=method_timeout,
+            requirements_check=requirements_check,
         )
         self.active_method = active_method
         self.heartbeat = heartbeat
+        self._fork_generation = get_fork_generation()
         return result
 
     def deactivate(self) -> bool:
@@ -91,12 +177,621 @@ class ModeController:
 
         if not self.active_method:
             return False
+        if self._is_inherited():
+            self._forget()
+            return False
 
         deactivate_method(self.active_method, self.heartbeat)
         self.active_method = None
         self.heartbeat = None
         return True
 
+    async def deactivate_async(self) -> bool:
+        """Like .deactivate(), but a coroutine which does not block the event
+        loop."""
+
+        if not self.active_method:
+            return False
+        if self._is_inherited():
+            self._forget()
+            return False
+
+        await deactivate_method_async(self.active_method, self.heartbeat)
+        self.active_method = None
+        self.heartbeat = None
+        return True
+
+    def _is_inherited(self) -> bool:
+        """True if the mode was activated in a parent process, before a
+        fork. The inherited modes are not deactivated in the child process, as
+        that would exit the mode of the parent."""
+        return self._fork_generation != get_fork_generation()
+
+    def _forget(self) -> None:
+        self.active_method = None
+        self.heartbeat = None
+
+
+class _ModeThread:
+    """A thread which stays alive for the whole activation of a mode, and in
+    which the mode is both activated and deactivated. Required by the Methods
+    bound to the thread which entered the mode (see Method.thread_bound), when
+    the mode is not activated and deactivated in the same thread otherwise
+    (like in the background activation). Runs the calls one at a time, in the
+    order they were submitted. A daemon thread, so it never delays the
+    interpreter exit."""
+
+    def __init__(self, name: str):
+        self._tasks: queue.SimpleQueue[Optional[_Task]] = queue.SimpleQueue()
+        self._fork_generation = get_fork_generation()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._start_lock = threading.Lock()
+
+    def submit(self, fn: Callable[..., T], *args: Any) -> concurrent.futures.Future[T]:
+        """Schedules fn(*args) to be called in the thread. The thread is
+        started on the first call, with the call already waiting for it."""
+        future: concurrent.futures.Future[T] = concurrent.futures.Future()
+        self._tasks.put((future, fn, args))
+        with self._start_lock:
+            if self._thread.ident is None:
+                self._thread.start()
+        return future
+
+    def run(self, fn: Callable[..., T], *args: Any) -> T:
+        """Calls fn(*args) in the thread, and returns the result. After a fork,
+        calls it in the calling thread, as the thread does not exist in the
+        child process."""
+        if (
+            self._fork_generation != get_fork_generation()
+            or self._thread is threading.current_thread()
+        ):
+            return fn(*args)
+        return self.submit(fn, *args).result()
+
+    async def run_async(self, fn: Callable[..., T], *args: Any) -> T:
+        """Like .run(), but a coroutine which does not block the event
+        loop."""
+        if self._fork_generation != get_fork_generation():
+            return fn(*args)
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def stop(self) -> None:
+        """Lets the thread exit after the calls submitted so far."""
+        self._tasks.put(None)
+
+    def _run(self) -> None:
+        while True:
+            task = self._tasks.get()
+            if task is None:
+                return
+            future, fn, args = task
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = fn(*args)
+            except BaseException as exc:
+                future.set_exception(exc)
+            else:
+                future.set_result(result)
+
+
+class _SharedActivation:
+    """The state of a shared activation; the activation which is shared by
+    all the shared Modes with the same key (see Mode._get_shared_key)."""
+
+    def __init__(self):
+        # Held during the activation and deactivation.
+        self.lock = threading.Lock()
+        self.count = 0
+        self.controller: ModeController | None = None
+        self.result: ActivationResult | None = None
+        # The thread in which the mode is activated and deactivated, while
+        # the mode is active. The first Mode to enter and the last one to exit
+        # may run in different threads, and with linger, the deactivation is
+        # done in the background (see Method.thread_bound).
+        self.owner: _ModeThread | None = None
+        # Set to cancel the scheduled deferred deactivation (see Mode
+        # linger), if any.
+        self.release_cancelled: threading.Event | None = None
+
+    def activate(
+        self, controller: ModeController, *args: Any, **kwargs: Any
+    ) -> ActivationResult:
+        """Activates the mode with the `controller`, in the owner thread if
+        there is one. Must be called with the lock held."""
+        activate = functools.partial(controller.activate, *args, **kwargs)
+        if self.owner is None:
+            return activate()
+        return self.owner.run(activate)
+
+    def schedule_release(self, delay: float) -> None:
+        """Deactivate the mode after `delay` seconds, unless it is activated
+        again before that. The waiting and the deactivation are done in the
+        owner thread, which also activated the mode; also if the activation
+        was made by a Mode without linger. Must be called with the lock
+        held."""
+        assert self.owner is not None
+        cancelled = threading.Event()
+        self.release_cancelled = cancelled
+        self.owner.submit(self._release_after, delay, cancelled)
+
+    def cancel_release(self) -> None:
+        """Cancel the scheduled deactivation, if any. Must be called with the
+        lock held."""
+        if self.release_cancelled is not None:
+            self.release_cancelled.set()
+            self.release_cancelled = None
+
+    def release(self) -> None:
+        """Deactivate the mode now, in the owner thread, if any. Must be
+        called with the lock held, when there are no references to the
+        activation.
+
+        Raises
+        ------
+        MethodError (RuntimeError) if an error occurred when trying to
+        deactivate the mode."""
+        self.cancel_release()
+        controller, self.controller = self.controller, None
+        owner, self.owner = self.owner, None
+        self.result = None
+        try:
+            if controller is not None:
+                if owner is None:
+                    controller.deactivate()
+                else:
+                    owner.run(controller.deactivate)
+        finally:
+            if owner is not None:
+                owner.stop()
+
+    def release_if_lingering(self) -> None:
+        """Deactivate the mode now if it is waiting for a deferred
+        deactivation. Errors are turned into warnings."""
+        with self.lock:
+            if self.count == 0 and self.controller is not None:
+                self._release_with_warning()
+
+    def _release_after(self, delay: float, cancelled: threading.Event) -> None:
+        """Run in the owner thread. Deactivates the mode after `delay`
+        seconds, unless cancelled."""
+        if cancelled.wait(delay):
+            return
+        # The lock may be held by a thread which is cancelling the release,
+        # and then waits for this thread (see release()). Give up if that
+        # happens.
+        while not self.lock.acquire(timeout=0.01):
+            if cancelled.is_set():
+                return
+        try:
+            if cancelled.is_set():
+                return
+            self.release_cancelled = None
+            if self.count == 0:
+                self._release_with_warning()
+        finally:
+            self.lock.release()
+
+    def _release_with_warning(self) -> None:
+        # There is nobody to raise the exception to.
+        try:
+            self.release()
+        except MethodError as exc:
+            warnings.warn(f"Could not deactivate a lingering mode: {exc}")
+
+
+_shared_activations: Dict[Hashable, _SharedActivation] = dict()
+_shared_activations_lock = threading.Lock()
+
+
+def _reset_shared_activations_after_fork() -> None:
+    # The shared activations of the parent process are not shared with the
+    # child, and the locks may have been held by other threads.
+    global _shared_activations, _shared_activations_lock
+    _shared_activations = dict()
+    _shared_activations_lock = threading.Lock()
+
+
+register_after_fork_in_child(_reset_shared_activations_after_fork)
+
+
+def get_shared_activation(key: Hashable) -> _SharedActivation:
+    """Get the process-wide shared activation for the `key`. Creates it if it
+    does not exist yet."""
+    with _shared_activations_lock:
+        if key not in _shared_activations:
+            _shared_activations[key] = _SharedActivation()
+        return _shared_activations[key]
+
+
+@atexit.register
+def release_lingering_modes() -> None:
+    """Deactivates right away all the modes which are waiting for a deferred
+    deactivation (see the `linger` of Mode). Called automatically at
+    interpreter exit."""
+    with _shared_activations_lock:
+        shared_activations = list(_shared_activations.values())
+    for shared in shared_activations:
+        shared.release_if_lingering()
+
+
+class SharedModeController(ModeController):
+    """A ModeController for the shared Modes (Modes with shared=True). All
+    the SharedModeControllers with the same shared activation use one
+    reference-counted activation: The first one to activate activates the mode
+    for real, the later ones just increment the reference count (and get the
+    ActivationResult of the real activation), and the last one to deactivate
+    deactivates the mode. With `linger`, the deactivation is deferred by
+    `linger` seconds, and if the mode is activated again during that time, the
+    active Method is reused as is. Thread-safe."""
+
+    def __init__(
+        self,
+        shared: _SharedActivation,
+        dbus_adapter: Optional[DbusAdapter] = None,
+        controller_class: Callable[..., ModeController] = ModeController,
+        linger: Optional[float] = None,
+    ):
+        # The dbus adapter is used only by the real activation, and it is not
+        # closed by the Modes holding a reference.
+        super().__init__(dbus_adapter=None)
+        self.shared = shared
+        self.holds_reference = False
+        self._activation_dbus_adapter = dbus_adapter
+        self._controller_class = controller_class
+        self.linger = linger
+
+    def activate(self, *args: Any, **kwargs: Any) -> ActivationResult:
+        """Activates the mode, or takes a reference to the shared activation
+        if the mode has been already activated. See ModeController.activate
+        for the arguments; they are used only in the real activation."""
+        shared = self.shared
+        with shared.lock:
+            shared.cancel_release()
+            if shared.controller is None:
+                controller = self._controller_class(
+                    dbus_adapter=self._activation_dbus_adapter
+                )
+                shared.owner = _ModeThread(name="wakepy-shared")
+                result = shared.activate(controller, *args, **kwargs)
+                if not result.success:
+                    if shared.owner is not None:
+                        shared.owner.stop()
+                        shared.owner = None
+                    return result
+                shared.controller = controller
+                shared.result = result
+            assert shared.controller is not None and shared.result is not None
+            if not self.holds_reference:
+                shared.count += 1
+                self.holds_reference = True
+                self._fork_generation = get_fork_generation()
+            self.active_method = shared.controller.active_method
+            self.heartbeat = shared.controller.heartbeat
+            return shared.result
+
+    async def activate_async(self, *args: Any, **kwargs: Any) -> ActivationResult:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, functools.partial(self.activate, *args, **kwargs)
+        )
+
+    def deactivate(self) -> bool:
+        """Releases the reference to the shared activation. If it was the last
+        reference, deactivates the mode.
+
+        If `linger` is set, the deactivation is done `linger` seconds later,
+        unless the mode is activated again before that. Errors in a deferred
+        deactivation are turned into warnings.
+
+        Returns
+        -------
+        deactivated:
+            False if there was no reference to release, and True otherwise.
+
+        Raises
+        ------
+        MethodError (RuntimeError) if the mode was deactivated and an error
+        occurred when trying to deactivate it."""
+        if not self.holds_reference:
+            return False
+        if self._is_inherited():
+            # The reference belongs to the parent process.
+            self.holds_reference = False
+            self._forget()
+            return False
+
+        shared = self.shared
+        with shared.lock:
+            self.holds_reference = False
+            self.active_method = None
+            self.heartbeat = None
+            shared.count -= 1
+            if shared.count > 0:
+                return True
+            if self.linger:
+                shared.schedule_release(self.linger)
+            else:
+                shared.release()
+            return True
+
+    async def deactivate_async(self) -> bool:
+        return await asyncio.get_running_loop().run_in_executor(None, self.deactivate)
+
+
+class InterprocessModeController(ModeController):
+    """A ModeController for the Modes coordinated between processes (Modes
+    with interprocess=True). Of all the processes on the host using the same
+    lock file, only the leader activates the mode for real; the others are
+    followers, which get an ActivationResult telling the Method used by the
+    leader. The followers stand by and take over (activate the mode) when the
+    leader exits the mode, or when the leader process exits. See
+    wakepy/core/lockfile.py.
+
+    There may be a short gap (up to `poll_interval` seconds plus the
+    activation time) between the exit of the leader and a follower taking
+    over. If there is no lock file available (XDG_RUNTIME_DIR is not set, or
+    the platform has no flock), the mode is activated without coordination.
+
+    The result of the takeover is passed to `on_takeover`, in the standby
+    thread of the follower. If there is no `on_takeover`, a failed takeover
+    is warned about.
+    """
+
+    poll_interval: float = 0.5
+    """How often (in seconds) the followers try to become the leader."""
+
+    def __init__(
+        self,
+        lock_path: Optional[Path],
+        dbus_adapter: Optional[DbusAdapter] = None,
+        controller_class: Type[ModeController] = ModeController,
+        on_takeover: Optional[Callable[[ActivationResult], None]] = None,
+    ):
+        # The dbus adapter is used only when activating as the leader.
+        super().__init__(dbus_adapter=None)
+        self.lock_path = lock_path
+        self.on_takeover = on_takeover
+        self._activation_dbus_adapter = dbus_adapter
+        self._controller_class = controller_class
+        self._controller: Optional[ModeController] = None
+        self._lock: Optional[LeaderLock] = None
+        self._activation_args: Tuple[Tuple[Any, ...], Dict[str, Any]] = ((), {})
+        self._stop_event = threading.Event()
+        self._standby_thread: Optional[threading.Thread] = None
+
+    @property
+    def is_leader(self) -> bool:
+        """True if this process holds the real activation."""
+        return self._controller is not None
+
+    def activate(self, *args: Any, **kwargs: Any) -> ActivationResult:
+        """Activates the mode as the leader, or becomes a follower if another
+        process is the leader. Waits for the leader to finish its activation,
+        if it is in progress. See ModeController.activate for the arguments;
+        they are used only in the activations as the leader."""
+        self._activation_args = (args, kwargs)
+        self._fork_generation = get_fork_generation()
+        lock = LeaderLock(self.lock_path) if self.lock_path is not None else None
+        while True:
+            if lock is None or lock.try_acquire():
+                result = self._activate_as_leader(lock)
+                if result.success:
+                    self._lock = lock
+                elif lock is not None:
+                    lock.close()
+                return result
+            state = lock.read_state()
+            if state is not None:
+                self._lock = lock
+                self._start_standby()
+                return ActivationResult(
+                    [MethodActivationResult(state.method_name, success=True)],
+                    modename=kwargs.get("modename"),
+                )
+            # The leader is activating the mode.
+            time.sleep(self.poll_interval)
+
+    async def activate_async(self, *args: Any, **kwargs: Any) -> ActivationResult:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, functools.partial(self.activate, *args, **kwargs)
+        )
+
+    def deactivate(self) -> bool:
+        """Deactivates the mode if this process is the leader, and leaves the
+        leader election. A follower, if any, takes over.
+
+        Returns
+        -------
+        deactivated:
+            False if the mode was not active, and True otherwise.
+
+        Raises
+        ------
+        MethodError (RuntimeError) if this process was the leader and an error
+        occurred when trying to deactivate the mode."""
+        if self._controller is None and self._lock is None:
+            return False
+        if self._is_inherited():
+            # The leadership (if any) belongs to the parent process. The
+            # inherited lock file was closed right after the fork.
+            self._controller = None
+            self._lock = None
+            self._forget()
+            return False
+
+        self._stop_event.set()
+        if self._standby_thread is not None:
+            self._standby_thread.join()
+            self._standby_thread = None
+
+        controller, lock = self._controller, self._lock
+        self._controller = None
+        self._lock = None
+        self.active_method = None
+        self.heartbeat = None
+        try:
+            if controller is not None:
+                controller.deactivate()
+        finally:
+            # Releasing the lock lets a follower take over.
+            if lock is not None:
+                lock.close()
+        return True
+
+    async def deactivate_async(self) -> bool:
+        return await asyncio.get_running_loop().run_in_executor(None, self.deactivate)
+
+    def _activate_as_leader(self, lock: Optional[LeaderLock]) -> ActivationResult:
+        controller = self._controller_class(dbus_adapter=self._activation_dbus_adapter)
+        args, kwargs = self._activation_args
+        result = controller.activate(*args, **kwargs)
+        if result.success:
+            self._controller = controller
+            self.active_method = controller.active_method
+            self.heartbeat = controller.heartbeat
+            if lock is not None:
+                lock.write_state(str(result.active_method))
+        return result
+
+    def _start_standby(self) -> None:
+        self._stop_event.clear()
+        self._standby_thread = threading.Thread(
+            target=self._stand_by, name="wakepy-interprocess-standby", daemon=True
+        )
+        self._standby_thread.start()
+
+    def _stand_by(self) -> None:
+        """Run by the followers. Takes over when the leader is gone."""
+        lock = self._lock
+        assert lock is not None
+        while not self._stop_event.wait(self.poll_interval):
+            if not lock.try_acquire():
+                continue
+            result = self._activate_as_leader(lock)
+            if not result.success:
+                lock.release()
+            if self.on_takeover is not None:
+                self.on_takeover(result)
+            elif not result.success:
+                warnings.warn(
+                    "Could not take over the inter-process mode: "
+                    + result.get_error_text()
+                )
+            return
+
+
+class PlannedModeController(ModeController):
+    """A ModeController which uses the activation plan of a ModeTemplate: The
+    Method which activated the mode the last time is entered directly, without
+    creating, prioritizing and checking the requirements of all the Methods of
+    the mode. If that fails, or if there is no plan yet, the mode is activated
+    normally, and the plan is updated with the result.
+
+    The plan is not used if the activation uses a custom requirements check
+    (like the activations of a CombinedMode).
+    """
+
+    def __init__(
+        self, template: ModeTemplate, dbus_adapter: Optional[DbusAdapter] = None
+    ):
+        super().__init__(dbus_adapter=dbus_adapter)
+        self.template = template
+
+    def activate(
+        self,
+        method_classes: list[Type[Method]],
+        methods_priority: Optional[MethodsPriorityOrder] = None,
+        modename: Optional[str] = None,
+        strategy: ActivationStrategy | str = ActivationStrategy.SEQUENTIAL,
+        use_cache: bool = False,
+        timing: bool = False,
+        activation_timeout: Optional[float] = None,
+        method_timeout: Optional[float] = None,
+        requirements_check: Optional[RequirementsCheck] = None,
+    ) -> ActivationResult:
+        plan = self.template._plan
+        if plan is not None and requirements_check is None:
+            method_cls, planned_result = plan
+            if self._activate_planned(method_cls):
+                return _PlannedActivationResult(planned_result)
+
+        result = super().activate(
+            method_classes,
+            methods_priority=methods_priority,
+            modename=modename,
+            strategy=strategy,
+            use_cache=use_cache,
+            timing=timing,
+            activation_timeout=activation_timeout,
+            method_timeout=method_timeout,
+            requirements_check=requirements_check,
+        )
+        self.template._update_plan(self.active_method, result)
+        return result
+
+    def _activate_planned(self, method_cls: Type[Method]) -> bool:
+        method = method_cls(dbus_adapter=self.dbus_adapter)
+        heartbeat = None
+        if method.has_enter and not method.has_heartbeat:
+            # The common case, without the overhead of try_enter_and_heartbeat
+            try:
+                if method.enter_mode() is not None:
+                    return False
+            except Exception:
+                return False
+        else:
+            success, _, heartbeat_call_time = try_enter_and_heartbeat(method)
+            if not success:
+                return False
+            if heartbeat_call_time:
+                heartbeat = Heartbeat(method, heartbeat_call_time)
+                heartbeat.start()
+        self.active_method = method
+        self.heartbeat = heartbeat
+        self._fork_generation = get_fork_generation()
+        return True
+
+
+class _PlannedActivationResult(ActivationResult):
+    """The ActivationResult of a Mode entered with the activation plan of a
+    ModeTemplate: a copy of the ActivationResult of the activation which made
+    the plan. The method results are copied on first use, so entering the
+    mode does not pay for copying them."""
+
+    def __init__(self, planned: ActivationResult):
+        # The _method_results are set by __getattr__, when first used.
+        self._planned = planned
+        self.modename = planned.modename
+        self.total_time = planned.total_time
+        self.started_methods = list(planned.started_methods)
+        self.rolled_back_methods = list(planned.rolled_back_methods)
+
+    def __getattr__(self, name: str) -> Any:
+        if name != "_method_results":
+            raise AttributeError(name)
+        self._method_results = [
+            MethodActivationResult(
+                res.method_name,
+                res.success,
+                res.failure_stage,
+                res.failure_reason,
+                dict(res.stage_durations) if res.stage_durations is not None else None,
+                res.heartbeat_duration,
+                res.timed_out,
+            )
+            for res in self._planned._method_results
+        ]
+        return self._method_results
+
+    @property
+    def success(self) -> bool:
+        if "_method_results" not in self.__dict__:
+            # The method results are the same as in the planned result.
+            return self._planned.success
+        return super().success
+
 
 class Mode(ABC):
     """A mode is something that is entered into, kept, and exited from. Modes
@@ -119,6 +814,10 @@ class Mode(ABC):
     activation_result: ActivationResult | None
         The activation result which tells more about the activation process
         outcome. None if Mode has not yet been activated.
+    activation_future: concurrent.futures.Future[ActivationResult] | None
+        The Future of the activation running in the background (see
+        activate_in_background). None if the Mode has not been activated in
+        the background.
     """
 
     _controller_class: Type[ModeController] = ModeController
@@ -130,6 +829,15 @@ class Mode(ABC):
         name: Optional[ModeName | str] = None,
         on_fail: OnFail = "error",
         dbus_adapter: Type[DbusAdapter] | DbusAdapterTypeSeq | None = None,
+        strategy: ActivationStrategy | str = ActivationStrategy.SEQUENTIAL,
+        use_cache: bool = False,
+        timing: bool = False,
+        activation_timeout: Optional[float] = None,
+        method_timeout: Optional[float] = None,
+        shared: bool = False,
+        linger: Optional[float] = None,
+        blocking: bool = True,
+        interprocess: bool = False,
     ):
         """Initialize a Mode using Methods.
 
@@ -159,7 +867,71 @@ class Mode(ABC):
             information about the activation process.
         dbus_adapter:
             For using a custom dbus-adapter. Optional.
+        strategy:
+            The activation strategy. If "sequential" (the default), the
+            Methods are tried one by one, in priority order. If
+            "parallel-probe", the requirements of all the candidate Methods
+            are checked at the same time in a thread pool, and the Methods are
+            then tried in priority order. This is faster if checking the
+            requirements of some Methods is slow (for example, D-Bus timeouts).
+            If "race", a few of the highest priority Methods are activated at
+            the same time; the highest priority one which succeeds is kept and
+            the others are rolled back.
+        use_cache:
+            If True, uses an on-disk cache (under $XDG_CACHE_HOME/wakepy) for
+            remembering which Method was used successfully the last time in
+            the same environment. That Method is then tried first. Requires
+            a `name`. Default: False.
+        timing:
+            If True, the durations of the activation stages of each Method and
+            the total activation time are recorded into the activation result.
+            Default: False.
+        activation_timeout:
+            The maximum total time (in seconds) to spend in activating the
+            mode. When the time runs out, the activation fails. Optional.
+        method_timeout:
+            The maximum time (in seconds) to spend with a single Method. A
+            Method which does not finish in time is recorded as timed out, and
+            the next Method is tried. Not applied to the thread bound Methods
+            (see Method.thread_bound). Optional.
+        shared:
+            If True, the activation is shared with the other shared Modes of
+            the process which have the same name, Methods, methods_priority,
+            strategy and dbus_adapter. The first of them to enter activates
+            the mode, the later ones only increment a reference count and get
+            the same ActivationResult, and the last one to exit deactivates the
+            mode. The other settings of the first entering Mode are used in
+            the activation. The mode is activated and deactivated in a
+            background thread, which stays alive while the mode is active.
+            Thread-safe. Default: False.
+        linger:
+            If given, the deactivation is deferred by `linger` seconds when
+            exiting the mode. If the mode is entered again (by any Mode with
+            the same settings) within that time, the active Method is reused
+            without deactivating and activating it again. This avoids the
+            overhead of entering and exiting in tight loops. Implies the
+            `shared` activation. The modes waiting for the deactivation are
+            deactivated at interpreter exit, at the latest. Optional.
+        blocking:
+            If True (the default), entering the mode waits for the activation
+            to finish. If False, the activation runs in the background (see
+            activate_in_background), and the with block starts right away.
+        interprocess:
+            If True, the activation is coordinated with the other processes on
+            the host which use the Mode with the same `name` and
+            interprocess=True (for example, the workers of a multiprocessing
+            pool). Only one of the processes, the leader, activates the mode
+            for real, and when it exits the mode (or exits), another process
+            takes over. Uses lock files under $XDG_RUNTIME_DIR/wakepy. If the
+            Mode has no `name`, or if XDG_RUNTIME_DIR is not set, or if the
+            platform does not support file locks (Windows), the mode is
+            activated without coordination. When a follower takes over, its
+            `activation_result` and `active` are updated; if the takeover
+            fails, the `on_fail` action is run in a background thread.
+            Default: False.
         """
+        if linger is not None and linger < 0:
+            raise ValueError(f"linger must be a non-negative number! Got: {linger}")
 
         self.name = name
         self.methods_classes = methods
@@ -169,22 +941,150 @@ class Mode(ABC):
         self.active: bool = False
         self.on_fail = on_fail
         self._dbus_adapter_cls = dbus_adapter
+        self.strategy = strategy
+        self.use_cache = use_cache
+        self.timing = timing
+        self.activation_timeout = activation_timeout
+        self.method_timeout = method_timeout
+        self.shared = shared
+        self.linger = linger
+        self.blocking = blocking
+        self.interprocess = interprocess
+        self.activation_future: concurrent.futures.Future[
+            ActivationResult
+        ] | None = None
+        # The thread in which the mode is activated and deactivated, if not
+        # the thread calling __enter__ and __exit__.
+        self._mode_thread: _ModeThread | None = None
 
     def __enter__(self) -> Mode:
-        self.controller = self.controller or self._controller_class(
-            dbus_adapter=get_dbus_adapter(self._dbus_adapter_cls)
+        if not self.blocking:
+            self.activate_in_background()
+            return self
+
+        self.controller = self.controller or self._create_controller(
+            get_dbus_adapter(self._dbus_adapter_cls)
         )
+        result = self._activate()
+
+        if not self.active:
+            handle_activation_fail(self.on_fail, result)
+
+        return self
+
+    def activate_in_background(self) -> concurrent.futures.Future[ActivationResult]:
+        """Starts activating the mode in a background thread, and returns
+        right away. Used by __enter__ if `blocking` is False. The thread is
+        kept alive until the mode is exited, and the mode is deactivated in
+        the same thread.
+
+        Returns
+        -------
+        activation_future:
+            A Future for the ActivationResult. The `on_fail` action is run in
+            the background thread, so if the activation fails and `on_fail` is
+            "error", the Future raises ActivationError. The Future is also
+            stored as the `activation_future` attribute.
+        """
+        self.controller = self.controller or self._create_controller(
+            get_dbus_adapter(self._dbus_adapter_cls)
+        )
+        future: concurrent.futures.Future[
+            ActivationResult
+        ] = concurrent.futures.Future()
+        self.activation_future = future
+        # The thread is kept alive until the mode is exited, and the mode is
+        # deactivated in it (see __exit__).
+        self._mode_thread = _ModeThread(name=f"wakepy-mode-{self.name}")
+        self._mode_thread.submit(self._activate_in_background, future)
+        return future
+
+    def _activate_in_background(
+        self, future: concurrent.futures.Future[ActivationResult]
+    ) -> None:
+        if not future.set_running_or_notify_cancel():
+            # Cancelled before the activation started.
+            return
+        try:
+            result = self._activate()
+            if not self.active:
+                handle_activation_fail(self.on_fail, result)
+        except BaseException as exc:
+            future.set_exception(exc)
+        else:
+            future.set_result(result)
+
+    def _finish_background_activation(self) -> None:
+        """Cancels the background activation if it has not started, or waits
+        for it to finish otherwise. The errors of the activation are left in
+        the activation_future."""
+        future = self.activation_future
+        if future is not None and not future.cancel():
+            concurrent.futures.wait([future])
+
+    def _create_controller(self, dbus_adapter: Optional[DbusAdapter]) -> ModeController:
+        controller_class: Callable[..., ModeController] = self._controller_class
+        if self.interprocess:
+            lock_path = get_lock_path(str(self.name)) if self.name else None
+            controller_class = functools.partial(
+                InterprocessModeController,
+                lock_path,
+                controller_class=self._controller_class,
+                on_takeover=self._on_interprocess_takeover,
+            )
+        if not self.shared and not self.linger:
+            return controller_class(dbus_adapter=dbus_adapter)
+        return SharedModeController(
+            get_shared_activation(self._get_shared_key()),
+            dbus_adapter=dbus_adapter,
+            controller_class=controller_class,
+            linger=self.linger,
+        )
+
+    def _on_interprocess_takeover(self, result: ActivationResult) -> None:
+        """Called in the standby thread of an inter-process follower, when it
+        has tried to take over the mode from the leader process. The result of
+        the takeover replaces the activation_result. If the takeover failed,
+        the mode is no longer active, and the `on_fail` action is run (in the
+        standby thread)."""
+        self.activation_result = result
+        self.active = result.success
+        if not self.active:
+            handle_activation_fail(self.on_fail, result)
+
+    def _get_shared_key(self) -> Hashable:
+        """The key of the shared activation. Shared Modes with the same key
+        share the activation."""
+        dbus_adapter = self._dbus_adapter_cls
+        return (
+            str(self.name),
+            tuple(self.methods_classes),
+            _get_methods_priority_key(self.methods_priority),
+            str(self.strategy),
+            tuple(dbus_adapter) if isinstance(dbus_adapter, list) else dbus_adapter,
+            self._controller_class,
+            self.interprocess,
+        )
+
+    def _activate(
+        self, requirements_check: Optional[RequirementsCheck] = None
+    ) -> ActivationResult:
+        """Activates the mode using the controller (must be created before
+        calling this). Does not handle activation failures (on_fail)."""
+        assert self.controller is not None
         self.activation_result = self.controller.activate(
             self.methods_classes,
             methods_priority=self.methods_priority,
             modename=self.name,
+            strategy=self.strategy,
+            use_cache=self.use_cache,
+            timing=self.timing,
+            activation_timeout=self.activation_timeout,
+            method_timeout=self.method_timeout,
+            requirements_check=requirements_check,
         )
         self.active = self.activation_result.success
-
-        if not self.active:
-            handle_activation_fail(self.on_fail, self.activation_result)
-
-        return self
+        return self.activation_result
 
     def __exit__(
         self,
@@ -210,18 +1110,327 @@ class Mode(ABC):
         if self.controller is None:
             raise RuntimeError("Must __enter__ before __exit__!")
 
-        self.controller.deactivate()
+        # An activation still in flight is waited for and then rolled back
+        # by the deactivation.
+        self._finish_background_activation()
+        mode_thread, self._mode_thread = self._mode_thread, None
+        try:
+            if mode_thread is None:
+                self.controller.deactivate()
+            else:
+                mode_thread.run(self.controller.deactivate)
+        finally:
+            if mode_thread is not None:
+                mode_thread.stop()
+            self.active = False
+
+        return _is_handled_exit_exception(exception)
+
+    async def __aenter__(self) -> Mode:
+        """Like __enter__, but for `async with`. The activation runs in a
+        thread owned by the Mode, so that the blocking calls of the Methods do
+        not block the event loop. The thread is kept alive until the mode is
+        exited, and the mode is deactivated in the same thread."""
+        if not self.blocking:
+            self.activate_in_background()
+            return self
+
+        self.controller = self.controller or self._create_controller(
+            get_dbus_adapter(self._dbus_adapter_cls)
+        )
+        mode_thread = _ModeThread(name=f"wakepy-mode-{self.name}")
+        self._mode_thread = mode_thread
+        result = await mode_thread.run_async(self._activate)
+
+        if not self.active:
+            self._mode_thread = None
+            mode_thread.stop()
+            handle_activation_fail(self.on_fail, result)
+
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exception: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> bool:
+        """Like __exit__, but for `async with`. The deactivation runs in the
+        thread where the mode was activated. Closes the resources of the dbus
+        adapter (see DbusAdapter.aclose) in the event loop, after the
+        deactivation."""
+        _ = exc_type
+        _ = traceback
+
+        if self.controller is None:
+            raise RuntimeError("Must __aenter__ before __aexit__!")
+
+        mode_thread, self._mode_thread = self._mode_thread, None
+        try:
+            await asyncio.get_running_loop().run_in_executor(
+                None, self._finish_background_activation
+            )
+            if mode_thread is None:
+                await self.controller.deactivate_async()
+            else:
+                await mode_thread.run_async(self.controller.deactivate)
+        finally:
+            if mode_thread is not None:
+                mode_thread.stop()
+            if self.controller.dbus_adapter is not None:
+                await self.controller.dbus_adapter.aclose()
         self.active = False
 
-        if exception is None or isinstance(exception, ModeExit):
-            return True
+        return _is_handled_exit_exception(exception)
+
+    def wrap(self, iterable: Iterable[T]) -> Iterator[T]:
+        """Wraps the `iterable` so that the mode is active while it is being
+        consumed. The mode is entered lazily, on the first next() call, and
+        exited when the iterator is exhausted, closed, or garbage collected.
+        Building a lazy pipeline (for example, a chain of generators) therefore
+        does not activate the mode before the pipeline is consumed.
+
+        Example
+        -------
+        ```
+        for row in keep.running().wrap(read_rows()):
+            process(row)
+        ```
+
+        Returns
+        -------
+        iterator:
+            A generator which yields the items of the `iterable`. The items
+            are delegated with `yield from`, so the overhead per item is
+            small, and the send() and throw() calls are passed through to the
+            `iterable` if it is a generator.
+        """
+        return _wrap_iterable(self, iterable)
+
+    def wrap_async(self, iterable: AsyncIterable[T]) -> AsyncIterator[T]:
+        """Like .wrap(), but for asynchronous iterables (`async for`). The
+        mode is entered and exited like with `async with`."""
+        return _wrap_async_iterable(self, iterable)
+
 
-        # Other types of exceptions are not handled; ignoring them here and
-        # returning False will tell python to re-raise the exception. Can't
-        # return None as type-checkers will mark code after with block
-        # unreachable
+def _wrap_iterable(mode: Mode, iterable: Iterable[T]) -> Iterator[T]:
+    with mode:
+        yield from iterable
 
-        return False
+
+async def _wrap_async_iterable(
+    mode: Mode, iterable: AsyncIterable[T]
+) -> AsyncIterator[T]:
+    async with mode:
+        iterator = iterable.__aiter__()
+        try:
+            async for item in iterator:
+                yield item
+        finally:
+            # Like `yield from` does for generators.
+            aclose = getattr(iterator, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+
+class CombinedMode:
+    """Multiple Modes which are activated and deactivated together, like a
+    single Mode. Created with wakepy.modes.combined().
+
+    The Modes are activated one by one, in the given order, and deactivated in
+    the reverse order. All the Modes use the same dbus adapter instance (so
+    for example the D-Bus connections are shared), and the result of the
+    requirements check (Method.caniuse()) of each Method class is reused if
+    the same Method class is used in multiple Modes. The settings of the Modes
+    are used for their activation, except the `dbus_adapter` and the
+    `on_fail`, which are defined for the CombinedMode.
+
+    Attributes
+    ----------
+    modes: list[Mode]
+        The Modes which are combined.
+    active: bool
+        True if all the Modes are active. Otherwise, False.
+    activation_result: CombinedActivationResult | None
+        The activation result, which combines the activation results of the
+        Modes. None if the CombinedMode has not yet been activated.
+    """
+
+    def __init__(
+        self,
+        modes: Sequence[Mode],
+        name: Optional[str] = None,
+        on_fail: OnFail = "error",
+        dbus_adapter: Type[DbusAdapter] | DbusAdapterTypeSeq | None = None,
+    ):
+        """Initialize a CombinedMode.
+
+        Parameters
+        ----------
+        modes:
+            The Modes to combine. Must not be active.
+        name:
+            Name of the CombinedMode. If not given, created from the names of
+            the `modes`.
+        on_fail:
+            Determines what to do in case the activation of any of the Modes
+            fails. The options are same as for Mode. If the option is "error",
+            the Modes which were activated successfully are deactivated before
+            raising wakepy.ActivationError.
+        dbus_adapter:
+            For using a custom dbus-adapter. Optional. One instance of the
+            adapter is used for all the Modes.
+        """
+        if not modes:
+            raise ValueError("CombinedMode needs at least one Mode!")
+        self.modes = list(modes)
+        self.name = name or " + ".join(
+            str(mode.name or "[unnamed mode]") for mode in self.modes
+        )
+        self.on_fail = on_fail
+        self._dbus_adapter_cls = dbus_adapter
+        self.dbus_adapter: DbusAdapter | None = None
+        self.activation_result: CombinedActivationResult | None = None
+        self.active: bool = False
+
+    def __enter__(self) -> CombinedMode:
+        self.dbus_adapter = get_dbus_adapter(self._dbus_adapter_cls)
+        self._activate()
+        if not self.active:
+            self._handle_activation_fail()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exception: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> bool:
+        """Deactivates the Modes, in reverse order. See Mode.__exit__."""
+        _ = exc_type
+        _ = traceback
+
+        if self.activation_result is None:
+            raise RuntimeError("Must __enter__ before __exit__!")
+
+        self._deactivate()
+        return _is_handled_exit_exception(exception)
+
+    async def __aenter__(self) -> CombinedMode:
+        """Like __enter__, but for `async with`. See Mode.__aenter__."""
+        self.dbus_adapter = get_dbus_adapter(self._dbus_adapter_cls)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._activate)
+        if not self.active:
+            await loop.run_in_executor(None, self._handle_activation_fail)
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exception: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> bool:
+        """Like __exit__, but for `async with`. See Mode.__aexit__."""
+        _ = exc_type
+        _ = traceback
+
+        if self.activation_result is None:
+            raise RuntimeError("Must __aenter__ before __aexit__!")
+
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._deactivate)
+        finally:
+            if self.dbus_adapter is not None:
+                await self.dbus_adapter.aclose()
+        return _is_handled_exit_exception(exception)
+
+    def _activate(self) -> None:
+        """Activates the Modes, in order. If activating any of the Modes
+        raises, the Modes activated before it are deactivated, in reverse
+        order, before re-raising."""
+        requirements_check = _get_shared_requirements_check()
+        results = []
+        entered: list[Mode] = []
+        try:
+            for mode in self.modes:
+                if mode.active:
+                    raise RuntimeError(f'The Mode "{mode.name}" is already active!')
+                mode.controller = mode._create_controller(self.dbus_adapter)
+                entered.append(mode)
+                results.append(mode._activate(requirements_check=requirements_check))
+        except BaseException:
+            # The with block is not entered, so __exit__ will not be called.
+            # The errors of the deactivation are left out; the original error
+            # is the one to raise.
+            _deactivate_modes(reversed(entered))
+            raise
+        self.activation_result = CombinedActivationResult(results, modename=self.name)
+        self.active = self.activation_result.success
+
+    def _handle_activation_fail(self) -> None:
+        assert self.activation_result is not None
+        if self.on_fail == "error":
+            # The with block is not entered, so __exit__ will not be called.
+            self._deactivate()
+        handle_activation_fail(self.on_fail, self.activation_result)
+
+    def _deactivate(self) -> None:
+        """Deactivates all the Modes, in reverse order. If deactivating any of
+        the Modes fails, the rest are still deactivated, and the first error
+        is raised at the end."""
+        errors = _deactivate_modes(reversed(self.modes))
+        self.active = False
+        if errors:
+            raise errors[0]
+
+
+def _deactivate_modes(modes: Iterable[Mode]) -> list[MethodError]:
+    """Deactivates the `modes`, in the given order. If deactivating any of
+    the Modes fails, the rest are still deactivated. Returns the errors."""
+    errors = []
+    for mode in modes:
+        if mode.controller is None:
+            continue
+        try:
+            mode.controller.deactivate()
+        except MethodError as exc:
+            errors.append(exc)
+        mode.active = False
+    return errors
+
+
+def _get_shared_requirements_check() -> RequirementsCheck:
+    """Creates a requirements check (like caniuse_fails) which runs the check
+    only once per Method class, and reuses the result for all the Methods of
+    the same class."""
+    results: Dict[type, Tuple[bool, str]] = dict()
+    lock = threading.Lock()
+
+    def check(method: Method) -> Tuple[bool, str]:
+        methodcls = type(method)
+        with lock:
+            if methodcls in results:
+                return results[methodcls]
+        result = caniuse_fails(method)
+        with lock:
+            return results.setdefault(methodcls, result)
+
+    return check
+
+
+def _is_handled_exit_exception(exception: Optional[BaseException]) -> bool:
+    """Tells if the `exception` raised in the with block is handled by the
+    Mode (swallowed). Returning False from __exit__ tells python to re-raise
+    the exception."""
+    if exception is None or isinstance(exception, ModeExit):
+        return True
+
+    # Other types of exceptions are not handled; ignoring them here and
+    # returning False will tell python to re-raise the exception. Can't
+    # return None as type-checkers will mark code after with block
+    # unreachable
+    return False
 
 
 def create_mode(
@@ -262,6 +1471,120 @@ def create_mode(
     return Mode(name=modename, methods=selected_methods, **kwargs)
 
 
+class ModeTemplate:
+    """A precompiled, reusable Mode. Calling the template creates a Mode, like
+    create_mode, but the work which is the same for every Mode is done only
+    once:
+
+    * The Methods are selected for the mode when the template is created.
+    * The Method which activates the mode is remembered (the activation plan).
+      The later Modes enter that Method directly, without creating,
+      prioritizing and checking the requirements of the other Methods. If
+      entering the planned Method fails, the mode is activated normally.
+
+    Use a template when entering the same mode many times, for example in a
+    loop or for each task or request.
+
+    Example
+    -------
+    ```
+    running = ModeTemplate(ModeName.KEEP_RUNNING, omit=["SomeMethod"])
+
+    for item in items:
+        with running():
+            process(item)
+    ```
+
+    Changes to the Method registry after the template is created are not
+    seen by the template. The shared, lingering and inter-process Modes, and
+    the Modes with `timing` or timeouts (see Mode) use the selected Methods
+    of the template, but not the activation plan.
+
+    Attributes
+    ----------
+    modename: ModeName | str
+        The name of the mode.
+    methods_classes: list[Type[Method]]
+        The Methods selected for the mode.
+    planned_method: Type[Method] | None
+        The Method which activated the mode the last time, or None if the mode
+        has not been activated yet, or if the last activation failed. The
+        Modes activated with the planned Method get a copy of the
+        ActivationResult of the activation which made the plan.
+    """
+
+    def __init__(
+        self,
+        modename: ModeName | str,
+        methods: Optional[StrCollection] = None,
+        omit: Optional[StrCollection] = None,
+        **kwargs: Any,
+    ):
+        """
+        Parameters
+        ----------
+        modename:
+            The name of the mode. See create_mode.
+        methods:
+            The names of the Methods to select from the mode; a "whitelist"
+            filter. See create_mode. Optional.
+        omit:
+            The names of the Methods to remove from the mode; a "blacklist"
+            filter. See create_mode. Optional.
+        **kwargs
+            Passed to Mode as initialization arguments.
+        """
+        self.modename = modename
+        self.methods_classes = select_methods(
+            get_methods_for_mode(modename), use_only=methods, omit=omit
+        )
+        self.mode_kwargs: Dict[str, Any] = kwargs
+        # The timed activations and the activations with timeouts need the
+        # full activation process. The shared, lingering and inter-process
+        # modes have their own controllers.
+        self._use_plan = not any(
+            kwargs.get(option)
+            for option in (
+                "timing",
+                "activation_timeout",
+                "method_timeout",
+                "shared",
+                "linger",
+                "interprocess",
+            )
+        )
+        # The (Method class, ActivationResult) of the last activation, if it
+        # was successful.
+        self._plan: Optional[Tuple[Type[Method], ActivationResult]] = None
+
+    def __call__(self) -> Mode:
+        """Creates a new Mode from the template."""
+        mode = Mode(
+            name=self.modename, methods=self.methods_classes, **self.mode_kwargs
+        )
+        dbus_adapter = get_dbus_adapter(self.mode_kwargs.get("dbus_adapter"))
+        if self._use_plan:
+            mode.controller = PlannedModeController(self, dbus_adapter=dbus_adapter)
+        else:
+            mode.controller = mode._create_controller(dbus_adapter)
+        return mode
+
+    @property
+    def planned_method(self) -> Optional[Type[Method]]:
+        """The Method which activated the mode the last time, or None if the
+        mode has not been activated yet, or if the last activation failed."""
+        plan = self._plan
+        return plan[0] if plan is not None else None
+
+    def _update_plan(
+        self, active_method: Optional[Method], result: ActivationResult
+    ) -> None:
+        if active_method is None:
+            self._plan = None
+        else:
+            self._plan = (type(active_method), result)
+
+
 def handle_activation_fail(on_fail: OnFail, result: ActivationResult):
     if on_fail == "pass":
         return
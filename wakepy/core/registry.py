@@ -12,6 +12,8 @@ method_names_to_classes
     Convert multiple method names to Method classes
 get_methods_for_mode
     Get Methods based on a Mode name
+get_registry_version
+    Get a number which changes whenever the registry changes
 """
 
 from __future__ import annotations
@@ -37,6 +39,10 @@ _method_registry: MethodRegistry = dict()
 a module with a subclass of Method, the Method class is added to this registry.
 """
 
+_registry_version = 0
+"""Incremented every time a Method is added to the registry. Used for
+invalidating anything computed from the registered Methods."""
+
 
 class MethodRegistryError(RuntimeError):
     """Any error which is related to the method registry"""
@@ -65,8 +71,16 @@ def register_method(method_class: Type[Method]):
             return
 
     # Register a new method class
+    global _registry_version
     method_dict[method_class.name] = method_class
     _method_registry.setdefault(method_class.mode, method_dict)
+    _registry_version += 1
+
+
+def get_registry_version() -> int:
+    """Get the version of the method registry. The version changes every time
+    a new Method is registered."""
+    return _registry_version
 
 
 def get_method(method_name: str, mode: Optional[ModeName] = None) -> MethodCls:
@@ -0,0 +1,328 @@
+"""This module contains the wakepy daemon: a local inhibit broker, which is
+started with
+
+    wakepy daemon [args]
+
+The daemon holds the real inhibitors (the wakepy Modes), and serves leases for
+them to the clients (typically, short-lived Python processes) over a Unix
+socket. This way the clients do not need to connect to D-Bus, probe the
+Methods and take their own locks. The clients use the "wakepyd" Method (see
+wakepy/methods/wakepyd.py).
+
+The Modes are shared between the clients (see the `shared` of Mode): The first
+lease for a mode activates the mode, and releasing the last lease deactivates
+it. The leases of a client are released automatically when the connection of
+the client is closed (for example, when the client process exits).
+
+Protocol
+--------
+The clients send requests, one per line, and the daemon responds to each
+request with one line. The lines are UTF-8 encoded and end with "\\n".
+
+ACQUIRE <modename>
+    Acquire a lease for the mode called <modename> (for example,
+    "keep.running"). Responds with "OK <lease_id>" if the mode is active, and
+    with "ERROR <reason>" otherwise.
+RELEASE <lease_id>
+    Release a lease. Responds with "OK", or with "ERROR <reason>".
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import os
+import socket
+import socketserver
+import sys
+import threading
+import typing
+from pathlib import Path
+
+from wakepy.core.constants import ModeName
+from wakepy.core.method import MethodError
+from wakepy.core.mode import create_mode, release_lingering_modes
+
+if typing.TYPE_CHECKING:
+    from typing import Dict, List, Optional, Set, Type
+
+    from wakepy.core.dbus import DbusAdapter
+    from wakepy.core.mode import Mode
+
+DAEMON_SOCKET_NAME = "daemon.sock"
+
+WAKEPYD_METHOD_NAME = "wakepyd"
+"""The name of the Method used by the clients of the daemon. Never used by
+the daemon itself."""
+
+RESPONSE_OK = "OK"
+RESPONSE_ERROR = "ERROR"
+
+
+class DaemonAlreadyRunningError(RuntimeError):
+    """Raised if another daemon is already listening on the socket."""
+
+
+def get_daemon_socket_path() -> Optional[Path]:
+    """The path to the socket of the daemon: $XDG_RUNTIME_DIR/wakepy/
+    daemon.sock. None if XDG_RUNTIME_DIR is not set."""
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if not runtime_dir:
+        return None
+    return Path(runtime_dir) / "wakepy" / DAEMON_SOCKET_NAME
+
+
+class WakepyDaemon:
+    """Serves the leases for the wakepy Modes over a Unix socket. See the
+    module docstring for the protocol.
+
+    Attributes
+    ----------
+    socket_path: Path
+        The path of the Unix socket.
+    """
+
+    def __init__(
+        self,
+        socket_path: Path,
+        linger: Optional[float] = None,
+        dbus_adapter: Optional[Type[DbusAdapter]] = None,
+    ):
+        """
+        Parameters
+        ----------
+        socket_path:
+            The path of the Unix socket to listen on.
+        linger:
+            Passed to the Modes. If given, a mode stays active `linger`
+            seconds after its last lease is released. Optional.
+        dbus_adapter:
+            Passed to the Modes. Optional.
+        """
+        self.socket_path = socket_path
+        self.linger = linger
+        self.dbus_adapter = dbus_adapter
+        self._leases: Dict[str, Mode] = dict()
+        self._leases_lock = threading.Lock()
+        self._lease_ids = itertools.count(1)
+        self._server = self._create_server()
+
+    @property
+    def n_leases(self) -> int:
+        """The number of the leases currently held by the clients."""
+        with self._leases_lock:
+            return len(self._leases)
+
+    def serve_forever(self) -> None:
+        """Serves the clients until shutdown() is called."""
+        self._server.serve_forever()
+
+    def shutdown(self) -> None:
+        """Stops serving the clients (if serve_forever is running), releases
+        all the leases and removes the socket."""
+        self._server.shutdown()
+        self.close()
+
+    def close(self) -> None:
+        """Releases all the leases and removes the socket. Use this if
+        serve_forever was never called or was stopped by an exception."""
+        self._server.server_close()
+        with self._leases_lock:
+            lease_ids = list(self._leases)
+        for lease_id in lease_ids:
+            _release_and_report(self, lease_id)
+        release_lingering_modes()
+        try:
+            self.socket_path.unlink()
+        except OSError:
+            pass
+
+    def handle_request(self, request: str, lease_ids: Set[str]) -> str:
+        """Handles one request line and returns the response line (without
+        the newline). `lease_ids` are the ids of the leases of the client."""
+        command, _, arg = request.strip().partition(" ")
+        if command == "ACQUIRE":
+            try:
+                lease_id = self.acquire(arg)
+            except (ValueError, RuntimeError) as exc:
+                return f"{RESPONSE_ERROR} {_to_line(str(exc))}"
+            lease_ids.add(lease_id)
+            return f"{RESPONSE_OK} {lease_id}"
+        elif command == "RELEASE":
+            if arg not in lease_ids:
+                return f"{RESPONSE_ERROR} Unknown lease: {arg}"
+            lease_ids.discard(arg)
+            try:
+                self.release(arg)
+            except MethodError as exc:
+                return f"{RESPONSE_ERROR} {_to_line(str(exc))}"
+            return RESPONSE_OK
+        return f"{RESPONSE_ERROR} Unknown command: {command}"
+
+    def acquire(self, modename: str) -> str:
+        """Activates the mode called `modename` (or takes a reference to the
+        active one) and returns the id of the new lease.
+
+        Raises
+        ------
+        ValueError if `modename` is not a known mode, and RuntimeError if the
+        mode could not be activated.
+        """
+        if modename not in set(ModeName):
+            raise ValueError(f"Unknown mode: {modename}")
+        mode = create_mode(
+            ModeName(modename),
+            omit=[WAKEPYD_METHOD_NAME],
+            on_fail="pass",
+            dbus_adapter=self.dbus_adapter,
+            shared=True,
+            linger=self.linger,
+        )
+        mode.__enter__()
+        if not mode.active:
+            mode.__exit__(None, None, None)
+            assert mode.activation_result is not None
+            raise RuntimeError(mode.activation_result.get_error_text())
+
+        lease_id = str(next(self._lease_ids))
+        with self._leases_lock:
+            self._leases[lease_id] = mode
+        return lease_id
+
+    def release(self, lease_id: str) -> None:
+        """Releases the lease. Deactivates the mode if it was the last lease
+        for the mode. Does nothing if there is no such lease.
+
+        Raises
+        ------
+        MethodError (RuntimeError) if the mode was deactivated and an error
+        occurred when trying to deactivate it.
+        """
+        with self._leases_lock:
+            mode = self._leases.pop(lease_id, None)
+        if mode is not None:
+            mode.__exit__(None, None, None)
+
+    def _create_server(self) -> socketserver.ThreadingUnixStreamServer:
+        _remove_stale_socket(self.socket_path)
+        self.socket_path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        server = socketserver.ThreadingUnixStreamServer(
+            str(self.socket_path), _LeaseRequestHandler, bind_and_activate=False
+        )
+        server.daemon_threads = True
+        try:
+            server.server_bind()
+            # Only the user may connect
+            os.chmod(self.socket_path, 0o600)
+            server.server_activate()
+        except BaseException:
+            server.server_close()
+            raise
+        server.wakepy_daemon = self  # type: ignore[attr-defined]
+        return server
+
+
+class _LeaseRequestHandler(socketserver.StreamRequestHandler):
+    """Handles the connection of one client. The leases of the client are
+    released when the connection is closed."""
+
+    def handle(self) -> None:
+        daemon: WakepyDaemon = self.server.wakepy_daemon  # type: ignore
+        lease_ids: Set[str] = set()
+        try:
+            for line in self.rfile:
+                response = daemon.handle_request(line.decode("utf-8"), lease_ids)
+                self.wfile.write(f"{response}\n".encode("utf-8"))
+        except (OSError, UnicodeDecodeError):
+            pass
+        finally:
+            for lease_id in lease_ids:
+                _release_and_report(daemon, lease_id)
+
+
+def _release_and_report(daemon: WakepyDaemon, lease_id: str) -> None:
+    """Releases the lease. There is no client to report the errors to, so
+    they are printed to stderr."""
+    try:
+        daemon.release(lease_id)
+    except MethodError as exc:
+        print(f"Could not release lease {lease_id}: {exc}", file=sys.stderr)
+
+
+def _remove_stale_socket(socket_path: Path) -> None:
+    """Removes the socket left behind by a daemon which is not running
+    anymore.
+
+    Raises
+    ------
+    DaemonAlreadyRunningError, if a daemon is listening on the socket."""
+    if not socket_path.exists():
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(str(socket_path))
+        except OSError:
+            socket_path.unlink()
+            return
+    raise DaemonAlreadyRunningError(
+        f"A wakepy daemon is already running at {socket_path}"
+    )
+
+
+def _to_line(text: str) -> str:
+    return " ".join(text.split())
+
+
+def run_daemon(sysargs: List[str]) -> None:
+    """The `wakepy daemon` CLI command. Serves until interrupted with Ctrl+C
+    (or SIGINT)."""
+    args = _get_argparser().parse_args(sysargs)
+    socket_path = Path(args.socket) if args.socket else get_daemon_socket_path()
+    if socket_path is None:
+        raise SystemExit(
+            "XDG_RUNTIME_DIR is not set! Use --socket to select the socket path."
+        )
+
+    try:
+        daemon = WakepyDaemon(socket_path, linger=args.linger)
+    except DaemonAlreadyRunningError as exc:
+        raise SystemExit(str(exc))
+
+    try:
+        print(
+            f"wakepy daemon listening at {socket_path} [Press Ctrl+C to exit]",
+            flush=True,
+        )
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.close()
+    print("\nExited.")
+
+
+def _get_argparser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="wakepy daemon",
+        description=(
+            "Run the wakepy daemon, which holds the wakepy modes and serves leases "
+            "for them to the local clients over a Unix socket."
+        ),
+    )
+    parser.add_argument(
+        "--socket",
+        help=(
+            "The path of the Unix socket to listen on. Default: "
+            f"$XDG_RUNTIME_DIR/wakepy/{DAEMON_SOCKET_NAME}"
+        ),
+        default=None,
+    )
+    parser.add_argument(
+        "--linger",
+        help=(
+            "Keep a mode active for LINGER seconds after its last lease is released."
+        ),
+        type=float,
+        default=None,
+    )
+    return parser
@@ -1,8 +1,35 @@
-from jeepney import DBusAddress, new_method_call
-from jeepney.io.blocking import open_dbus_connection
+from __future__ import annotations
+
+import asyncio
+import os
+import socket
+import threading
+import time
+import typing
+from collections import deque
+
+from jeepney import DBusAddress, HeaderFields, MatchRule, message_bus, new_method_call
+from jeepney.io import asyncio as jeepney_asyncio
+from jeepney.io.blocking import Proxy, open_dbus_connection
+from jeepney.io.common import RouterClosed
 from jeepney.wrappers import unwrap_msg
 
 from wakepy.core import DbusAdapter, DbusMethodCall
+from wakepy.core.fork import register_after_fork_in_child
+
+if typing.TYPE_CHECKING:
+    from typing import Deque, Dict, FrozenSet, Optional, Set, Tuple
+
+    from jeepney import Message
+    from jeepney.io.blocking import DBusConnection
+
+    from wakepy.core import BusType
+
+
+FAILED_BUS_TTL = 30.0
+"""The time (in seconds) to remember that a bus could not be reached, or that
+the names on it could not be listed. Within that time, the calls to the bus
+(or the service checks) fail immediately, without trying again."""
 
 
 class DbusNotFoundError(RuntimeError):
@@ -11,36 +38,575 @@ class DbusNotFoundError(RuntimeError):
 
 class JeepneyDbusAdapter(DbusAdapter):
     """An implementation of DbusAdapter using jeepney. Can be used to process
-    DbusMethodCalls (communication with Dbus services over a dbus-daemon)."""
+    DbusMethodCalls (communication with Dbus services over a dbus-daemon).
+
+    The connections are kept open and shared between all the instances of the
+    adapter; there is one long-lived connection per bus (session, system, or
+    a custom bus address). This is not only faster (no new socket + auth for
+    every call) but also required by the services which release the inhibit
+    locks when the connection of the caller is closed. If a connection turns
+    out to be broken, it is replaced with a new one. The call is retried once,
+    but only if the message could not be sent at all; a call which may have
+    reached the service (like an Inhibit) is never sent twice. After a fork,
+    the child process opens new connections; the connections of the parent
+    are never used in the child.
+
+    The .check_service() uses one more connection per bus, which keeps the
+    set of the names on the bus up to date."""
+
+    # timeout for dbus calls, in seconds
+    timeout = 2
+
+    # The open connections: bus -> (connection, lock). The locks make sure
+    # that only one thread at a time sends and receives messages on a
+    # connection.
+    _connections: Dict[str, Tuple[DBusConnection, threading.Lock]] = dict()
+    _connections_lock = threading.Lock()
+
+    def process(self, call: DbusMethodCall):
+        msg = _create_message(call)
+        bus = str(call.method.bus)
+        connection, lock, is_new = self._get_connection(bus)
+        may_retry = not is_new
+        while True:
+            try:
+                with lock:
+                    reply = _send_and_get_reply(connection, msg, self.timeout)
+                break
+            except TimeoutError:
+                # The connection itself is fine; the service just did not
+                # answer in time.
+                raise
+            except _NotSentError as exc:
+                self._drop_connection(bus, connection)
+                if not may_retry:
+                    raise exc.error from None
+                # A cached connection which has been closed (for example,
+                # because the dbus-daemon was restarted). Retry once with a
+                # new one.
+                connection, lock, _ = self._get_connection(bus)
+                may_retry = False
+            except OSError:
+                # The message may have been sent, and retrying could repeat
+                # the call.
+                self._drop_connection(bus, connection)
+                raise
+
+        resp = unwrap_msg(reply)
+        return resp
+
+    @classmethod
+    def close_connections(cls) -> None:
+        """Closes all the open connections. New connections are opened
+        automatically on the next call to .process()."""
+        with cls._connections_lock:
+            connections = list(cls._connections.values())
+            cls._connections.clear()
+
+        for connection, lock in connections:
+            with lock:
+                connection.close()
+        _stop_name_watchers()
+
+    @classmethod
+    def _forget_connections(cls) -> None:
+        """Used in the child process after a fork. Closes the copies of the
+        sockets of the parent process (this does not close the connections of
+        the parent), and starts with no connections."""
+        connections = list(cls._connections.values())
+        cls._connections = dict()
+        # The locks may have been held by threads which do not exist in the
+        # child.
+        cls._connections_lock = threading.Lock()
+        for connection, _ in connections:
+            try:
+                connection.close()
+            except OSError:
+                pass
+
+    def _get_connection(self, bus: str) -> Tuple[DBusConnection, threading.Lock, bool]:
+        """Returns (connection, lock, is_new) for the `bus`. The `is_new` is
+        True if the connection was just opened."""
+        with self._connections_lock:
+            if bus in self._connections:
+                return (*self._connections[bus], False)
+
+        # Opened without holding the lock, so that connecting to a slow bus
+        # does not block the calls to the other buses. If another thread
+        # opened a connection to the bus in the meantime, that one is used.
+        connection = self._open_connection(bus)
+        with self._connections_lock:
+            if bus in self._connections:
+                existing = self._connections[bus]
+            else:
+                lock = threading.Lock()
+                self._connections[bus] = (connection, lock)
+                return connection, lock, True
+        try:
+            connection.close()
+        except OSError:
+            pass
+        return (*existing, False)
+
+    def _drop_connection(self, bus: str, connection: DBusConnection) -> None:
+        with self._connections_lock:
+            if bus in self._connections and self._connections[bus][0] is connection:
+                del self._connections[bus]
+        try:
+            connection.close()
+        except OSError:
+            pass
+
+    def check_bus(self, bus: Optional[str | BusType]) -> Optional[str]:
+        bus = str(bus)
+        if bus in self._connections:
+            return None
+        reason = _get_bus_failure(bus)
+        if reason is not None:
+            return reason
+        try:
+            self._get_connection(bus)
+        except Exception as exc:
+            return _get_bus_failure(bus) or str(exc)
+        return None
+
+    def check_service(
+        self, bus: Optional[str | BusType], service: str
+    ) -> Optional[str]:
+        bus = str(bus)
+        try:
+            watcher = _get_name_watcher(bus)
+        except Exception as exc:
+            return _get_bus_failure(bus) or _get_name_listing_failure(bus) or str(exc)
+        return None if watcher.has_name(service) else _no_service(bus, service)
+
+    @staticmethod
+    def _open_connection(bus: str) -> DBusConnection:
+        address = _get_bus_address_or_raise(bus)
+        try:
+            return open_dbus_connection(bus=address)
+        except Exception as exc:
+            _record_bus_failure(bus, f"Could not connect to the {bus} bus: {exc}")
+            raise
+
+
+class AsyncJeepneyDbusAdapter(DbusAdapter):
+    """An implementation of DbusAdapter using the asyncio API of jeepney
+    (jeepney.io.asyncio). Meant to be used with the asynchronous API of the
+    wakepy Modes (`async with keep.running(...)`).
+
+    The connections (one per bus) are bound to the event loop which was
+    running when the adapter was created, and they are kept open until
+    .aclose() is called. The .process() method may be called from any thread
+    except the one running the event loop; it schedules the D-Bus call to the
+    event loop and waits for the reply. In coroutines, use .process_async().
+
+    Raises
+    ------
+    RuntimeError, if created when there is no running event loop.
+    """
 
     # timeout for dbus calls, in seconds
     timeout = 2
 
+    # Bound to the event loop running when created.
+    process_wide = False
+
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        # bus -> (connection, router)
+        self._routers: Dict[
+            str, Tuple[jeepney_asyncio.DBusConnection, jeepney_asyncio.DBusRouter]
+        ] = dict()
+        self._routers_lock = asyncio.Lock()
+
     def process(self, call: DbusMethodCall):
-        addr = DBusAddress(
-            object_path=call.method.path,
-            bus_name=call.method.service,
-            interface=call.method.interface,
+        if _get_running_loop() is self.loop:
+            raise RuntimeError(
+                "AsyncJeepneyDbusAdapter.process() would block the event loop! Use "
+                "process_async() in the event loop thread."
+            )
+        future = asyncio.run_coroutine_threadsafe(self.process_async(call), self.loop)
+        return future.result()
+
+    async def process_async(self, call: DbusMethodCall):
+        """Processes the `call` in the event loop. Like .process(), but a
+        coroutine."""
+        msg = _create_message(call)
+        bus = str(call.method.bus)
+        router, is_new = await self._get_router(bus)
+        try:
+            reply = await self._send_and_get_reply(router, msg)
+        except asyncio.TimeoutError:
+            raise
+        except (OSError, RouterClosed):
+            await self._drop_router(bus, router)
+            if is_new:
+                raise
+            # A cached connection which has been closed. Retry once with a new
+            # one.
+            router, _ = await self._get_router(bus)
+            reply = await self._send_and_get_reply(router, msg)
+
+        return unwrap_msg(reply)
+
+    def check_bus(self, bus: Optional[str | BusType]) -> Optional[str]:
+        # Opening a connection would need the event loop; only the buses
+        # known to be unreachable are reported.
+        return _get_bus_failure(str(bus))
+
+    def check_service(
+        self, bus: Optional[str | BusType], service: str
+    ) -> Optional[str]:
+        # Uses the names of the bus only if they are already watched (see
+        # JeepneyDbusAdapter.check_service).
+        bus = str(bus)
+        watcher = _name_watchers.get(bus)
+        if watcher is None or not watcher.running:
+            return _get_bus_failure(bus) or _get_name_listing_failure(bus)
+        return None if watcher.has_name(service) else _no_service(bus, service)
+
+    async def aclose(self) -> None:
+        """Closes all the open connections of the adapter. New connections are
+        opened automatically on the next call to .process()."""
+        async with self._routers_lock:
+            routers = [(bus, router) for bus, (_, router) in self._routers.items()]
+        for bus, router in routers:
+            await self._drop_router(bus, router)
+
+    async def _send_and_get_reply(
+        self, router: jeepney_asyncio.DBusRouter, msg: Message
+    ) -> Message:
+        return await asyncio.wait_for(
+            router.send_and_get_reply(msg), timeout=self.timeout
         )
 
-        msg = new_method_call(
-            addr,
-            method=call.method.name,
-            signature=call.method.signature,
-            body=call.args,
+    async def _get_router(self, bus: str) -> Tuple[jeepney_asyncio.DBusRouter, bool]:
+        """Returns (router, is_new) for the `bus`. The `is_new` is True if the
+        connection was just opened."""
+        async with self._routers_lock:
+            if bus in self._routers:
+                return self._routers[bus][1], False
+
+            address = _get_bus_address_or_raise(bus)
+            try:
+                connection = await jeepney_asyncio.open_dbus_connection(bus=address)
+            except Exception as exc:
+                _record_bus_failure(bus, f"Could not connect to the {bus} bus: {exc}")
+                raise
+            router = jeepney_asyncio.DBusRouter(connection)
+            self._routers[bus] = (connection, router)
+            return router, True
+
+    async def _drop_router(self, bus: str, router: jeepney_asyncio.DBusRouter) -> None:
+        async with self._routers_lock:
+            if bus not in self._routers or self._routers[bus][1] is not router:
+                return
+            connection, _ = self._routers.pop(bus)
+        try:
+            # Stops the task receiving messages. Raises the error of the task,
+            # if it has already stopped because of an error.
+            await router.__aexit__(None, None, None)
+        except Exception:
+            pass
+        try:
+            await connection.close()
+        except OSError:
+            pass
+
+
+register_after_fork_in_child(JeepneyDbusAdapter._forget_connections)
+
+
+class _NotSentError(Exception):
+    """Raised by _send_and_get_reply when the message could not be sent."""
+
+    def __init__(self, error: OSError):
+        super().__init__(error)
+        self.error = error
+
+
+def _send_and_get_reply(
+    connection: DBusConnection, msg: Message, timeout: float
+) -> Message:
+    """Like connection.send_and_get_reply(), but tells if the message was not
+    sent at all, as then it is safe to send it again.
+
+    Raises
+    ------
+    _NotSentError, if sending the message fails. OSError (or TimeoutError), if
+    receiving the reply fails.
+    """
+    serial = next(connection.outgoing_serial)
+    try:
+        connection.send(msg, serial=serial)
+    except OSError as exc:
+        raise _NotSentError(exc) from exc
+
+    deadline = time.monotonic() + timeout
+    while True:
+        reply = connection.receive(timeout=deadline - time.monotonic())
+        # The other messages (like signals) are not needed.
+        if reply.header.fields.get(HeaderFields.reply_serial) == serial:
+            return reply
+
+
+def _create_message(call: DbusMethodCall) -> Message:
+    addr = DBusAddress(
+        object_path=call.method.path,
+        bus_name=call.method.service,
+        interface=call.method.interface,
+    )
+
+    return new_method_call(
+        addr,
+        method=call.method.name,
+        signature=call.method.signature,
+        body=call.args,
+    )
+
+
+def _get_running_loop() -> asyncio.AbstractEventLoop | None:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def get_bus_address(bus: str) -> str:
+    """Returns the address of the `bus` (see DbusAddress.bus), which can be
+    passed to open_dbus_connection(). The address of the session bus is read
+    from the DBUS_SESSION_BUS_ADDRESS environment variable, or if it is not
+    set, the default location of the session bus, $XDG_RUNTIME_DIR/bus, is
+    used if it exists. Other buses are returned as is.
+
+    Raises
+    ------
+    DbusNotFoundError, if the address of the session bus is not found.
+    """
+    if bus != "SESSION":
+        return bus
+
+    address = os.environ.get("DBUS_SESSION_BUS_ADDRESS")
+    if address:
+        return address
+
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        path = os.path.join(runtime_dir, "bus")
+        if os.path.exists(path):
+            return f"unix:path={path}"
+
+    raise DbusNotFoundError(
+        "The session bus was not found! The environment variable "
+        "DBUS_SESSION_BUS_ADDRESS is not set, and there is no bus at "
+        "$XDG_RUNTIME_DIR/bus. To use dbus-based methods with jeepney, a session "
+        "(not system) bus (dbus-daemon process) must be running. To check if "
+        "you're running a session dbus-daemon, run `ps -x | grep dbus-daemon`"
+    )
+
+
+# The buses which could not be reached: bus -> (expires, reason). The expires
+# is a time.monotonic() timestamp.
+_bus_failures: Dict[str, Tuple[float, str]] = dict()
+# The buses on which the names could not be listed (see _BusNameWatcher), for
+# example because the ListNames call failed or timed out: bus -> (expires,
+# reason).
+_name_listing_failures: Dict[str, Tuple[float, str]] = dict()
+
+
+def _get_bus_failure(bus: str) -> Optional[str]:
+    """The reason why the `bus` could not be reached, if it failed within
+    FAILED_BUS_TTL seconds. None otherwise."""
+    return _get_failure(_bus_failures, bus)
+
+
+def _record_bus_failure(bus: str, reason: str) -> None:
+    _bus_failures[bus] = (time.monotonic() + FAILED_BUS_TTL, reason)
+
+
+def _get_name_listing_failure(bus: str) -> Optional[str]:
+    """The reason why the names on the `bus` could not be listed, if it failed
+    within FAILED_BUS_TTL seconds. None otherwise."""
+    return _get_failure(_name_listing_failures, bus)
+
+
+def _record_name_listing_failure(bus: str, reason: str) -> None:
+    _name_listing_failures[bus] = (time.monotonic() + FAILED_BUS_TTL, reason)
+
+
+def _get_failure(failures: Dict[str, Tuple[float, str]], bus: str) -> Optional[str]:
+    failure = failures.get(bus)
+    if failure is None:
+        return None
+    expires, reason = failure
+    if time.monotonic() >= expires:
+        failures.pop(bus, None)
+        return None
+    return reason
+
+
+def _get_bus_address_or_raise(bus: str) -> str:
+    """Like get_bus_address(), but fails fast (without looking for the bus
+    again) if the bus could not be reached recently, and remembers the
+    failures."""
+    reason = _get_bus_failure(bus)
+    if reason is not None:
+        raise DbusNotFoundError(reason)
+    try:
+        return get_bus_address(bus)
+    except DbusNotFoundError as exc:
+        _record_bus_failure(bus, str(exc))
+        raise
+
+
+def _forget_bus_failures() -> None:
+    # The child process may have a different environment.
+    _bus_failures.clear()
+    _name_listing_failures.clear()
+
+
+register_after_fork_in_child(_forget_bus_failures)
+
+
+_NAME_OWNER_CHANGED = MatchRule(
+    type="signal",
+    sender="org.freedesktop.DBus",
+    interface="org.freedesktop.DBus",
+    member="NameOwnerChanged",
+    path="/org/freedesktop/DBus",
+)
+
+
+class _BusNameWatcher:
+    """Keeps the set of the names owned on a bus up to date. The names are
+    listed once (ListNames), and the changes are received as NameOwnerChanged
+    signals in a background thread, on a connection of its own. The names of
+    the services which the bus can start on demand (ListActivatableNames) are
+    listed once.
+
+    Raises
+    ------
+    Any exception raised when connecting to the bus or listing the names. The
+    failures to list the names (for example, timeouts) are remembered for
+    FAILED_BUS_TTL seconds, like the failures to connect to the bus.
+    """
+
+    def __init__(self, bus: str):
+        self.bus = bus
+        self.names: Set[str] = set()
+        self.activatable_names: FrozenSet[str] = frozenset()
+        self.running = False
+        self.connection = JeepneyDbusAdapter._open_connection(bus)
+        try:
+            self._signals = self._list_names()
+        except Exception as exc:
+            self.connection.close()
+            _record_name_listing_failure(
+                bus, f"Could not list the names on the {bus} bus: {exc!r}"
+            )
+            raise
+        except BaseException:
+            self.connection.close()
+            raise
+        self.running = True
+        self._thread = threading.Thread(
+            target=self._run, name="wakepy-dbus-names", daemon=True
         )
+        self._thread.start()
+
+    def has_name(self, name: str) -> bool:
+        return name in self.names or name in self.activatable_names
+
+    def stop(self) -> None:
+        self.running = False
         try:
-            connection = open_dbus_connection(bus=call.method.bus)
-        except KeyError as exc:
-            if "DBUS_SESSION_BUS_ADDRESS" in str(exc):
-                raise DbusNotFoundError(
-                    "The environment variable DBUS_SESSION_BUS_ADDRESS is not set! "
-                    "To use dbus-based methods with jeepney, a session (not system) "
-                    "bus (dbus-daemon process) must be running, and the address of the "
-                    "bus should be available at the DBUS_SESSION_BUS_ADDRESS "
-                    "environment variable. To check if you're running a session "
-                    "dbus-daemon, run `ps -x | grep dbus-daemon`"
-                ) from exc
-        reply = connection.send_and_get_reply(msg, timeout=self.timeout)
-        resp = unwrap_msg(reply)
-        return resp
+            # Wakes up the thread waiting for the signals.
+            self.connection.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.connection.close()
+
+    def _list_names(self) -> Deque[Message]:
+        proxy = Proxy(message_bus, self.connection, timeout=JeepneyDbusAdapter.timeout)
+        # Subscribe first, so that no change is missed. The signals received
+        # before the names are listed are applied on top of the listed names;
+        # this gives the same result, as they are applied in order.
+        signals: Deque[Message] = deque()
+        self.connection.filter(_NAME_OWNER_CHANGED, queue=signals)
+        proxy.AddMatch(_NAME_OWNER_CHANGED)
+        self.names = set(proxy.ListNames()[0])
+        self.activatable_names = frozenset(proxy.ListActivatableNames()[0])
+        while signals:
+            self._apply(signals.popleft())
+        return signals
+
+    def _apply(self, signal: Message) -> None:
+        name, _, new_owner = signal.body
+        if new_owner:
+            self.names.add(name)
+        else:
+            self.names.discard(name)
+
+    def _run(self) -> None:
+        try:
+            while self.running:
+                self._apply(self.connection.recv_until_filtered(self._signals))
+        except Exception:
+            # The connection was closed, or it broke. A new watcher is started
+            # on the next check.
+            pass
+        finally:
+            self.running = False
+
+
+# The watchers of the names on the buses: bus -> _BusNameWatcher.
+_name_watchers: Dict[str, _BusNameWatcher] = dict()
+_name_watchers_lock = threading.Lock()
+
+
+def _get_name_watcher(bus: str) -> _BusNameWatcher:
+    watcher = _name_watchers.get(bus)
+    if watcher is not None and watcher.running:
+        return watcher
+
+    with _name_watchers_lock:
+        watcher = _name_watchers.get(bus)
+        if watcher is None or not watcher.running:
+            reason = _get_name_listing_failure(bus)
+            if reason is not None:
+                raise DbusNotFoundError(reason)
+            watcher = _BusNameWatcher(bus)
+            _name_watchers[bus] = watcher
+        return watcher
+
+
+def _no_service(bus: str, service: str) -> str:
+    return f'The D-Bus service "{service}" is not available on the {bus} bus'
+
+
+def _stop_name_watchers() -> None:
+    with _name_watchers_lock:
+        watchers = list(_name_watchers.values())
+        _name_watchers.clear()
+    for watcher in watchers:
+        watcher.stop()
+
+
+def _forget_name_watchers() -> None:
+    # The threads of the watchers do not exist in the child. Close only the
+    # copies of the sockets; shutdown() would break the connections of the
+    # parent process.
+    global _name_watchers_lock
+    watchers = list(_name_watchers.values())
+    _name_watchers.clear()
+    _name_watchers_lock = threading.Lock()
+    for watcher in watchers:
+        watcher.running = False
+        try:
+            watcher.connection.close()
+        except OSError:
+            pass
+
+
+register_after_fork_in_child(_forget_name_watchers)
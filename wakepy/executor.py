@@ -0,0 +1,200 @@
+"""This module contains the KeepRunningExecutor, which wraps a
+concurrent.futures Executor (for example, a ThreadPoolExecutor or a
+ProcessPoolExecutor) and keeps a wakepy mode active while the Executor has
+work to do. Instead of entering the mode for every task, the mode is entered
+once when the first task is submitted to an idle Executor, and exited when the
+last pending or running task has finished. The mode is entered and exited in
+a background thread of the Executor.
+"""
+
+from __future__ import annotations
+
+import threading
+import typing
+import warnings
+from concurrent.futures import Executor
+from typing import TypeVar
+
+from .core.method import MethodError
+from .modes import keep
+
+if typing.TYPE_CHECKING:
+    from concurrent.futures import Future
+    from typing import Any, Callable, Optional, Tuple
+
+    from .core.mode import Mode
+
+T = TypeVar("T")
+
+
+class KeepRunningExecutor(Executor):
+    """An Executor which submits the tasks to the `executor` it wraps, and
+    keeps a mode active while there are pending or running tasks. Thread-safe.
+
+    The mode is entered and exited in a background thread (named
+    "wakepy-executor"), which is started on the first task. Both calls are
+    made in the same thread, which stays alive until the Executor is shut
+    down; this is required by the Methods bound to the thread which entered
+    the mode (see Method.thread_bound). The .submit() waits until the mode
+    has been entered, if the Executor was idle, so the mode is active when the
+    task runs. The mode is exited when the last task has finished. So, the
+    mode is entered and exited once per busy period, no matter how many tasks
+    there are.
+
+    Example
+    -------
+    ```
+    with KeepRunningExecutor(ThreadPoolExecutor()) as executor:
+        results = list(executor.map(process, items))
+    ```
+
+    Attributes
+    ----------
+    executor: Executor
+        The wrapped Executor, which runs the tasks.
+    mode: Mode | None
+        The active mode, if there are pending or running tasks. None
+        otherwise.
+    n_pending: int
+        The number of the tasks which are pending or running.
+    """
+
+    def __init__(self, executor: Executor, mode: Callable[[], Mode] = keep.running):
+        """
+        Parameters
+        ----------
+        executor:
+            The Executor to run the tasks with. Shut down when this Executor
+            is shut down.
+        mode:
+            A callable which returns a new Mode, called each time the mode is
+            entered. Default: keep.running. To use other options, use for
+            example functools.partial(keep.running, on_fail="warn"). If the
+            mode fails to activate and its `on_fail` is "error" (the default),
+            .submit() raises ActivationError and the task is not submitted.
+        """
+        self.executor = executor
+        self.mode_factory = mode
+        self.mode: Optional[Mode] = None
+        self.n_pending = 0
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        # One of: "idle", "entering", "active", "exiting"
+        self._state = "idle"
+        # The number of the finished attempts to enter the mode, and the
+        # error of the latest one.
+        self._n_entries = 0
+        self._enter_error: Optional[BaseException] = None
+        self._closed = False
+        self._worker: Optional[threading.Thread] = None
+
+    def submit(self, __fn: Callable[..., T], *args: Any, **kwargs: Any) -> Future[T]:
+        """Submits __fn(*args, **kwargs) to the wrapped executor. Waits until
+        the mode has been entered first, if there are no other pending or
+        running tasks."""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+            # Counted already while waiting, so that the mode is not exited
+            # before the task is submitted.
+            self.n_pending += 1
+            try:
+                self._wait_until_active()
+            except BaseException:
+                self.n_pending -= 1
+                self._cond.notify_all()
+                raise
+
+        try:
+            future = self.executor.submit(__fn, *args, **kwargs)
+        except BaseException:
+            self._task_done()
+            raise
+        future.add_done_callback(self._on_future_done)
+        return future
+
+    def shutdown(self, wait: bool = True, **kwargs: Any) -> None:
+        """Shuts down the wrapped executor. If `wait` is True, waits for all
+        the tasks to finish and for the mode to be exited."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self.executor.shutdown(wait=wait, **kwargs)
+        worker = self._worker
+        if wait and worker is not None and worker is not threading.current_thread():
+            worker.join()
+
+    def _wait_until_active(self) -> None:
+        """Waits until the mode has been entered. Raises the error of entering
+        the mode, if entering fails. Call with the condition held."""
+        while self._state != "active":
+            if self._state == "idle":
+                self._state = "entering"
+                if self._worker is None:
+                    self._start_worker()
+                self._cond.notify_all()
+            if self._state == "entering":
+                n_entries = self._n_entries
+                self._cond.wait_for(lambda: self._n_entries != n_entries)
+                if self._state != "active":
+                    assert self._enter_error is not None
+                    raise self._enter_error
+            else:
+                self._cond.wait_for(lambda: self._state != "exiting")
+
+    def _start_worker(self) -> None:
+        self._worker = threading.Thread(
+            target=self._run, name="wakepy-executor", daemon=True
+        )
+        self._worker.start()
+
+    def _run(self) -> None:
+        cond = self._cond
+        while True:
+            with cond:
+                cond.wait_for(lambda: self._state == "entering" or self._closed)
+                if self._state != "entering":
+                    return
+            mode, error = self._enter_mode()
+            with cond:
+                self._n_entries += 1
+                self._enter_error = error
+                if mode is None:
+                    self._state = "idle"
+                    cond.notify_all()
+                    continue
+                self.mode = mode
+                self._state = "active"
+                cond.notify_all()
+                cond.wait_for(lambda: self.n_pending == 0)
+                self._state = "exiting"
+                self.mode = None
+            self._exit_mode(mode)
+            with cond:
+                self._state = "idle"
+                cond.notify_all()
+
+    def _enter_mode(self) -> Tuple[Optional[Mode], Optional[BaseException]]:
+        mode = self.mode_factory()
+        try:
+            mode.__enter__()
+        except BaseException as exc:
+            return None, exc
+        return mode, None
+
+    @staticmethod
+    def _exit_mode(mode: Mode) -> None:
+        try:
+            mode.__exit__(None, None, None)
+        except MethodError as exc:
+            # Raised in the background thread; there is nobody to catch it.
+            warnings.warn(f"Could not exit the mode: {exc}")
+
+    def _on_future_done(self, future: Future[Any]) -> None:
+        self._task_done()
+
+    def _task_done(self) -> None:
+        with self._cond:
+            self.n_pending -= 1
+            if self.n_pending == 0:
+                self._cond.notify_all()
@@ -0,0 +1,12 @@
+"""Integrations of wakepy with other frameworks. The integrations do not need
+any extra dependencies.
+
+wakepy.integrations.asgi
+    ASGI middleware which keeps the system running while requests are in
+    flight.
+wakepy.integrations.wsgi
+    WSGI middleware which keeps the system running while requests are in
+    flight.
+"""
+
+from .inflight import InFlightTracker as InFlightTracker
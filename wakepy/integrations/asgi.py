@@ -0,0 +1,86 @@
+"""ASGI middleware which keeps the system running while requests are being
+processed. Usage (with any ASGI framework, for example Starlette):
+
+    from wakepy.integrations.asgi import KeepRunningMiddleware
+
+    app = KeepRunningMiddleware(app, grace_period=60)
+
+The keep.running mode is entered when a request starts and there were no
+requests in flight, and exited when there have been no requests in flight for
+`grace_period` seconds. The mode is entered and exited in a background thread;
+on the request path, the middleware only updates a counter. The mode is exited
+when the server shuts down (at the ASGI lifespan shutdown), if the server
+supports the lifespan protocol.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import typing
+
+from .inflight import DEFAULT_GRACE_PERIOD, InFlightTracker
+
+if typing.TYPE_CHECKING:
+    from typing import Any, Awaitable, Callable, MutableMapping
+
+    Scope = MutableMapping[str, Any]
+    Message = MutableMapping[str, Any]
+    Receive = Callable[[], Awaitable[Message]]
+    Send = Callable[[Message], Awaitable[None]]
+    ASGIApp = Callable[[Scope, Receive, Send], Awaitable[None]]
+
+# The types of the connections counted as requests.
+REQUEST_SCOPE_TYPES = ("http", "websocket")
+
+
+class KeepRunningMiddleware:
+    """ASGI middleware which keeps the keep.running mode active while there
+    are requests (HTTP requests or WebSocket connections) in flight.
+
+    Attributes
+    ----------
+    app:
+        The wrapped ASGI application.
+    tracker: InFlightTracker
+        Counts the requests in flight, and enters and exits the mode.
+    """
+
+    def __init__(
+        self, app: ASGIApp, grace_period: float = DEFAULT_GRACE_PERIOD, **mode_kwargs
+    ):
+        """
+        Parameters
+        ----------
+        app:
+            The ASGI application to wrap.
+        grace_period:
+            The time (in seconds) to keep the mode active after the last
+            request has finished. Default: 30 seconds.
+        **mode_kwargs:
+            Passed to keep.running(). The `on_fail` defaults to "warn".
+        """
+        self.app = app
+        self.tracker = InFlightTracker(grace_period=grace_period, **mode_kwargs)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] in REQUEST_SCOPE_TYPES:
+            tracker = self.tracker
+            tracker.request_started()
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                tracker.request_finished()
+        elif scope["type"] == "lifespan":
+            await self.app(scope, receive, self._wrap_lifespan_send(send))
+        else:
+            await self.app(scope, receive, send)
+
+    def _wrap_lifespan_send(self, send: Send) -> Send:
+        async def lifespan_send(message: Message) -> None:
+            if message["type"] == "lifespan.shutdown.complete":
+                # Exiting the mode may block (D-Bus calls).
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(None, self.tracker.close)
+            await send(message)
+
+        return lifespan_send
@@ -0,0 +1,184 @@
+"""This module contains the InFlightTracker, which keeps the keep.running mode
+active while there is work in flight (for example, requests being served by a
+web server), and lets the system sleep when it is idle.
+
+The requests only increment and decrement a counter; the mode is entered and
+exited in a background thread, so that the D-Bus calls (or any other work
+of the Methods) never run on the request path.
+"""
+
+from __future__ import annotations
+
+import threading
+import typing
+import warnings
+import weakref
+
+from ..core.fork import register_after_fork_in_child
+from ..modes import keep
+
+if typing.TYPE_CHECKING:
+    from typing import Any, Dict, Optional
+
+    from ..core.mode import Mode
+
+DEFAULT_GRACE_PERIOD = 30.0
+"""The default time (in seconds) to keep the mode active after the last
+request has finished."""
+
+
+class InFlightTracker:
+    """Counts the requests in flight and keeps the keep.running mode active
+    while there are any. The mode is entered when the count goes from 0 to 1,
+    and exited when the count has been 0 for `grace_period` seconds. Thread-
+    safe.
+
+    The mode is entered and exited in a background thread (named
+    "wakepy-inflight"), which is started on the first request. The failures to
+    enter or exit the mode are issued as warnings.
+
+    Attributes
+    ----------
+    grace_period: float
+        The time (in seconds) to keep the mode active after the last request
+        has finished.
+    mode: Mode | None
+        The keep.running mode, if it has been entered. None otherwise.
+    """
+
+    # These are set in _reset()
+    _n_in_flight: int
+    _closed: bool
+    _lock: threading.Lock
+    _cond: threading.Condition
+    _worker: Optional[threading.Thread]
+
+    def __init__(self, grace_period: float = DEFAULT_GRACE_PERIOD, **mode_kwargs: Any):
+        """
+        Parameters
+        ----------
+        grace_period:
+            The time (in seconds) to keep the mode active after the last
+            request has finished. If a new request starts within that time,
+            the mode is kept active as is. Default: 30 seconds.
+        **mode_kwargs:
+            Passed to keep.running(). The `on_fail` defaults to "warn".
+        """
+        if grace_period < 0:
+            raise ValueError(
+                f"grace_period must be a non-negative number! Got: {grace_period}"
+            )
+        self.grace_period = grace_period
+        self.mode_kwargs: Dict[str, Any] = {"on_fail": "warn", **mode_kwargs}
+        self.mode: Optional[Mode] = None
+        self._reset()
+        _trackers.add(self)
+
+    @property
+    def n_in_flight(self) -> int:
+        """The number of the requests in flight."""
+        return self._n_in_flight
+
+    @property
+    def active(self) -> bool:
+        """True if the mode is active."""
+        mode = self.mode
+        return mode is not None and mode.active
+
+    def request_started(self) -> None:
+        """Call when a request starts. Must be followed by a call to
+        request_finished()."""
+        with self._lock:
+            self._n_in_flight += 1
+            if self._n_in_flight == 1:
+                if self._worker is None:
+                    self._start_worker()
+                self._cond.notify()
+
+    def request_finished(self) -> None:
+        """Call when a request has finished."""
+        with self._lock:
+            self._n_in_flight -= 1
+            if self._n_in_flight == 0:
+                self._cond.notify()
+
+    def close(self) -> None:
+        """Exits the mode (if active) and stops the background thread. The
+        requests started after this are still counted, but the mode is not
+        entered anymore."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+            worker = self._worker
+        if worker is not None and worker is not threading.current_thread():
+            worker.join()
+
+    def _reset(self) -> None:
+        self._n_in_flight = 0
+        self._closed = False
+        # The requests take only the lock (which is faster than entering the
+        # condition), and notify the background thread on the transitions.
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._worker = None
+
+    def _start_worker(self) -> None:
+        if self._closed:
+            return
+        self._worker = threading.Thread(
+            target=self._run, name="wakepy-inflight", daemon=True
+        )
+        self._worker.start()
+
+    def _run(self) -> None:
+        cond = self._cond
+        while True:
+            with cond:
+                cond.wait_for(lambda: self._n_in_flight > 0 or self._closed)
+                if self._closed:
+                    return
+            self._enter_mode()
+            with cond:
+                while not self._closed:
+                    cond.wait_for(lambda: self._n_in_flight == 0 or self._closed)
+                    # Idle. Wait for the grace period, unless the requests
+                    # start again.
+                    busy = cond.wait_for(
+                        lambda: self._n_in_flight > 0 or self._closed,
+                        timeout=self.grace_period,
+                    )
+                    if not busy:
+                        break
+            self._exit_mode()
+
+    def _enter_mode(self) -> None:
+        mode = keep.running(**self.mode_kwargs)
+        try:
+            mode.__enter__()
+        except Exception as exc:
+            warnings.warn(f"Could not enter the keep.running mode: {exc}")
+        self.mode = mode
+
+    def _exit_mode(self) -> None:
+        mode, self.mode = self.mode, None
+        if mode is None:
+            return
+        try:
+            mode.__exit__(None, None, None)
+        except Exception as exc:
+            warnings.warn(f"Could not exit the keep.running mode: {exc}")
+
+
+_trackers: weakref.WeakSet[InFlightTracker] = weakref.WeakSet()
+
+
+def _reset_trackers_after_fork() -> None:
+    # The background threads (and the requests in flight) of the parent
+    # process do not exist in the child. The modes of the parent are not
+    # exited in the child.
+    for tracker in list(_trackers):
+        tracker.mode = None
+        tracker._reset()
+
+
+register_after_fork_in_child(_reset_trackers_after_fork)
@@ -0,0 +1,90 @@
+"""WSGI middleware which keeps the system running while requests are being
+processed. Usage (with any WSGI framework, for example Flask):
+
+    from wakepy.integrations.wsgi import KeepRunningMiddleware
+
+    app.wsgi_app = KeepRunningMiddleware(app.wsgi_app, grace_period=60)
+
+The keep.running mode is entered when a request starts and there were no
+requests in flight, and exited when there have been no requests in flight for
+`grace_period` seconds. The mode is entered and exited in a background thread;
+on the request path, the middleware only updates a counter. A request is in
+flight until the server has sent the whole response (closed the response
+iterable).
+"""
+
+from __future__ import annotations
+
+import typing
+
+from .inflight import DEFAULT_GRACE_PERIOD, InFlightTracker
+
+if typing.TYPE_CHECKING:
+    from typing import Any, Callable, Dict, Iterable, Iterator
+
+    WSGIApp = Callable[[Dict[str, Any], Callable[..., Any]], Iterable[bytes]]
+
+
+class KeepRunningMiddleware:
+    """WSGI middleware which keeps the keep.running mode active while there
+    are requests in flight.
+
+    Attributes
+    ----------
+    app:
+        The wrapped WSGI application.
+    tracker: InFlightTracker
+        Counts the requests in flight, and enters and exits the mode.
+    """
+
+    def __init__(
+        self, app: WSGIApp, grace_period: float = DEFAULT_GRACE_PERIOD, **mode_kwargs
+    ):
+        """
+        Parameters
+        ----------
+        app:
+            The WSGI application to wrap.
+        grace_period:
+            The time (in seconds) to keep the mode active after the last
+            request has finished. Default: 30 seconds.
+        **mode_kwargs:
+            Passed to keep.running(). The `on_fail` defaults to "warn".
+        """
+        self.app = app
+        self.tracker = InFlightTracker(grace_period=grace_period, **mode_kwargs)
+
+    def __call__(
+        self, environ: Dict[str, Any], start_response: Callable[..., Any]
+    ) -> Iterable[bytes]:
+        tracker = self.tracker
+        tracker.request_started()
+        try:
+            response = self.app(environ, start_response)
+        except BaseException:
+            tracker.request_finished()
+            raise
+        return _ClosingResponse(response, tracker)
+
+
+class _ClosingResponse:
+    """Wraps the response iterable of the application. The request is
+    finished when the server closes the response (see PEP 3333)."""
+
+    def __init__(self, response: Iterable[bytes], tracker: InFlightTracker):
+        self._response = response
+        self._tracker = tracker
+        self._finished = False
+
+    def __iter__(self) -> Iterator[bytes]:
+        return iter(self._response)
+
+    def close(self) -> None:
+        try:
+            close = getattr(self._response, "close", None)
+            if close is not None:
+                close()
+        finally:
+            if not self._finished:
+                self._finished = True
+                self._tracker.request_finished()
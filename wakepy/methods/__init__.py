@@ -29,5 +29,6 @@ Examples
 from . import freedesktop as freedesktop
 from . import gnome as gnome
 from . import macos as macos
+from . import wakepyd as wakepyd
 from . import windows as windows
 from . import wsl as wsl
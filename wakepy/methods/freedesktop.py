@@ -22,6 +22,9 @@ class FreedesktopScreenSaverInhibit(Method):
     name = "org.freedesktop.ScreenSaver"
     mode = ModeName.KEEP_PRESENTING
 
+    dbus_bus = BusType.SESSION
+    dbus_service = "org.freedesktop.ScreenSaver"
+
     screen_saver = DbusAddress(
         bus=BusType.SESSION,
         service="org.freedesktop.ScreenSaver",
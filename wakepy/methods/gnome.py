@@ -30,6 +30,9 @@ class _GnomeSessionManager(Method, ABC):
     https://lira.no-ip.org:8443/doc/gnome-session/dbus/gnome-session.html#org.gnome.SessionManager.Inhibit
     """
 
+    dbus_bus = BusType.SESSION
+    dbus_service = "org.gnome.SessionManager"
+
     session_manager = DbusAddress(
         bus=BusType.SESSION,
         service="org.gnome.SessionManager",
@@ -0,0 +1,108 @@
+"""The Methods using the wakepy daemon (see wakepy/daemon.py). The daemon holds
+the real inhibitors, and these Methods just acquire a lease from it over a Unix
+socket; no D-Bus connection is needed in the client process.
+
+These Methods are not prioritized over the other Methods automatically. To
+use the daemon whenever it is running, put "wakepyd" first in the
+`methods_priority`, like: keep.running(methods_priority=["wakepyd", "*"]).
+"""
+
+from __future__ import annotations
+
+import socket
+import typing
+from abc import ABC
+
+from wakepy.core import Method, ModeName, PlatformName
+from wakepy.daemon import RESPONSE_OK, WAKEPYD_METHOD_NAME, get_daemon_socket_path
+
+if typing.TYPE_CHECKING:
+    from typing import BinaryIO, Optional
+
+
+class _WakepyDaemon(Method, ABC):
+    """Method which acquires a lease for the mode from the wakepy daemon. The
+    connection to the daemon is kept open while the mode is active; if the
+    process exits without exiting the mode, the daemon releases the lease when
+    the connection is closed."""
+
+    supported_platforms = (PlatformName.LINUX,)
+
+    # timeout for the requests to the daemon, in seconds
+    timeout = 5
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lease_id: Optional[str] = None
+        self._socket: Optional[socket.socket] = None
+        self._file: Optional[BinaryIO] = None
+
+    def caniuse(self) -> bool | None | str:
+        socket_path = get_daemon_socket_path()
+        if socket_path is None:
+            return "XDG_RUNTIME_DIR is not set"
+        if not socket_path.exists():
+            return f"The wakepy daemon is not running (no socket at {socket_path})"
+        return True
+
+    def enter_mode(self):
+        socket_path = get_daemon_socket_path()
+        if socket_path is None:
+            raise RuntimeError("XDG_RUNTIME_DIR is not set")
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(self.timeout)
+            sock.connect(str(socket_path))
+            self._socket = sock
+            self._file = sock.makefile("rb")
+            self.lease_id = self._request(f"ACQUIRE {self.mode}")
+        except BaseException:
+            self._close()
+            raise
+
+    def exit_mode(self):
+        if self._socket is None:
+            # Nothing to exit from.
+            return
+        try:
+            self._request(f"RELEASE {self.lease_id}")
+        finally:
+            self._close()
+
+    def _request(self, request: str) -> str:
+        """Sends the `request` to the daemon and returns the value of the
+        response.
+
+        Raises
+        ------
+        RuntimeError, if the daemon responds with an error or closes the
+        connection."""
+        assert self._socket is not None and self._file is not None
+        self._socket.sendall(f"{request}\n".encode("utf-8"))
+        response = self._file.readline().decode("utf-8").strip()
+        if not response:
+            raise RuntimeError("The wakepy daemon closed the connection")
+        status, _, value = response.partition(" ")
+        if status != RESPONSE_OK:
+            raise RuntimeError(f"The wakepy daemon responded: {response}")
+        return value
+
+    def _close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        if self._socket is not None:
+            self._socket.close()
+        self._file = None
+        self._socket = None
+        self.lease_id = None
+
+
+class WakepyDaemonKeepRunning(_WakepyDaemon):
+    name = WAKEPYD_METHOD_NAME
+    mode = ModeName.KEEP_RUNNING
+
+
+class WakepyDaemonKeepPresenting(_WakepyDaemon):
+    name = WAKEPYD_METHOD_NAME
+    mode = ModeName.KEEP_PRESENTING
@@ -28,6 +28,9 @@ class WindowsSetThreadExecutionState(Method, ABC):
     # Server 2003 and above (server)
     supported_platforms = (PlatformName.WINDOWS,)
 
+    # The flags are set for the calling thread only.
+    thread_bound = True
+
     def enter_mode(self):
         # Sets the flags until Flags.RELEASE is used or until the thread
         # which called this dies.
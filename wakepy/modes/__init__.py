@@ -0,0 +1 @@
+from .combine import combined as combined
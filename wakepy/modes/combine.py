@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import typing
+
+from ..core.mode import CombinedMode
+
+if typing.TYPE_CHECKING:
+    from typing import Optional, Type
+
+    from ..core.dbus import DbusAdapter, DbusAdapterTypeSeq
+    from ..core.mode import Mode, OnFail
+
+
+def combined(
+    *modes: Mode,
+    name: Optional[str] = None,
+    on_fail: OnFail = "error",
+    dbus_adapter: Type[DbusAdapter] | DbusAdapterTypeSeq | None = None,
+) -> CombinedMode:
+    """Combine multiple wakepy modes into one context manager, which activates
+    all of the modes when entered, and deactivates them (in reverse order)
+    when exited.
+
+    Usage
+    -----
+
+    ```
+    with combined(keep.running(), keep.presenting()) as m:
+        # do something that takes a long time.
+    ```
+
+    Parameters
+    ----------
+    *modes:
+        The modes to combine, like keep.running() and keep.presenting(). The
+        modes are activated in the given order.
+    name:
+        The name of the combined mode. Used for communication to user, logging
+        and in error messages. By default, created from the names of the
+        `modes`.
+    on_fail:
+        Determines what to do in case activating any of the modes fails.
+        Valid options are: "error", "warn", "pass" and a callable. If the
+        option is "error", deactivates the modes which were activated and
+        raises wakepy.ActivationError. Is selected "warn", issues warning. If
+        "pass", does nothing. If `on_fail` is a callable, it must take one
+        positional argument: result, which is an instance of
+        CombinedActivationResult. The `on_fail` settings of the `modes` are
+        not used.
+    dbus_adapter:
+        Optional argument which can be used to define a customer DBus adapter.
+        The same adapter instance is used for all the modes (the `dbus_adapter`
+        settings of the `modes` are not used).
+
+    Returns
+    -------
+    combined_mode: CombinedMode
+        The context manager for the combined modes.
+    """
+    return CombinedMode(modes, name=name, on_fail=on_fail, dbus_adapter=dbus_adapter)
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import typing
 
+from ..core.activation import ActivationStrategy
 from ..core.constants import ModeName
 from ..core.mode import create_mode
 
@@ -20,6 +21,15 @@ def running(
     methods_priority: Optional[MethodsPriorityOrder] = None,
     on_fail: OnFail = "error",
     dbus_adapter: Type[DbusAdapter] | DbusAdapterTypeSeq | None = None,
+    strategy: ActivationStrategy | str = ActivationStrategy.SEQUENTIAL,
+    use_cache: bool = False,
+    timing: bool = False,
+    activation_timeout: Optional[float] = None,
+    method_timeout: Optional[float] = None,
+    shared: bool = False,
+    linger: Optional[float] = None,
+    blocking: bool = True,
+    interprocess: bool = False,
 ) -> Mode:
     """Create a wakepy mode (a context manager) for keeping programs running.
 
@@ -83,6 +93,49 @@ def running(
         activation process.
     dbus_adapter:
         Optional argument which can be used to define a customer DBus adapter.
+    strategy:
+        The activation strategy. If "sequential" (the default), the Methods
+        are tried one by one, in priority order. If "parallel-probe", the
+        requirements of all the candidate Methods are checked at the same time
+        in a thread pool, and the Methods are then tried in priority order. If
+        "race", a few of the highest priority Methods are activated at the same
+        time; the highest priority one which succeeds is kept and the others
+        are rolled back.
+    use_cache:
+        If True, uses an on-disk cache (under $XDG_CACHE_HOME/wakepy) for
+        remembering which Method was used successfully the last time in the
+        same environment. That Method is then tried first. Default: False.
+    timing:
+        If True, the durations of the activation stages of each Method and the
+        total activation time are recorded into the activation result. See
+        ActivationResult.list_methods(). Default: False.
+    activation_timeout:
+        The maximum total time (in seconds) to spend in activating the mode.
+        When the time runs out, the activation fails. Optional.
+    method_timeout:
+        The maximum time (in seconds) to spend with a single Method. A Method
+        which does not finish in time is recorded as timed out, and the next
+        Method is tried. Optional.
+    shared:
+        If True, the activation is shared with the other shared modes of the
+        process with the same settings; the first one to enter activates the
+        mode, and the last one to exit deactivates it. Useful if many threads
+        enter the mode at the same time. Default: False.
+    linger:
+        If given, exiting the mode is deferred by `linger` seconds, and if
+        the mode is entered again within that time, the active Method is
+        reused. Useful when entering the mode in a loop. Optional.
+    blocking:
+        If True (the default), entering the mode waits for the activation to
+        finish. If False, the mode is activated in a background thread and
+        the with block starts right away; see Mode.activation_future. Exiting
+        the mode waits for an unfinished activation and rolls it back.
+    interprocess:
+        If True, the mode is coordinated between the processes of the user
+        (for example, the workers of a multiprocessing pool) which use the
+        mode with interprocess=True: Only one of them holds the real
+        inhibitor at a time, and another one takes over when it exits. Uses
+        lock files under $XDG_RUNTIME_DIR/wakepy. Default: False.
 
     Returns
     -------
@@ -97,6 +150,15 @@ def running(
         methods_priority=methods_priority,
         on_fail=on_fail,
         dbus_adapter=dbus_adapter,
+        strategy=strategy,
+        use_cache=use_cache,
+        timing=timing,
+        activation_timeout=activation_timeout,
+        method_timeout=method_timeout,
+        shared=shared,
+        linger=linger,
+        blocking=blocking,
+        interprocess=interprocess,
     )
 
 
@@ -106,6 +168,15 @@ def presenting(
     methods_priority: Optional[MethodsPriorityOrder] = None,
     on_fail: OnFail = "error",
     dbus_adapter: Type[DbusAdapter] | DbusAdapterTypeSeq | None = None,
+    strategy: ActivationStrategy | str = ActivationStrategy.SEQUENTIAL,
+    use_cache: bool = False,
+    timing: bool = False,
+    activation_timeout: Optional[float] = None,
+    method_timeout: Optional[float] = None,
+    shared: bool = False,
+    linger: Optional[float] = None,
+    blocking: bool = True,
+    interprocess: bool = False,
 ) -> Mode:
     """Create a wakepy mode (a context manager) for keeping a system running
     and showing content.
@@ -155,6 +226,49 @@ def presenting(
         activation process.
     dbus_adapter:
         Optional argument which can be used to define a customer DBus adapter.
+    strategy:
+        The activation strategy. If "sequential" (the default), the Methods
+        are tried one by one, in priority order. If "parallel-probe", the
+        requirements of all the candidate Methods are checked at the same time
+        in a thread pool, and the Methods are then tried in priority order. If
+        "race", a few of the highest priority Methods are activated at the same
+        time; the highest priority one which succeeds is kept and the others
+        are rolled back.
+    use_cache:
+        If True, uses an on-disk cache (under $XDG_CACHE_HOME/wakepy) for
+        remembering which Method was used successfully the last time in the
+        same environment. That Method is then tried first. Default: False.
+    timing:
+        If True, the durations of the activation stages of each Method and the
+        total activation time are recorded into the activation result. See
+        ActivationResult.list_methods(). Default: False.
+    activation_timeout:
+        The maximum total time (in seconds) to spend in activating the mode.
+        When the time runs out, the activation fails. Optional.
+    method_timeout:
+        The maximum time (in seconds) to spend with a single Method. A Method
+        which does not finish in time is recorded as timed out, and the next
+        Method is tried. Optional.
+    shared:
+        If True, the activation is shared with the other shared modes of the
+        process with the same settings; the first one to enter activates the
+        mode, and the last one to exit deactivates it. Useful if many threads
+        enter the mode at the same time. Default: False.
+    linger:
+        If given, exiting the mode is deferred by `linger` seconds, and if
+        the mode is entered again within that time, the active Method is
+        reused. Useful when entering the mode in a loop. Optional.
+    blocking:
+        If True (the default), entering the mode waits for the activation to
+        finish. If False, the mode is activated in a background thread and
+        the with block starts right away; see Mode.activation_future. Exiting
+        the mode waits for an unfinished activation and rolls it back.
+    interprocess:
+        If True, the mode is coordinated between the processes of the user
+        (for example, the workers of a multiprocessing pool) which use the
+        mode with interprocess=True: Only one of them holds the real
+        inhibitor at a time, and another one takes over when it exits. Uses
+        lock files under $XDG_RUNTIME_DIR/wakepy. Default: False.
 
     Returns
     -------
@@ -168,4 +282,13 @@ def presenting(
         methods_priority=methods_priority,
         on_fail=on_fail,
         dbus_adapter=dbus_adapter,
+        strategy=strategy,
+        use_cache=use_cache,
+        timing=timing,
+        activation_timeout=activation_timeout,
+        method_timeout=method_timeout,
+        shared=shared,
+        linger=linger,
+        blocking=blocking,
+        interprocess=interprocess,
     )